@@ -0,0 +1,192 @@
+r"""
+Command line batch driver for files of permutations
+
+    Each line of the input is a permutation "top / bottom" (the separator
+    could be changed, the empty lines and the lines starting with # are
+    skipped). For each permutation, one line of JSON is written with the
+    number of the line, the permutation, its reducibility, its Rauzy
+    movability (for the winners 0 and 1), its stratum (see
+    GeneralizedPermutation.stratum, null for a reducible or a flipped
+    permutation) and
+    the size and the id of its Rauzy class (the strongly connected component
+    of the permutation in its Rauzy diagram, which is all the diagram for a
+    permutation without flips ; the id does not depend on the permutation
+    of the class, it is a hash of the smallest key of its vertices). An
+    invalid line gives an error instead.
+
+    The lines are read and sent to the workers by chunks and the results
+    are written in the order of the input as soon as a chunk is done, so the
+    memory used does not depend on the size of the input. Each worker keeps
+    the keys of the vertices of the Rauzy classes it has built (at most
+    cache_size of them) and does not build twice the same class.
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    $ python cli.py --reduced --processes 4 permutations.txt -o results.jsonl
+
+    $ echo "a b c d / d c b a" | python cli.py -
+    {"class_id": "...", "class_size": 7, "line": 1, "movable": [true, true],
+    "permutation": ["a b c d", "d c b a"], "reducible": false, "stratum": "H(2)"}
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from hashlib import sha1
+from itertools import islice
+import argparse
+import json
+import sys
+
+import constructor
+from template import FlippedGeneralizedPermutation
+
+
+# the keys of the vertices of the Rauzy classes built by the process (the
+# values are the sizes and the ids of the classes)
+_classes = {}
+
+
+def _rauzy_class(p, options) :
+    r"""
+    Returns the size and the id of the Rauzy class of p (the strongly
+    connected component of p in its Rauzy diagram).
+
+    The diagram of a flipped permutation is not always strongly connected :
+    only the keys of the component of p are kept (the other vertices of the
+    diagram are in other classes).
+    """
+    key = p._key(([],[]))
+    if key in _classes : return _classes[key]
+
+    d = p.rauzy_diagram()
+    components = d.strongly_connected_components()
+    keys = [vertex for vertex,i in d._index.iteritems() if components[i] == components[0]]
+    c = (len(keys), sha1(repr(min(keys))).hexdigest()[:16])
+    if len(_classes) + len(keys) > options['cache_size'] : _classes.clear()
+    if len(keys) <= options['cache_size'] :
+        for vertex in keys : _classes[vertex] = c
+    return c
+
+
+def process_line(item) :
+    r"""
+    Returns the result (a dictionnary) of a line of the input.
+
+    INPUT:
+        item -- a 3-uple (number of the line, line, options)
+    """
+    n, line, options = item
+    result = {'line' : n}
+    try :
+        p = constructor.GeneralizedPermutations([line],
+                                                reduced=options['reduced'],
+                                                flips=options['flips'],
+                                                separator=options['separator']).next()
+        top, bottom = line.split(options['separator'])
+        result['permutation'] = [' '.join(top.split()), ' '.join(bottom.split())]
+        result['reducible'] = p.is_reducible()
+        result['movable'] = [p.is_rauzy_movable(0), p.is_rauzy_movable(1)]
+        if result['reducible'] or isinstance(p, FlippedGeneralizedPermutation) : result['stratum'] = None
+        else : result['stratum'] = p.stratum()
+        if options['rauzy_class'] :
+            result['class_size'], result['class_id'] = _rauzy_class(p, options)
+    except Exception, error :
+        result = {'line' : n, 'error' : str(error) or type(error).__name__}
+    return result
+
+
+def _items(lines, options) :
+    r"""
+    Iterator over the lines to process (numbered from 1).
+    """
+    for n,line in enumerate(lines) :
+        line = line.strip()
+        if line and not line.startswith('#') :
+            yield n+1, line, options
+
+
+def results(lines, processes=None, chunksize=100, **options) :
+    r"""
+    Iterator over the results of the lines (in the order of the lines).
+
+    INPUT:
+        lines -- an iterable of strings
+        processes -- (defaut: None) the number of processes of the pool
+        (None means no pool)
+        chunksize -- (defaut: 100) the number of lines sent at once to a
+        process
+        options -- reduced (defaut: False), flips (defaut: []), separator
+        (defaut: '/'), rauzy_class (defaut: True) and cache_size (defaut:
+        100000)
+
+    EXAMPLES:
+        sage : list(results(['a b / b a']))
+        [{'line': 1, 'permutation': ['a b', 'b a'], ...}]
+    """
+    o = {'reduced' : False, 'flips' : [], 'separator' : '/', 'rauzy_class' : True, 'cache_size' : 100000}
+    o.update(options)
+    items = _items(lines, o)
+
+    if processes is None :
+        for item in items :
+            yield process_line(item)
+        return
+
+    from multiprocessing import Pool
+
+    pool = Pool(processes)
+    try :
+        while True :
+            chunk = list(islice(items, chunksize * processes))
+            if chunk == [] : break
+            for result in pool.imap(process_line, chunk, chunksize) :
+                yield result
+    finally :
+        pool.terminate()
+
+
+def main(argv=None) :
+    r"""
+    The command line (see python cli.py --help).
+    """
+    parser = argparse.ArgumentParser(description="Compute the reducibility, the Rauzy movability, "
+                                     "the stratum and the Rauzy class of the permutations of a file "
+                                     "(one 'top / bottom' by line) as JSON lines.")
+    parser.add_argument('input', help="the file of permutations ('-' for the standard input)")
+    parser.add_argument('-o', '--output', default='-', help="the output file (defaut: the standard output)")
+    parser.add_argument('-r', '--reduced', action='store_true', help="reduced permutations")
+    parser.add_argument('-f', '--flips', default='', help="the flipped letters, separated by commas")
+    parser.add_argument('-s', '--separator', default='/', help="the separator of the top and the bottom (defaut: /)")
+    parser.add_argument('-p', '--processes', type=int, default=None, help="the number of processes (defaut: no pool)")
+    parser.add_argument('-c', '--chunksize', type=int, default=100, help="the number of lines sent at once to a process")
+    parser.add_argument('--no-class', dest='rauzy_class', action='store_false', help="do not build the Rauzy classes")
+    parser.add_argument('--cache-size', type=int, default=100000, help="the maximal number of vertices kept by each process")
+    args = parser.parse_args(argv)
+
+    flips = [f for f in args.flips.split(',') if f]
+    lines = sys.stdin if args.input == '-' else open(args.input)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    errors = 0
+    try :
+        for result in results(lines, args.processes, args.chunksize,
+                              reduced=args.reduced, flips=flips, separator=args.separator,
+                              rauzy_class=args.rauzy_class, cache_size=args.cache_size) :
+            errors += 'error' in result
+            output.write(json.dumps(result, sort_keys=True) + '\n')
+            output.flush()
+    finally :
+        if lines is not sys.stdin : lines.close()
+        if output is not sys.stdout : output.close()
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main())
@@ -42,6 +42,14 @@ EXAMPLES:
          b  c  c
 
 
+    To create many permutations at once (for example from a file) use
+    GeneralizedPermutations which validates each item in linear time and
+    can store the result in a compact PermutationArray :
+        sage : l = GeneralizedPermutations(open('permutations.txt'), separator='/')
+        sage : a = GeneralizedPermutations(['a b c / c b a', 'a b c / c a b'],
+        separator='/', compact=True)
+
+
     For Rauzy diagrams there is two construction methods. The first one is to
     use the class factory :
         sage : d = RauzyDiagram('a b c', 'c b a')
@@ -71,6 +79,9 @@ from sage import SageObject
 
 from labeled import *
 from reduced import *
+from permutation_array import PermutationArray
+from template import load_checkpoint, FrozenRauzyDiagram
+from external import ExternalRauzyDiagram, ShardedRauzyDiagram
 
 class WrongParameter(Exception):
     def __init__(self,value):
@@ -189,14 +200,14 @@ def GeneralizedPermutation(*args,**kargs):
         elif type(args) == str :
             # here args is one string
             strings = args.split('\n')
-            if len(a) != 2 : raise WrongParameter("Your chain must contain exactly two lines")
+            if len(strings) != 2 : raise WrongParameter("Your chain must contain exactly two lines")
             else :
                 a[0] = strings[0].split()
                 a[1] = strings[1].split()
 
         else :
             # here is a bad argument
-            raise TypeErrorr("Non acceptable argument")
+            raise TypeError("Non acceptable argument")
 
     else :
         # here args is composed of two elements
@@ -231,38 +242,66 @@ def GeneralizedPermutation(*args,**kargs):
 
 
     # verification of the coherence of a and choose between normal or generalized
-    l = a[0] + a[1]
-    letters = set(l)
+    generalized, error = _check_intervals(a, flips)
+    if error is not None : raise error
 
+    return _build_permutation(a, generalized, reduction, flips, alphabet)
 
-    for letter in flips :
-        if letter not in letters :
-            raise TypeError("The flip list is not valid")
 
-    for letter in letters :
-        if l.count(letter) != 2 : raise NoMatchingTwin("Letters must reappear twice")
+def _check_intervals(a, flips=[]) :
+    r"""
+    Check that two lists of labels define a generalized permutation.
 
-    for letter in letters :
-        if (a[0].count(letter) == 2) or (a[1].count(letter) == 2) :
-            generalized = True
-            break
-    else :
-        generalized = False
+    The verification is linear in the number of intervals and no exception is
+    raised : the error (if any) is returned.
+
+    INPUT:
+        a -- two lists of labels
+        flips -- a list of labels
+
+    OUTPUT:
+        a 2-uple (generalized, error) where generalized is True if a letter
+        appears twice in the same interval and error is None or the exception
+        that GeneralizedPermutation must raise
+    """
+    s0 = set(a[0])
+    if (len(s0) == len(a[0])) and (len(a[0]) == len(a[1])) and (s0 == set(a[1])) :
+        # a permutation
+        for letter in flips :
+            if letter not in s0 :
+                return False, TypeError("The flip list is not valid")
+        return False, None
+
+    count = [{},{}]
+    for i in (0,1) :
+        c = count[i]
+        for letter in a[i] :
+            c[letter] = c.get(letter,0) + 1
+
+    for letter in flips :
+        if (letter not in count[0]) and (letter not in count[1]) :
+            return False, TypeError("The flip list is not valid")
 
-    if generalized == True :
-        # check exitence of admissible length
-        b0 = a[0][:]
-        b1 = a[1][:]
-        for letter in letters :
-            if b0.count(letter) == 1 :
-                del b0[b0.index(letter)]
-                del b1[b1.index(letter)]
+    repeated = [False, False]
+    for i in (0,1) :
+        for letter, n in count[i].iteritems() :
+            if n + count[1-i].get(letter,0) != 2 :
+                return False, NoMatchingTwin("Letters must reappear twice")
+            if n == 2 : repeated[i] = True
 
-        if (b0 == []) or (b1 == []):
-            raise NoAdmissibleLength("There is no corresponding length")
+    if repeated[0] or repeated[1] :
+        # an admissible length needs a repeated letter in both intervals
+        if not (repeated[0] and repeated[1]) :
+            return True, NoAdmissibleLength("There is no corresponding length")
+        return True, None
 
+    return False, None
 
-    # repartition to different objects
+
+def _build_permutation(a, generalized, reduction, flips, alphabet) :
+    r"""
+    Repartition to the different types of permutations (a must be valid).
+    """
     if generalized == False :
         if reduction == True :
             if flips == [] :
@@ -287,6 +326,150 @@ def GeneralizedPermutation(*args,**kargs):
                 return FlippedLabeledQuadraticPermutation(a,flips)
 
 
+def _intervals_from_twin(twin, alphabet=None) :
+    r"""
+    Labels of a twin list (the storage of AbelianPermutation or
+    QuadraticPermutation) or None if it is not a valid twin.
+
+    The letters are given in order of first appearance (from the alphabet
+    or '1', '2', ... by default).
+    """
+    l0, l1 = len(twin[0]), len(twin[1])
+    n = (l0 + l1) // 2
+    if alphabet is None : alphabet = [str(i) for i in range(1,n+1)]
+    elif len(alphabet) < n : return None
+
+    if (l0 + l1) % 2 : return None
+    a = [[None]*l0, [None]*l1]
+
+    if (l0 == l1) and all(type(j) == int for j in twin[0]) and all(type(j) == int for j in twin[1]) :
+        # Abelian twin : twin[0][i] is the position of i in the bottom
+        for i,j in enumerate(twin[0]) :
+            if (j < 0) or (j >= l1) or (twin[1][j] != i) : return None
+            a[0][i] = alphabet[i]
+            a[1][j] = alphabet[i]
+        return a
+
+    # quadratic twin : list of 2-uples (interval, position)
+    i_a = 0
+    for i in (0,1) :
+        for j,t in enumerate(twin[i]) :
+            if (type(t) != tuple) or (len(t) != 2) : return None
+            i2, j2 = t
+            if (i2 != 0 and i2 != 1) or (j2 < 0) or (j2 >= len(twin[i2])) : return None
+            if ((i2,j2) == (i,j)) or (twin[i2][j2] != (i,j)) : return None
+            if a[i][j] is None :
+                a[i][j] = a[i2][j2] = alphabet[i_a]
+                i_a += 1
+    return a
+
+
+def GeneralizedPermutations(data, reduced=False, flips=[], alphabet=None, separator='\n', invalid='raise', compact=False) :
+    r"""
+    Build many generalized permutations at once.
+
+    The verification of each item is linear in its number of intervals and
+    no exception is raised for an invalid item unless invalid is 'raise'.
+
+    INPUT:
+        data -- an iterable of permutation descriptions. Each one could be
+        one string (top and bottom separated by separator), two strings, two
+        lists of labels or a twin (two lists of integers for an Abelian
+        permutation or two lists of 2-uples (interval, position) for a
+        quadratic one, as in the storage of permutations)
+        reduced -- a boolean (defaut: False)
+        flips -- list of letters (defaut: [])
+        alphabet -- (defaut: None) the alphabet of the reduced permutations
+        and the labels used for twins
+        separator -- (defaut: '\\n') separator of the top and bottom
+        intervals inside one string
+        invalid -- (defaut: 'raise') what to do with an invalid item : 'raise'
+        the error, 'skip' the item or replace it by 'none' (in a
+        PermutationArray, 'none' is the same as 'skip' and the items which
+        do not fit in the array are invalid)
+        compact -- (defaut: False) if True, return a PermutationArray instead
+        of a generator of permutations
+
+    OUTPUT:
+        a generator of generalized permutations (or a PermutationArray)
+
+    EXAMPLES:
+        sage : l = GeneralizedPermutations(['a b c\\nc b a', ('a b b', 'c c a')])
+        sage : list(l)
+        [a b c
+        c b a, a b b
+        c c a]
+
+        sage : l = GeneralizedPermutations(['a b\\nb a', 'a a\\nb'], invalid='none')
+        sage : list(l)
+        [a b
+        b a, None]
+
+        sage : l = GeneralizedPermutations([([2,1,0],[2,1,0]), ([1,0],[1,0])])
+        sage : list(l)
+        [1 2 3
+        3 2 1, 1 2
+        2 1]
+
+        sage : a = GeneralizedPermutations(['a b c / c b a', 'a b c / c a b'], separator='/', compact=True)
+        sage : a[1]
+        a b c
+        c a b
+    """
+    if invalid not in ('raise', 'skip', 'none') :
+        raise WrongParameter("invalid must be 'raise', 'skip' or 'none'")
+
+    result = _generalized_permutations(data, reduced, flips, alphabet, separator, invalid, compact)
+
+    if compact :
+        return PermutationArray.from_intervals(result, reduced=reduced, flips=flips, alphabet=alphabet, invalid=invalid)
+    return result
+
+
+def _generalized_permutations(data, reduction, flips, alphabet, separator, invalid, only_intervals) :
+    r"""
+    Generator used by GeneralizedPermutations.
+
+    If only_intervals is True, the 2-uples (intervals, generalized) are
+    returned instead of the permutations.
+    """
+    for item in data :
+        a = None
+        error = None
+
+        if type(item) == str :
+            strings = item.split(separator)
+            if len(strings) == 2 :
+                a = [strings[0].split(), strings[1].split()]
+            else :
+                error = WrongParameter("Your chain must contain exactly two lines")
+
+        elif ((type(item) == list) or (type(item) == tuple)) and (len(item) == 2) :
+            if (type(item[0]) == str) and (type(item[1]) == str) :
+                a = [item[0].split(), item[1].split()]
+            elif ((len(item[0]) > 0) and (type(item[0][0]) == str)) or ((len(item[1]) > 0) and (type(item[1][0]) == str)) :
+                a = [list(item[0]), list(item[1])]
+            else :
+                a = _intervals_from_twin(item, alphabet)
+                if a is None : error = TypeError("Not a valid twin")
+
+        else :
+            error = TypeError("Non acceptable argument")
+
+        if error is None :
+            generalized, error = _check_intervals(a, flips)
+
+        if error is not None :
+            if invalid == 'raise' : raise error
+            if invalid == 'none' : yield None
+            continue
+
+        if only_intervals :
+            yield a, generalized
+        else :
+            yield _build_permutation(a, generalized, reduction, flips, alphabet)
+
+
 def RauzyDiagram(*args, **kargs) :
     r"""
     Return an object coding a Rauzy diagram
@@ -295,6 +478,8 @@ def RauzyDiagram(*args, **kargs) :
         intervals -- two list, or two strings
         reduced -- a boolean (defaut: False) to precise reduction
         flips -- a list (defaut: []) for flipped permutations
+        the other keywords (progress, max_vertices, max_time, cancel) are
+        the options of the completion (see RauzyDiagram.complete)
     
     OUTPUT :
         rauzy diagram -- eight possible types depending on input datas
@@ -343,8 +528,139 @@ def RauzyDiagram(*args, **kargs) :
     AUTHORS :
         - Vincent Delecroix (2008-20-12)
     """
-    if not kargs.has_key("reduced") : kargs["reduced"] = False
-    if not kargs.has_key("flips") : kargs["flips"] = []
+    reduced = kargs.pop("reduced", False)
+    flips = kargs.pop("flips", [])
+
+    p = GeneralizedPermutation(args, reduced = reduced, flips = flips)
+    return p.rauzy_diagram(**kargs)
+
+
+def RauzyDiagrams(data, reduced=False, flips=[], alphabet=None, separator='\n', invalid='raise', processes=None, **kargs) :
+    r"""
+    Build the Rauzy diagrams of many seeds.
+
+    The seeds are read as in GeneralizedPermutations. The keys of the
+    vertices of the diagrams already built are kept in an index : a seed
+    whose key is in the index is not built again. With a pool of processes,
+    the diagrams are given in the order in which they are completed and a
+    seed whose class is being built by another process could be built twice
+    (the second diagram is then dropped and the seed is given as a
+    duplicate).
+
+    INPUT:
+        data -- an iterable of permutation descriptions (see
+        GeneralizedPermutations)
+        reduced -- a boolean (defaut: False)
+        flips -- list of letters (defaut: [])
+        alphabet, separator, invalid -- see GeneralizedPermutations (the
+        invalid seeds are skipped if invalid is 'none')
+        processes -- (defaut: None) the number of processes of the pool
+        (None means no pool)
+        the other keywords are the options of the completion (see
+        RauzyDiagram.complete)
+
+    OUTPUT:
+        an iterator of 3-uples (i, j, d) where i is the number of a seed in
+        data, j the number of the seed whose diagram contains it and d the
+        diagram if i == j (and None otherwise)
+
+    EXAMPLES:
+        sage : l = RauzyDiagrams(['a b c / c b a', 'a b c / c a b', 'a b / b a'], separator='/')
+        sage : [(i,j,len(d) if d else None) for i,j,d in l]
+        [(0, 0, 3), (1, 0, None), (2, 2, 1)]
+    """
+    if invalid not in ('raise', 'skip', 'none') :
+        raise WrongParameter("invalid must be 'raise', 'skip' or 'none'")
+
+    seeds = _generalized_permutations(data, reduced, flips, alphabet, separator, invalid, False)
+    seeds = ((i,p) for i,p in enumerate(seeds) if p is not None)
+    return _rauzy_diagrams(seeds, processes, kargs)
+
+
+def _rauzy_diagram_of_seed(item) :
+    r"""
+    Build the Rauzy diagram of a seed (in a process of RauzyDiagrams).
+
+    The errors are returned instead of raised.
+    """
+    i, p, kargs = item
+    try :
+        return i, p.rauzy_diagram(**kargs), None
+    except Exception, error :
+        return i, None, error
 
-    p = GeneralizedPermutation(args, reduced = kargs["reduced"], flips = kargs["flips"])
-    return p.rauzy_diagram()
+
+def _rauzy_diagrams(seeds, processes, kargs) :
+    r"""
+    Generator used by RauzyDiagrams.
+    """
+    buffer = ([],[])
+
+    # index of the keys of the vertices built (the value is the seed of the
+    # diagram), the seeds in construction by their keys and for each of
+    # them its key followed by the seeds waiting for it (duplicated seeds)
+    index = {}
+    building = {}
+    waiting = {}
+
+    def finished(i, d) :
+        key = waiting[i][0]
+        del building[key]
+        j = index.get(key)
+        if j is None :
+            for vertex in d._index :
+                index.setdefault(vertex, i)
+            yield i, i, d
+            j = i
+        else :
+            # built in the meantime by another process
+            yield i, j, None
+        for k in waiting.pop(i)[1:] :
+            yield k, j, None
+
+    if processes is None :
+        for i,p in seeds :
+            key = p._key(buffer)
+            if key in index :
+                yield i, index[key], None
+            else :
+                building[key] = i
+                waiting[i] = [key]
+                for result in finished(i, p.rauzy_diagram(**kargs)) :
+                    yield result
+        return
+
+    from multiprocessing import Pool
+    from Queue import Queue
+
+    pool = Pool(processes)
+    done = Queue()
+    try :
+        for i,p in seeds :
+            key = p._key(buffer)
+            if key in index :
+                yield i, index[key], None
+            elif key in building :
+                waiting[building[key]].append(i)
+            else :
+                building[key] = i
+                waiting[i] = [key]
+                pool.apply_async(_rauzy_diagram_of_seed, ((i, p, kargs),), callback=done.put)
+
+            # the number of builds sent to the pool is bounded
+            while len(building) > 2 * processes or (len(building) and not done.empty()) :
+                j, d, error = done.get()
+                if error is not None : raise error
+                for result in finished(j, d) :
+                    yield result
+
+        while building :
+            j, d, error = done.get()
+            if error is not None : raise error
+            for result in finished(j, d) :
+                yield result
+
+        pool.close()
+        pool.join()
+    finally :
+        pool.terminate()
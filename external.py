@@ -0,0 +1,714 @@
+r"""
+Rauzy diagrams built in external memory
+
+    For Rauzy classes which do not fit in memory as Python objects, an
+    ExternalRauzyDiagram does the breadth first search on disk. A vertex is
+    encoded as a fixed width string of bytes (the length of the top, the
+    involution of the positions, the labels for labeled permutations and the
+    flips for flipped ones, see encode) and the moves are done on the flat
+    arrays of the involution routines.
+
+    The search is done layer by layer with delayed duplicate detection : the
+    successors of a layer are written in sorted runs (each one fits in the
+    memory budget), the runs are merged and the vertices already visited are
+    removed by a merge with the sorted file of visited vertices. At the end,
+    the vertices are numbered by their rank in this file and the table of
+    neighbours is written on disk (two integers by vertex, as in the
+    _neighbours of RauzyDiagram : -1 for no move and -2 for a reducible
+    permutation of a flipped diagram).
+
+    A ShardedRauzyDiagram does the same search with several workers (local
+    processes or processes on nodes which share a filesystem), each one
+    exploring the vertices of a shard and exchanging the others as batch
+    files.
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    sage : p = GeneralizedPermutation('a b c d', 'd c b a', reduced=True)
+    sage : d = ExternalRauzyDiagram(p, memory=2**16)
+    sage : len(d)
+    7
+    sage : d._neighbours[0]
+    [0, 1]
+    sage : d.index(d[3])
+    3
+    sage : d.remove()
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from array import array
+from heapq import merge
+from itertools import groupby
+from multiprocessing import Process
+from time import sleep, time
+import cPickle
+import os
+import shutil
+import struct
+import tempfile
+import traceback
+import zlib
+
+from sage import SageObject
+#from sage.structure.sage_object import SageObject
+
+from involution import GeneralizedPermutation as FlatPermutation
+from involution import involution_rauzy_movability, involution_rauzy_move, involution_reducibility
+from reduced import ReducedPermutation
+
+
+def _read_records(filename, width) :
+    r"""
+    Iterator over the records of fixed width of a file.
+    """
+    f = open(filename, 'rb')
+    try :
+        while True :
+            s = f.read(width * 4096)
+            if not s : break
+            for i in xrange(0, len(s), width) :
+                yield s[i:i+width]
+    finally :
+        f.close()
+
+
+def _write_records(filename, records) :
+    r"""
+    Write records in a file and returns their number.
+    """
+    n = 0
+    f = open(filename, 'wb')
+    for record in records :
+        f.write(record)
+        n += 1
+    f.close()
+    return n
+
+
+def _unique(records) :
+    r"""
+    Iterator over the distinct records of a sorted iterator.
+    """
+    for record,_ in groupby(records) :
+        yield record
+
+
+def _difference(records, others) :
+    r"""
+    Iterator over the records which are not in others (both are sorted).
+    """
+    others = iter(others)
+    other = next(others, None)
+    for record in records :
+        while other is not None and other < record :
+            other = next(others, None)
+        if record != other :
+            yield record
+
+
+class NeighbourTable(object) :
+    r"""
+    Table of neighbours stored in a file (two 4 bytes integers by vertex).
+
+    It behaves like the list _neighbours of a RauzyDiagram : t[i] is the
+    list of the two neighbours of the vertex i.
+    """
+    def __init__(self, filename) :
+        self._filename = filename
+        self._len = os.path.getsize(filename) // 8
+
+
+    def __len__(self) :
+        return self._len
+
+
+    def __getitem__(self, i) :
+        if i < 0 : i += self._len
+        if i < 0 or i >= self._len : raise IndexError("vertex out of range")
+        f = open(self._filename, 'rb')
+        f.seek(8*i)
+        n = list(struct.unpack('<ii', f.read(8)))
+        f.close()
+        return n
+
+
+    def __iter__(self) :
+        f = open(self._filename, 'rb')
+        try :
+            while True :
+                s = f.read(8 * 4096)
+                if not s : break
+                a = struct.unpack('<%di' %(len(s) // 4), s)
+                for i in xrange(0, len(a), 2) :
+                    yield [a[i], a[i+1]]
+        finally :
+            f.close()
+
+
+
+class ExternalRauzyDiagram(SageObject) :
+    r"""
+    Rauzy diagram built and stored on disk.
+
+    INPUT:
+        p -- a permutation (labeled or reduced, flipped or not) with at most
+        128 intervals (each field of a record is one unsigned byte and the
+        positions go from 0 to 2n-1 <= 255)
+        directory -- (defaut: None) the directory of the files (a temporary
+        directory if None)
+        memory -- (defaut: 2**26) the memory budget (in bytes) for the
+        sorted runs
+
+    EXAMPLES:
+        sage : p = GeneralizedPermutation('a b b', 'c c a', reduced=True)
+        sage : d = ExternalRauzyDiagram(p)
+        sage : len(d)
+        4
+    """
+    def __init__(self, p, directory=None, memory=2**26) :
+        if directory is None :
+            directory = tempfile.mkdtemp()
+        elif not os.path.isdir(directory) :
+            os.makedirs(directory)
+        self._directory = directory
+
+        q = FlatPermutation.from_permutation(p)
+        if len(q._list) - 1 > 255 : raise ValueError("at most 128 intervals (the positions are stored on one byte)")
+
+        self._reduced = isinstance(p, ReducedPermutation)
+        self._flipped = q._flips is not None
+        self._length = len(q._list)
+
+        # the letters in order of first apparition
+        self._letters = []
+        for letter in q._data :
+            if letter not in self._letters : self._letters.append(letter)
+        if self._reduced : self._letters = [p.alphabetize(i) for i in range(len(self._letters))]
+
+        self._width = 1 + self._length * (1 + (not self._reduced) + self._flipped)
+        self._max_records = max(1, memory // (self._width + 64))
+        # the number of runs merged at once (each one is read by blocks of
+        # 4096 records)
+        self._fan_in = max(2, min(16, memory // (4096 * (self._width + 4))))
+        self._n_runs = 0
+
+        self._start = p.copy()
+        labels = [self._letters.index(letter) for letter in q._data]
+        flips = q._flips
+        self._build(self._encode(q._k, q._list, labels, flips))
+
+
+    def __repr__(self) :
+        return "Rauzy diagram with %d vertices stored in %s" %(len(self), self._directory)
+
+
+    def __len__(self) :
+        return self._len
+
+
+    def __getitem__(self, i) :
+        r"""
+        Returns the permutation of the vertex i.
+        """
+        if type(i) != int : raise TypeError("must be an integer")
+        if i < 0 or i >= self._len : raise IndexError("vertex out of range")
+        f = open(self._file('vertices'), 'rb')
+        f.seek(self._width * i)
+        record = f.read(self._width)
+        f.close()
+        return self._decode(record)
+
+
+    def _file(self, name) :
+        return os.path.join(self._directory, name)
+
+
+    def encode(self, p) :
+        r"""
+        Returns the record (a string of fixed width) of a permutation of the
+        diagram.
+
+        The record is made of the length of the top, the involution of the
+        positions, the labels of the positions (only for labeled
+        permutations) and the flips of the positions (only for flipped
+        permutations, 1 for a flip) each one on a byte.
+        """
+        q = FlatPermutation.from_permutation(p)
+        labels = [self._letters.index(letter) for letter in q._data]
+        return self._encode(q._k, q._list, labels, q._flips)
+
+
+    def _encode(self, k, involution, labels, flips) :
+        a = [k]
+        a.extend(involution)
+        if not self._reduced : a.extend(labels)
+        if self._flipped : a.extend([f == -1 for f in flips])
+        return array('B', a).tostring()
+
+
+    def _decode(self, record) :
+        r"""
+        Returns the permutation of a record (see encode).
+        """
+        a = array('B', record)
+        N = self._length
+        k = a[0]
+        involution = list(a[1:N+1])
+        if self._reduced :
+            labels = [min(p, involution[p]) for p in range(N)]
+            first = sorted(set(labels))
+            labels = [first.index(x) for x in labels]
+            a = a[N+1:]
+        else :
+            labels = list(a[N+1:2*N+1])
+            a = a[2*N+1:]
+
+        flips = None
+        if self._flipped : flips = [1 - 2*f for f in a]
+        data = [self._letters[x] for x in labels]
+        return FlatPermutation(involution, k, data, flips).to_permutation(reduced=self._reduced)
+
+
+    def _successors(self, record) :
+        r"""
+        Returns the two successors of a record : a record, -1 if the move is
+        not possible or -2 if the result is reducible (only for flipped
+        diagrams).
+        """
+        a = array('B', record)
+        N = self._length
+        k = a[0]
+        involution = array('i', a[1:N+1])
+        if self._reduced :
+            labels = None
+            b = a[N+1:]
+        else :
+            labels = array('B', a[N+1:2*N+1])
+            b = a[2*N+1:]
+        flips = None
+        if self._flipped : flips = array('b', [1 - 2*f for f in b])
+
+        result = []
+        for t in (0,1) :
+            if not involution_rauzy_movability(involution, k, t) :
+                result.append(-1)
+                continue
+
+            i = array('i', involution)
+            l = labels and array('B', labels)
+            f = flips and array('b', flips)
+            k2 = involution_rauzy_move(i, k, t, l, f)
+            if self._flipped and involution_reducibility(i, k2) :
+                result.append(-2)
+            else :
+                result.append(self._encode(k2, i, l, f))
+        return result
+
+
+    def _sorted_runs(self, items) :
+        r"""
+        Sort the items (strings) by runs which fit in the memory budget and
+        returns the names of the files of runs.
+        """
+        runs = []
+        buf = []
+        for item in items :
+            buf.append(item)
+            if len(buf) >= self._max_records :
+                buf.sort()
+                runs.append(self._write_run(buf))
+                buf = []
+        if buf :
+            buf.sort()
+            runs.append(self._write_run(buf))
+        return runs
+
+
+    def _write_run(self, items) :
+        self._n_runs += 1
+        name = self._file('run%d' %(self._n_runs))
+        _write_records(name, items)
+        return name
+
+
+    def _merge_runs(self, runs, width) :
+        r"""
+        Merge the sorted runs by groups of self._fan_in until there are at
+        most self._fan_in of them and returns the names of the files of
+        the remaining runs (the merged runs are removed).
+        """
+        while len(runs) > self._fan_in :
+            group, runs = runs[:self._fan_in], runs[self._fan_in:]
+            runs.append(self._write_run(merge(*[_read_records(run, width) for run in group])))
+            for run in group : os.remove(run)
+        return runs
+
+
+    def _build(self, start) :
+        r"""
+        Breadth first search with delayed duplicate detection.
+        """
+        width = self._width
+        visited = self._file('vertices')
+        layer = self._file('layer')
+        _write_records(visited, [])
+        _write_records(layer, [start])
+        n_layer = 1
+
+        while n_layer :
+            # the successors of the layer in sorted runs
+            successors = (s for record in _read_records(layer, width)
+                          for s in self._successors(record) if type(s) == str)
+            runs = self._sorted_runs(successors)
+
+            # the layer goes in the visited vertices
+            _write_records(visited + '.tmp', merge(_read_records(visited, width), _read_records(layer, width)))
+            os.rename(visited + '.tmp', visited)
+
+            # the next layer : the successors which are not yet visited
+            runs = self._merge_runs(runs, width)
+            new = _unique(merge(*[_read_records(run, width) for run in runs]))
+            n_layer = _write_records(layer + '.tmp', _difference(new, _read_records(visited, width)))
+            os.rename(layer + '.tmp', layer)
+            for run in runs : os.remove(run)
+
+        os.remove(layer)
+        self._len = os.path.getsize(visited) // width
+        self._write_neighbours()
+
+
+    def _write_neighbours(self) :
+        r"""
+        Write the table of neighbours (the vertices are numbered by their
+        rank in the sorted file of vertices).
+        """
+        width = self._width
+        table = self._file('neighbours')
+        f = open(table, 'wb')
+        block = struct.pack('<2i', -1, -1) * self._max_records
+        for i in xrange(0, self._len, self._max_records) :
+            f.write(block[:8 * min(self._max_records, self._len - i)])
+        f.close()
+
+        f = open(table, 'r+b')
+        def edges() :
+            for i,record in enumerate(_read_records(self._file('vertices'), width)) :
+                for t,s in enumerate(self._successors(record)) :
+                    if type(s) == str :
+                        yield s + struct.pack('>I', 2*i + t)
+                    elif s == -2 :
+                        f.seek(4 * (2*i + t))
+                        f.write(struct.pack('<i', -2))
+
+        # the edges sorted by target, merged with the vertices
+        runs = self._merge_runs(self._sorted_runs(edges()), width + 4)
+        vertices = enumerate(_read_records(self._file('vertices'), width))
+        j, vertex = next(vertices, (None, None))
+        for edge in merge(*[_read_records(run, width + 4) for run in runs]) :
+            while vertex != edge[:width] :
+                j, vertex = next(vertices)
+            f.seek(4 * struct.unpack('>I', edge[width:])[0])
+            f.write(struct.pack('<i', j))
+        f.close()
+        for run in runs : os.remove(run)
+
+        self._neighbours = NeighbourTable(table)
+
+
+    def index(self, p) :
+        r"""
+        Returns the index of the permutation p (or None if p is not in the
+        diagram).
+        """
+        record = self.encode(p)
+        f = open(self._file('vertices'), 'rb')
+        lo, hi = 0, self._len
+        while lo < hi :
+            mid = (lo + hi) // 2
+            f.seek(self._width * mid)
+            s = f.read(self._width)
+            if s < record : lo = mid + 1
+            else : hi = mid
+        if lo < self._len :
+            f.seek(self._width * lo)
+            if f.read(self._width) == record :
+                f.close()
+                return lo
+        f.close()
+        return None
+
+
+    def to_rauzy_diagram(self) :
+        r"""
+        Returns the Rauzy diagram in memory (with the numbering of the
+        vertices of this diagram).
+
+        For flipped diagrams, the reducible permutations are not recorded
+        (see FlippedRauzyDiagram.reducible_permutations).
+
+        OUTPUT:
+            a RauzyDiagram
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c d', 'd c b a')
+            sage : d = ExternalRauzyDiagram(p).to_rauzy_diagram()
+            sage : d._neighbours[0]
+            [0, 1]
+        """
+        d = self._start.rauzy_diagram(max_vertices=1)
+        d._permutations = []
+        d._neighbours = []
+        d._index = {}
+        d._stored = 0
+        for i in xrange(self._len) :
+            d.add_vertex(self[i])
+        for i,n in enumerate(self._neighbours) :
+            d._neighbours[i] = n
+        d._cursor = self._len
+        d._store()
+        return d
+
+
+    def remove(self) :
+        r"""
+        Remove the directory of the diagram and its files.
+        """
+        shutil.rmtree(self._directory)
+
+
+
+def shard(record, shards) :
+    r"""
+    Returns the shard of a record (a hash which does not depend on the
+    process or the machine).
+    """
+    return (zlib.crc32(record) & 0xffffffff) % shards
+
+
+def _write_atomic(filename, s) :
+    r"""
+    Write a file under a temporary name and rename it (the readers of a
+    shared filesystem never see a partial file).
+    """
+    f = open(filename + '.tmp', 'wb')
+    f.write(s)
+    f.close()
+    os.rename(filename + '.tmp', filename)
+
+
+def run_shard(directory, i) :
+    r"""
+    Run the worker of the shard i of a ShardedRauzyDiagram built in
+    directory.
+
+    This is the function to call on the nodes (which share the directory)
+    when the diagram is built with workers=False, for example with
+    python -c "from external import run_shard; run_shard('/shared/d', 3)"
+    """
+    f = open(os.path.join(directory, 'config'), 'rb')
+    state = cPickle.load(f)
+    f.close()
+
+    d = ShardedRauzyDiagram.__new__(ShardedRauzyDiagram)
+    d.__dict__.update(state)
+    d._directory = os.path.join(directory, 'shard%d' %(i))
+    try :
+        d._run_shard(i)
+    except :
+        # the builder and the other workers stop when they see this marker
+        _write_atomic(d._failed(i), traceback.format_exc())
+        raise
+
+
+
+class ShardedRauzyDiagram(ExternalRauzyDiagram) :
+    r"""
+    Rauzy diagram built by several workers which only share a filesystem.
+
+    The vertices are partitioned in shards by a hash of their records (see
+    shard) and each worker explores the vertices of its shard, as the
+    ExternalRauzyDiagram does. The search goes by rounds : in each round,
+    a worker reads the batch files sent to it, keeps the vertices not yet
+    visited and sends their successors to the workers of their shards
+    (one batch file for each shard). A marker file with the number of
+    records sent ends the round of a worker, and the search stops when no
+    records are sent in a round.
+
+    At the end, the sorted vertices of the shards are merged and the table
+    of neighbours is written as for an ExternalRauzyDiagram (the vertices
+    are numbered by their rank in the sorted vertices).
+
+    INPUT:
+        p -- a permutation (see ExternalRauzyDiagram)
+        shards -- (defaut: 2) the number of shards
+        directory -- (defaut: None) the directory of the files (it must be
+        shared by the nodes)
+        memory -- (defaut: 2**26) the memory budget of each worker
+        workers -- (defaut: True) start one local process for each shard.
+        If False the workers must be started on the nodes with run_shard
+        (the construction then waits for them).
+        poll -- (defaut: 0.05) the time in seconds between two looks at the
+        files of the other workers
+        timeout -- (defaut: None) the maximal time in seconds to wait for a
+        file of a worker (None for no limit)
+
+    A worker which fails writes a marker file 'failed' (with the
+    traceback) in the directory of its shard. The builder and the other
+    workers then raise a RuntimeError instead of waiting for it, as they do
+    when the timeout is reached.
+
+    EXAMPLES:
+        sage : p = GeneralizedPermutation('a b c d', 'd c b a', reduced=True)
+        sage : d = ShardedRauzyDiagram(p, shards=3)
+        sage : len(d)
+        7
+        sage : d.to_rauzy_diagram()._neighbours[0]
+        [0, 1]
+    """
+    def __init__(self, p, shards=2, directory=None, memory=2**26, workers=True, poll=0.05, timeout=None) :
+        self._shards = shards
+        self._workers = workers
+        self._poll = poll
+        self._timeout = timeout
+        ExternalRauzyDiagram.__init__(self, p, directory, memory)
+
+
+    def _exchange(self, r, to, sender) :
+        r"""
+        Returns the name of the batch file sent in the round r.
+        """
+        return os.path.join(self._root, 'exchange', 'r%d_to%d_from%d' %(r, to, sender))
+
+
+    def _marker(self, r, sender) :
+        return os.path.join(self._root, 'exchange', 'r%d_done%d' %(r, sender))
+
+
+    def _failed(self, i) :
+        return os.path.join(self._root, 'shard%d' %(i), 'failed')
+
+
+    def _wait_file(self, name) :
+        r"""
+        Wait for a file written by a worker.
+
+        A RuntimeError is raised if a worker failed (see run_shard) or if
+        the file is not there after self._timeout seconds.
+        """
+        start = time()
+        while not os.path.exists(name) :
+            for i in range(self._shards) :
+                if os.path.exists(self._failed(i)) :
+                    raise RuntimeError("the worker of the shard %d failed" %(i))
+            if self._timeout is not None and time() - start > self._timeout :
+                raise RuntimeError("no file %s after %s seconds" %(name, self._timeout))
+            sleep(self._poll)
+
+
+    def _build(self, start) :
+        r"""
+        Distribute the search to the workers and merge their vertices.
+        """
+        width = self._width
+        self._root = self._directory
+        os.mkdir(self._file('exchange'))
+        for i in range(self._shards) :
+            os.mkdir(self._file('shard%d' %(i)))
+
+        # the start is sent in the round 0
+        for i in range(self._shards) :
+            _write_records(self._exchange(0, i, 0), [start] if shard(start, self._shards) == i else [])
+
+        state = dict(self.__dict__)
+        del state['_start']
+        _write_atomic(self._file('config'), cPickle.dumps(state, 2))
+
+        if self._workers :
+            processes = [Process(target=run_shard, args=(self._root, i)) for i in range(self._shards)]
+            for process in processes : process.start()
+            try :
+                while any(process.is_alive() for process in processes) :
+                    if any(process.exitcode for process in processes) :
+                        raise RuntimeError("a worker failed")
+                    sleep(self._poll)
+                if any(process.exitcode for process in processes) :
+                    raise RuntimeError("a worker failed")
+            finally :
+                for process in processes :
+                    if process.is_alive() : process.terminate()
+        else :
+            for i in range(self._shards) :
+                self._wait_file(self._file('shard%d/finished' %(i)))
+
+        # the final merge
+        shards = self._merge_runs([self._file('shard%d/vertices' %(i)) for i in range(self._shards)], width)
+        _write_records(self._file('vertices'), merge(*[_read_records(f, width) for f in shards]))
+        self._len = os.path.getsize(self._file('vertices')) // width
+        for i in range(self._shards) :
+            shutil.rmtree(self._file('shard%d' %(i)))
+        shutil.rmtree(self._file('exchange'))
+        os.remove(self._file('config'))
+        self._write_neighbours()
+
+
+    def _wait_round(self, r) :
+        r"""
+        Wait the end of the round r for all the workers and returns the
+        number of records sent.
+        """
+        n = 0
+        for i in range(self._shards) :
+            marker = self._marker(r, i)
+            self._wait_file(marker)
+            f = open(marker)
+            n += int(f.read())
+            f.close()
+        return n
+
+
+    def _run_shard(self, i) :
+        r"""
+        The search of the worker of the shard i.
+        """
+        width = self._width
+        visited = self._file('vertices')
+        layer = self._file('layer')
+        _write_records(visited, [])
+
+        r = 0
+        while r == 0 or self._wait_round(r-1) :
+            # the new vertices : the records received which are not yet visited
+            inbox = [self._exchange(r, i, j) for j in range(self._shards)]
+            inbox = [name for name in inbox if os.path.exists(name)]
+            runs = self._sorted_runs(record for name in inbox for record in _read_records(name, width))
+            runs = self._merge_runs(runs, width)
+            new = _unique(merge(*[_read_records(run, width) for run in runs]))
+            _write_records(layer, _difference(new, _read_records(visited, width)))
+            for name in inbox + runs : os.remove(name)
+
+            _write_records(visited + '.tmp', merge(_read_records(visited, width), _read_records(layer, width)))
+            os.rename(visited + '.tmp', visited)
+
+            # the successors go to the batch files of their shards
+            batches = [open(self._exchange(r+1, j, i) + '.tmp', 'wb') for j in range(self._shards)]
+            n = 0
+            for record in _read_records(layer, width) :
+                for s in self._successors(record) :
+                    if type(s) == str :
+                        batches[shard(s, self._shards)].write(s)
+                        n += 1
+            for j,f in enumerate(batches) :
+                f.close()
+                os.rename(f.name, self._exchange(r+1, j, i))
+            _write_atomic(self._marker(r, i), str(n))
+            r += 1
+
+        os.remove(layer)
+        _write_atomic(self._file('finished'), '')
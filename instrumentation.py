@@ -0,0 +1,202 @@
+r"""
+Instrumentation of the hot paths of permutations and Rauzy diagrams
+
+    When the instrumentation is enabled, the methods rauzy_move, copy,
+    is_reducible, is_rauzy_movable, _key, _rauzy_move_key (the computation
+    of the keys looked up in the index of a diagram) and add_vertex of all
+    the classes of the modules template, labeled and reduced are replaced by
+    wrappers which count and time their calls. The creations of permutations
+    (__init__ and copy) are also counted by type.
+
+    Nothing is wrapped when the instrumentation is disabled : the original
+    methods are put back, so it costs nothing.
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    sage : stats = enable()
+    sage : d = RauzyDiagram('a b c', 'c b a')
+    sage : disable()
+    sage : stats.counts['copy']
+    3
+    sage : print stats.to_json()
+    {"allocations": {"LabeledAbelianPermutation": 4}, ...}
+
+    or equivalently :
+    sage : with instrumented() as stats :
+    ....     d = RauzyDiagram('a b c', 'c b a')
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from contextlib import contextmanager
+from timeit import default_timer
+import json
+
+import template, labeled, reduced
+
+
+instrumented_methods = ('rauzy_move', 'copy', 'is_reducible', 'is_rauzy_movable',
+                        '_key', '_rauzy_move_key', 'add_vertex')
+
+# the methods which create a new permutation
+allocation_methods = ('copy', '__init__')
+
+
+class Stats(object) :
+    r"""
+    Counts and times (in seconds) of the instrumented methods and number of
+    permutations created by type.
+
+    The nested calls of a method (for example the method of a class calling
+    the one of its parent) are counted once.
+    """
+    def __init__(self) :
+        self.counts = {}
+        self.times = {}
+        self.allocations = {}
+        self._active = {}
+
+
+    def __repr__(self) :
+        s = ["%-34s %10s %12s" %("method", "calls", "time (s)")]
+        for name in sorted(self.counts) :
+            s.append("%-34s %10d %12.6f" %(name, self.counts[name], self.times[name]))
+        for name in sorted(self.allocations) :
+            s.append("%-34s %10d" %(name, self.allocations[name]))
+        return "\n".join(s)
+
+
+    def reset(self) :
+        r"""
+        Set all counts and times to zero.
+        """
+        self.counts.clear()
+        self.times.clear()
+        self.allocations.clear()
+
+
+    def as_dict(self) :
+        r"""
+        Returns the stats as a dictionnary.
+        """
+        return {'counts' : dict(self.counts),
+                'times' : dict(self.times),
+                'allocations' : dict(self.allocations)}
+
+
+    def to_json(self, **kwds) :
+        r"""
+        Returns the stats as a JSON string (the keywords are passed to
+        json.dumps).
+        """
+        return json.dumps(self.as_dict(), sort_keys=True, **kwds)
+
+
+_stats = None
+_originals = []
+
+
+def _wrap(name, f, stats) :
+    r"""
+    Returns the instrumented version of the method f.
+    """
+    allocation = name in allocation_methods
+
+    def wrapper(self, *args, **kwds) :
+        if stats._active.get(name) :
+            return f(self, *args, **kwds)
+
+        stats._active[name] = True
+        t = default_timer()
+        try :
+            return f(self, *args, **kwds)
+        finally :
+            stats.times[name] = stats.times.get(name, 0.) + default_timer() - t
+            stats.counts[name] = stats.counts.get(name, 0) + 1
+            stats._active[name] = False
+            if allocation :
+                type_name = type(self).__name__
+                stats.allocations[type_name] = stats.allocations.get(type_name, 0) + 1
+
+    wrapper.__name__ = f.__name__
+    wrapper.__doc__ = f.__doc__
+    return wrapper
+
+
+def _classes() :
+    r"""
+    Iterator over the classes of the modules template, labeled and reduced.
+    """
+    for module in (template, labeled, reduced) :
+        for cls in vars(module).values() :
+            if isinstance(cls, type) and cls.__module__ == module.__name__ :
+                yield cls
+
+
+def is_enabled() :
+    r"""
+    Returns True if the instrumentation is enabled.
+    """
+    return _stats is not None
+
+
+def enable(stats=None) :
+    r"""
+    Enable the instrumentation.
+
+    INPUT:
+        stats -- (defaut: None) the Stats which receives the counts (a new
+        one if None)
+
+    OUTPUT:
+        the Stats
+    """
+    global _stats
+    if _stats is not None : disable()
+    if stats is None : stats = Stats()
+
+    for cls in _classes() :
+        names = list(instrumented_methods)
+        if cls.__name__.endswith('Permutation') : names.append('__init__')
+        for name in names :
+            if name in cls.__dict__ :
+                f = cls.__dict__[name]
+                _originals.append((cls, name, f))
+                setattr(cls, name, _wrap(name, f, stats))
+
+    _stats = stats
+    return stats
+
+
+def disable() :
+    r"""
+    Disable the instrumentation (the original methods are put back).
+
+    OUTPUT:
+        the Stats of the instrumentation (or None if it was not enabled)
+    """
+    global _stats
+    while _originals :
+        cls, name, f = _originals.pop()
+        setattr(cls, name, f)
+
+    stats, _stats = _stats, None
+    return stats
+
+
+@contextmanager
+def instrumented(stats=None) :
+    r"""
+    Context manager for the instrumentation (see enable).
+    """
+    stats = enable(stats)
+    try :
+        yield stats
+    finally :
+        disable()
@@ -6,6 +6,20 @@ Here is the main file concerning the storage of general permutations. It's usefu
 for each of the type reduced or labeled. Because it's almost the same thing. Almost
 every method here start with the special word 'twin'.
 
+The storage is an involution without fixed point on the 2n extremities of
+intervals (one flat array of integers) : the positions 0, ..., k-1 are the
+intervals of the top and the positions k, ..., 2n-1 the ones of the bottom.
+The same functions (involution_rauzy_move, involution_rauzy_movability and
+involution_reducibility) work for Abelian, quadratic and flipped permutations.
+
+EXAMPLES:
+    sage : p = GeneralizedPermutation.from_intervals(['a b c'.split(), 'c b a'.split()])
+    sage : p.twin(0)
+    5
+    sage : p.rauzy_move(0)
+    sage : p
+    a b c
+    c a b
 
 TODO:
     Construct the inheritance as combinatorial types inclusion
@@ -18,11 +32,258 @@ TODO:
 #                  http://www.gnu.org/licenses/
 #*****************************************************************************
 
+from array import array
 
 #from sage.structure.sage_object import SageObject
 SageObject = object
 # from sage.combinat.combinat import CombinatorialClass
-from combinat import CombinatorialObject, CombinatorialClass
+from sage import CombinatorialObject, CombinatorialClass
+
+
+
+#################################
+####    INVOLUTION ROUTINES  ####
+#################################
+def involution_move(involution, from_pos, to_pos, *data) :
+    r"""
+    Move (in place) the element at from_pos to the position to_pos.
+
+    The twins of the positions between from_pos and to_pos are updated and
+    the optional data (lists or arrays indexed by positions) are moved in
+    the same way. The cost is O(|to_pos - from_pos|).
+
+    EXAMPLES:
+        sage : l = [1,0,3,2]
+        sage : involution_move(l, 0, 2)
+        sage : l
+        [2, 3, 0, 1]
+    """
+    if from_pos == to_pos : return
+
+    if from_pos < to_pos :
+        lo, hi, shift = from_pos, to_pos, -1
+    else :
+        lo, hi, shift = to_pos, from_pos, 1
+
+    old = involution[lo:hi+1]
+
+    # the positions of the block move by shift (the moved one goes to
+    # to_pos) and the twins outside of the block are updated
+    for p in xrange(lo, hi+1) :
+        q = old[p-lo]
+        if p == from_pos : p = to_pos
+        else : p += shift
+        if q == from_pos : q = to_pos
+        elif lo <= q <= hi : q += shift
+        else : involution[q] = p
+        involution[p] = q
+
+    for l in data :
+        if from_pos < to_pos :
+            l[lo:hi+1] = l[lo+1:hi+1] + l[lo:lo+1]
+        else :
+            l[lo:hi+1] = l[hi:hi+1] + l[lo:hi]
+
+
+def involution_loser_to(involution, k, winner, flipped=False) :
+    r"""
+    Returns the positions (from, to) of the loser of a Rauzy move and the
+    new length of the top.
+
+    INPUT:
+        involution -- the involution of a Rauzy movable permutation
+        k -- the length of the top
+        winner -- 0 or 1
+        flipped -- (defaut: False) True if the winner is flipped
+    """
+    N = len(involution)
+    if winner == 0 :
+        T = involution[k-1]
+        if T >= k :
+            # the twin of the winner is in the bottom
+            if flipped : return N-1, T, k
+            return N-1, T+1, k
+        # the twin of the winner is in the top
+        if flipped : return N-1, T+1, k+1
+        return N-1, T, k+1
+    else :
+        T = involution[N-1]
+        if T < k :
+            # the twin of the winner is in the top
+            if flipped : return k-1, T, k
+            return k-1, T+1, k
+        # the twin of the winner is in the bottom
+        if flipped : return k-1, T, k-1
+        return k-1, T-1, k-1
+
+
+def involution_rauzy_movability(involution, k, winner) :
+    r"""
+    Test of Rauzy movability (see QuadraticPermutation.is_rauzy_movable).
+
+    OUTPUT:
+        a boolean
+    """
+    N = len(involution)
+    # the same letter at the right-end
+    if involution[k-1] == N-1 : return False
+
+    if winner == 0 :
+        winner_end, loser_end = k-1, N-1
+    else :
+        winner_end, loser_end = N-1, k-1
+
+    # the winner (or loser) letter is repeated on the other interval
+    if (involution[winner_end] < k) != (winner_end < k) : return True
+    if (involution[loser_end] < k) != (loser_end < k) : return True
+
+    # the loser letter is the only letter repeated in the loser interval
+    if winner == 0 : r = xrange(k, N)
+    else : r = xrange(0, k)
+    if sum([1 for p in r if (involution[p] < k) == (p < k)]) == 2 :
+        return False
+
+    return True
+
+
+def involution_rauzy_move(involution, k, winner, data=None, flips=None, flipped=False) :
+    r"""
+    Perform (in place) a Rauzy move and returns the new length of the top.
+
+    INPUT:
+        involution -- the involution of a Rauzy movable permutation
+        k -- the length of the top
+        winner -- 0 or 1
+        data -- (defaut: None) a list of labels indexed by positions
+        flips -- (defaut: None) a list of flips (1 or -1) indexed by positions
+        flipped -- (defaut: False) True if the winner is flipped (deduced
+        from flips when they are given)
+
+    EXAMPLES:
+        sage : l = [5,4,3,2,1,0]
+        sage : involution_rauzy_move(l, 3, 0)
+        3
+        sage : l
+        [4,5,3,2,0,1]
+    """
+    if flips is not None :
+        if winner == 0 : winner_end = k-1
+        else : winner_end = len(involution)-1
+        flipped = flips[winner_end] == -1
+
+    from_pos, to_pos, k = involution_loser_to(involution, k, winner, flipped)
+
+    if flips is not None :
+        flip = flips[winner_end] * flips[from_pos]
+        flips[from_pos] = flip
+        flips[involution[from_pos]] = flip
+
+    data = [l for l in (data, flips) if l is not None]
+    involution_move(involution, from_pos, to_pos, *data)
+    return k
+
+
+def involution_reducibility(involution, k) :
+    r"""
+    Test of reducibility.
+
+    OUTPUT:
+        a boolean
+    """
+    N = len(involution)
+    if 2*k == N and min(involution[:k]) >= k :
+        # Abelian permutation
+        s0, s1 = 0, 0
+        for i in range(k-1) :
+            s0 += i
+            s1 += involution[i] - k
+            if s0 == s1 : return True
+        return False
+
+    # the labels are the positions of the first extremities
+    labels = [min(p,involution[p]) for p in range(N)]
+    return quadratic_reducibility([labels[:k], labels[k:]])
+
+
+
+def quadratic_reducibility(s, return_decomposition=False) :
+    r"""
+    Test of reducibility of a quadratic permutation given by its two lists of
+    labels (see QuadraticPermutation.is_reducible).
+
+    INPUT:
+        s -- a list of two lists of labels
+        return_decomposition -- a boolean (defaut: False)
+    """
+    l0 = len(s[0])
+    l1 = len(s[1])
+
+    # testing no corner empty eventually one or two on the left
+    A11, A12, A21, A22 = [], [], [], []
+    for i1 in range(0, l0) :
+        if (i1 > 0) and (s[0][i1-1] in A11) :
+            A11 = []
+            break
+        A11 = s[0][:i1]
+
+        for i2 in range(l0 - 1, i1 - 1, -1) :
+            if s[0][i2] in A12 :
+                A12 = []
+                break
+            A12 = s[0][i2:]
+
+          
+            for i3 in range(0, l1) :
+                if (i3 > 0) and (s[1][i3-1] in A21) :
+                    A21 = []
+                    break
+                A21 = s[1][:i3]
+
+                
+                for i4 in range(l1 - 1, i3 - 1, -1) :
+                    if s[1][i4] in A22 :
+                        A22 = []
+                        break
+                    A22 = s[1][i4:]
+
+
+                    if sorted(A11 + A22) == sorted(A12 + A21) :
+                        if return_decomposition :
+                            return True, (A11,A12,A21,A22)
+                        return True
+
+                else : A22 = []
+            else : A21 = []
+        else : A12 = []
+    else : A11 = []        
+
+
+    # testing two corners empty on the right (i2 = i4 = 0)
+    A11, A21 = s[0][:1], s[1][:1]
+
+    for i1 in range(1, l0) :
+        if s[0][i1-1] in A11 :
+            A11 = s[0][:1]
+            break
+        A11 = s[0][:i1]
+
+        
+        for i3 in range(1, l1) :
+            if s[1][i3-1] in A21 :
+                A21 = s[1][:1]
+                break
+            A21 = s[1][:i3]
+
+            if sorted(A11)  == sorted(A21) :
+                if return_decomposition :
+                    return True,(A11,A12,A21,A22)
+                return True
+        else : A11 = s[0][:1]
+    else : A21 = s[1][:1]
+            
+    if return_decomposition :
+        return False, ()
+    return False
 
 
 
@@ -62,40 +323,37 @@ class InvolutionWithoutFixedPoint(CombinatorialObject) :
         Initialize or raise a type error
         
         """
-        if not isinstance(l, InvolutionWithoutFixedPoint) :
-            if not hasattr(l,  '__iter__') or not hasattr(l, '__len__') :
-                raise TypeError("Your data must be iterable and have a length")
-
-            if len(l) > 0 :
-                if isinstance(l[0], int) :
-                    for i in l :
-                        if not isinstance(i, int) : raise TypeError("Wrong list")
-                        if (i < 0) or (i >= len(l)) : raise TypeError("Wrong list")
-
-                    for i in l :
-                        if l[i] == i : raise TypeError("Fixed point %d"%(i))
-                        if l[l[i]] != i : raise TypeError("Not an involution %d" %(i))
-
-                        super(InvolutionWithoutFixedPoint, self).__init__(l)                        
-
-                else :
-                    n = 2*len(l)
-                    tmp = [-1] * n
-                    for i in l :
-                        if not hasattr(i, '__iter__') or not hasattr(i, '__len__') or not hasattr(i,'__getitem__') : raise TypeError("Wrong type")
-                        if len(i) != 2 : raise TypeError("Type error")
-                        if not isinstance(i[0], int) or not isinstance(i[1], int) : raise TypeError("Wrong Type")
-                        if (i[0] < 0) or (i[0] >= n) or (i[1] < 0) or (i[1] >= n) : raise TypeError("Not in the good range")
-                        tmp[i[0]] = i[1]
-                        tmp[i[1]] = i[0]
+        if isinstance(l, InvolutionWithoutFixedPoint) :
+            super(InvolutionWithoutFixedPoint, self).__init__(array('i', l._list))
+            return
 
-                    
-                    for i in tmp :
-                        if tmp[i] == -1 : raise TypeError("There is non specified images")
+        if not hasattr(l,  '__iter__') or not hasattr(l, '__len__') :
+            raise TypeError("Your data must be iterable and have a length")
+
+        if len(l) > 0 and not isinstance(l[0], int) :
+            n = 2*len(l)
+            tmp = [-1] * n
+            for i in l :
+                if not hasattr(i, '__iter__') or not hasattr(i, '__len__') or not hasattr(i,'__getitem__') : raise TypeError("Wrong type")
+                if len(i) != 2 : raise TypeError("Type error")
+                if not isinstance(i[0], int) or not isinstance(i[1], int) : raise TypeError("Wrong Type")
+                if (i[0] < 0) or (i[0] >= n) or (i[1] < 0) or (i[1] >= n) : raise TypeError("Not in the good range")
+                tmp[i[0]] = i[1]
+                tmp[i[1]] = i[0]
+
+            if -1 in tmp : raise TypeError("There is non specified images")
+            l = tmp
+
+        for i in l :
+            if not isinstance(i, int) : raise TypeError("Wrong list")
+            if (i < 0) or (i >= len(l)) : raise TypeError("Wrong list")
 
-                    super(InvolutionWithoutFixedPoint, self).__init__(tmp)
+        for i in range(len(l)) :
+            if l[i] == i : raise TypeError("Fixed point %d"%(i))
+            if l[l[i]] != i : raise TypeError("Not an involution %d" %(i))
+
+        super(InvolutionWithoutFixedPoint, self).__init__(array('i', l))
 
-                        
 
     __call__ = CombinatorialObject.__getitem__
     
@@ -114,28 +372,9 @@ class InvolutionWithoutFixedPoint(CombinatorialObject) :
             [3, 2, 1, 0]
             
         """
-        l = self._list[:]
-        
-        if from_pos < to_pos :
-            mover_twin_pos = l[from_pos]
-
-            for i in l[from_pos+1 : to_pos+1] : l[i] -= 1
-            l[mover_twin_pos] = to_pos
-
-            l.insert(to_pos+1, l[from_pos])
-            del l[from_pos]
-
-
-        elif to_pos < from_pos :
-            mover_twin_pos = l[from_pos]
-            
-            for i in l[to_pos : from_pos] : l[i] += 1
-            l[mover_twin_pos] = to_pos
-
-            l.insert(to_pos, l[from_pos])
-            del l[from_pos+1]
-
-        return InvolutionWithoutFixedPoint(l)
+        m = InvolutionWithoutFixedPoint(self)
+        involution_move(m._list, from_pos, to_pos)
+        return m
 
             
 
@@ -173,18 +412,184 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
 
     The general class for Generalized Permutations and general
     properties of Generalized Permutations.
+
+    INPUT:
+        involution -- an involution without fixed point (on the positions
+        of the 2n extremities of intervals)
+        k -- the length of the top interval
+        data -- (defaut: None) the list of labels of positions
+        flips -- (defaut: None) the list of flips (1 or -1) of positions
+
+    EXAMPLES:
+        sage : p = GeneralizedPermutation([3,2,1,0], 2)
+        sage : p
+        1 2
+        2 1
+        sage : p = GeneralizedPermutation([1,0,3,2], 2, data=['a','a','b','b'])
+        sage : p
+        a a
+        b b
     """
-    def __init__(self, k=0, data=None) :
-        self.__involution = []
-        # the involution attached to the permutation
+    def __init__(self, involution, k, data=None, flips=None) :
+        InvolutionWithoutFixedPoint.__init__(self, involution)
 
-        self.__k = k
+        if (k < 0) or (k > len(self._list)) : raise ValueError("wrong length of the top")
+        self._k = k
         # separation of intervals, set to half if abelian
 
-        if data != None :
-            self.__data = []
+        if data is None : self._data = None
+        else :
+            if len(data) != len(self._list) : raise ValueError("wrong length of data")
+            self._data = list(data)
         # data attached to each interval or couple of twin
-         
+
+        if flips is None : self._flips = None
+        else :
+            if len(flips) != len(self._list) : raise ValueError("wrong length of flips")
+            self._flips = array('b', flips)
+
+
+    @classmethod
+    def from_intervals(cls, a, flips=[]) :
+        r"""
+        Build the permutation from two lists (or two strings) of labels.
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation.from_intervals(['a b b', 'c c a'], flips=['b'])
+            sage : p
+             a -b -b
+             c  c  a
+        """
+        a = [a[0], a[1]]
+        for i in (0,1) :
+            if isinstance(a[i], str) : a[i] = a[i].split()
+        labels = a[0] + a[1]
+
+        involution = [-1] * len(labels)
+        first = {}
+        for p,letter in enumerate(labels) :
+            if letter in first :
+                involution[p] = first[letter]
+                involution[first[letter]] = p
+            else :
+                first[letter] = p
+        if -1 in involution : raise ValueError("each label must appear twice")
+
+        if flips == [] : return cls(involution, len(a[0]), labels)
+
+        flips = set(flips)
+        return cls(involution, len(a[0]), labels, [(letter in flips and -1) or 1 for letter in labels])
+
+
+    @classmethod
+    def from_permutation(cls, p) :
+        r"""
+        Build the involution of a permutation built by the constructor
+        GeneralizedPermutation (labeled or reduced, flipped or not).
+
+        EXAMPLES:
+            sage : q = constructor.GeneralizedPermutation('a b c', 'c b a')
+            sage : p = GeneralizedPermutation.from_permutation(q)
+            sage : p.twin(0)
+            5
+        """
+        l = list(p)
+        if hasattr(p, '_flips') :
+            labels = [x for x,_ in l[0] + l[1]]
+            flips = [f for _,f in l[0] + l[1]]
+        else :
+            labels = l[0] + l[1]
+            flips = None
+
+        p = cls.from_intervals([labels[:len(l[0])], labels[len(l[0]):]])
+        if flips is not None : p._flips = array('b', flips)
+        return p
+
+
+    def to_permutation(self, reduced=False) :
+        r"""
+        Build the permutation of the constructor GeneralizedPermutation.
+
+        INPUT:
+            reduced -- (defaut: False) a boolean
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation([3,2,1,0], 2)
+            sage : q = p.to_permutation()
+            sage : q
+            1 2
+            2 1
+        """
+        from constructor import GeneralizedPermutation as constructor
+
+        labels = self.intervals()
+        if self._flips is None : return constructor(labels, reduced=reduced)
+
+        data = labels[0] + labels[1]
+        flips = list(set([data[p] for p in range(len(data)) if self._flips[p] == -1]))
+        return constructor(labels, reduced=reduced, flips=flips)
+
+
+    def __repr__(self) :
+        l = self.intervals()
+        if self._flips is None :
+            return ' '.join(map(str,l[0])) + "\n" + ' '.join(map(str,l[1]))
+
+        flips = [self._flips[:self._k], self._flips[self._k:]]
+        s = []
+        for i in (0,1) :
+            s.append(' '.join([(f == 1 and ' ' or '-') + str(x) for x,f in zip(l[i], flips[i])]))
+        return s[0] + "\n" + s[1]
+
+
+    def __eq__(self, other) :
+        r"""
+        Test of equality.
+        """
+        return (isinstance(other, GeneralizedPermutation) and
+                self._k == other._k and
+                self._list == other._list and
+                self._data == other._data and
+                self._flips == other._flips)
+
+
+    def __ne__(self, other) :
+        r"""
+        Test of difference.
+        """
+        return not self.__eq__(other)
+
+
+    def copy(self) :
+        r"""
+        Do a copy of the permutation.
+        """
+        p = self.__class__.__new__(self.__class__)
+        p._list = array('i', self._list)
+        p._k = self._k
+        if self._data is None : p._data = None
+        else : p._data = self._data[:]
+        if self._flips is None : p._flips = None
+        else : p._flips = array('b', self._flips)
+        return p
+
+
+    def intervals(self) :
+        r"""
+        Returns the two lists of labels (if there is no data, the labels are
+        the integers 1, 2, ... in order of apparition).
+        """
+        if self._data is None :
+            data = [None] * len(self._list)
+            i_a = 1
+            for p in range(len(self._list)) :
+                if data[p] is None :
+                    data[p] = data[self._list[p]] = str(i_a)
+                    i_a += 1
+        else :
+            data = self._data
+        return [data[:self._k], data[self._k:]]
+
 
     def lengths(self) :
         r"""
@@ -224,7 +629,7 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
             p.length_top()
             7
         """
-        return self.__k
+        return self._k
 
 
     def length_bottom(self) :
@@ -243,14 +648,14 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
             sage : p.length_bottom()
             3
         """
-        return len(self.__involution) - self.__k
+        return len(self._list) - self._k
 
 
     def __len__(self) :
         r"""
-        Returns the length of the involution.
+        Returns the number of intervals (half the length of the involution).
         """
-        return len(self.__involution) / 2
+        return len(self._list) // 2
 
     
     def is_abelian(self):
@@ -260,11 +665,8 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
         if self.length_top() != self.length_bottom() :
             return False
 
-        for i in range(self.length_bottom()) :
-            if self.__involution[i] < self.__k : return False
-
-        for i in range(self.length_bottom(), len(self)) :
-            if self.__involution[i] > self.__k : return False
+        for i in range(self._k) :
+            if self._list[i] < self._k : return False
 
         return True
         
@@ -289,8 +691,9 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
             sage : "a b","b a"
             True
         """
-        m1 = len(filter(lambda i : i < self.__k, self.__involution[:self.__k]))
-        m2 = len(filter(lambda i : i > self.__k, self.__involution[self.__k:]))
+        k = self._k
+        m1 = len([i for i in self._list[:k] if i < k])
+        m2 = len([i for i in self._list[k:] if i >= k])
         
         if ((m1 == 0) and (m2 > 0)) or ((m1 > 0) and (m2 == 0)) :
             return False
@@ -318,7 +721,8 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
             sage : p[1][-1]
             ['a']
         """
-        if hasattr(self,'__data'): return self.__data[i]
+        if i == 0 or i == 1 : return self.intervals()[i]
+        raise IndexError("the intervals are 0 (top) and 1 (bottom)")
 
 
     def twin(self,i) :
@@ -329,10 +733,10 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
         INPUT:
             i -- integer
         """
-        return self.__involution[i]
+        return self._list[i]
 
 
-    def is_rauzy_movable(self,winner) :
+    def is_rauzy_movable(self, winner=0) :
         r"""
         Test of Rauzy movability
 
@@ -347,38 +751,30 @@ class GeneralizedPermutation(InvolutionWithoutFixedPoint) :
             a boolean
 
         EXAMPLES:
-            sage : p = GeneralizedPermutation('a b b', 'c c a')
-            sage : p.is_reducible()
-            False
-            sage : p = GeneralizedPermutation('a b c', 'b a c')
-            sage : p.is_reducible()
+            sage : p = GeneralizedPermutation.from_intervals(['a b b', 'c c a'])
+            sage : p.is_rauzy_movable(0)
             True
 
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        loser = 1 - winner
-        
-        # twin at the right-end (False)
-        if self.__involution[-1] == self.__involution[self.__k - 1] : return False
-        
-        # winner (or loser) letter is repeated on the other interval (True)
-        if self.__involution[-1] < self.__k : return True
-        if self.__involution[self.__k - 1] > self.__k : return True
+        return involution_rauzy_movability(self._list, self._k, winner)
 
-        # the loser letters are the only letter repeated in the loser interval (False)
-        if filter(lambda i : i < self.__k, self.__involution).count() == 2 :
-            return False
 
-        return True
+    def rauzy_move(self, winner) :
+        r"""
+        Perform a Rauzy move with this type of winner.
+
+        The labels and the flips follow the extremities of intervals.
+        """
+        self._k = involution_rauzy_move(self._list, self._k, winner, self._data, self._flips)
 
 
-    def rauzy_move(self, winner) :
+    def is_reducible(self) :
         r"""
-        Perform a Rauzy move with this typee of winner.
-        incr is -1 or +1 and the flip invert this.
+        Test of reducibility (the flips are not considered).
         """
-        pass
+        return involution_reducibility(self._list, self._k)
         
 
 # class AbelianPermutation(GeneralizedPermutation) :
@@ -68,7 +68,7 @@ from sage import Matrix, identity_matrix
 
 from template import AbelianPermutation, QuadraticPermutation
 from template import FlippedAbelianPermutation, FlippedQuadraticPermutation
-from template import RauzyDiagram, FlippedRauzyDiagram
+from template import RauzyDiagram, FlippedRauzyDiagram, FrozenRauzyDiagram
 
 
 
@@ -78,12 +78,11 @@ class LabeledPermutation(SageObject):
 
     ...DO NOT USE...
     """
+    __slots__ = ()
 
     def __init__(self, a) :
         self._intervals = [a[0][:], a[1][:]]
 
-        self._twin = [[],[]]
-
         self._init_twin(a)
         self._init_alphabet(a)
 
@@ -151,6 +150,21 @@ class LabeledPermutation(SageObject):
         self._intervals[loser_to[0]].insert(loser_to[1], loser_letter)
 
 
+    def _fill_buffer(self, buffer) :
+        r"""
+        Write the labels of the intervals in buffer[0] and buffer[1].
+        """
+        buffer[0][:] = self._intervals[0]
+        buffer[1][:] = self._intervals[1]
+
+
+    def _buffer_key(self, buffer) :
+        r"""
+        The key of labeled permutations is the list of labels.
+        """
+        return (tuple(buffer[0]), tuple(buffer[1]))
+
+
 class LabeledAbelianPermutation(LabeledPermutation, AbelianPermutation) :
     r"""
     labeled Abelian permutation
@@ -192,6 +206,7 @@ class LabeledAbelianPermutation(LabeledPermutation, AbelianPermutation) :
     AUTHORS:
         - Vincent Delecroix (2008-12-20)
     """
+    __slots__ = ()
 
     def copy(self) :
         r"""
@@ -209,11 +224,10 @@ class LabeledAbelianPermutation(LabeledPermutation, AbelianPermutation) :
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        p = LabeledAbelianPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
-        p._intervals[0].extend(self._intervals[0])
-        p._intervals[1].extend(self._intervals[1])
+        p = LabeledAbelianPermutation.__new__(LabeledAbelianPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._intervals = [self._intervals[0][:], self._intervals[1][:]]
+        p._alphabet = self._alphabet
         return p
 
 
@@ -243,13 +257,169 @@ class LabeledAbelianPermutation(LabeledPermutation, AbelianPermutation) :
         up_letter = self._intervals[0][-1]
         down_letter = self._intervals[1][-1]
 
-        d = dict([(letter,letter) for letter in self._intervals[0]])
-        d[loser_letter] = down_letter + up_letter
+        d = dict([(letter,[letter]) for letter in self._intervals[0]])
+        d[loser_letter] = [down_letter, up_letter]
 
         return WordMorphism(d)
 
+
+    def _zorich_losers(self, lengths) :
+        r"""
+        Compute the data of the Zorich move associated to the lengths.
+
+        A Zorich move is the maximal sequence of Rauzy moves with the same
+        winner. During such a sequence the winner stays at the end of its
+        interval and the letters which follow its twin in the loser interval
+        are the successive losers (read from the right and periodically). The
+        number of complete turns on this block is obtained with one integer
+        division.
+
+        INPUT:
+            lengths -- a dictionnary letter -> (positive) length
+
+        OUTPUT:
+            a 4-uple (winner, counts, number of moves, remaining length of
+            the winner) where counts is a dictionnary loser letter -> number
+            of times it loses
+        """
+        top_length = lengths[self._intervals[0][-1]]
+        bottom_length = lengths[self._intervals[1][-1]]
+
+        if top_length > bottom_length : winner = 0
+        elif top_length < bottom_length : winner = 1
+        else : raise ValueError("No Rauzy move for these lengths (the two last intervals have the same length)")
+
+        loser = 1 - winner
+        winner_length = lengths[self._intervals[winner][-1]]
+        if winner == 0 : twin = self._involution[self._k-1] - self._k
+        else : twin = self._involution[-1]
+        block = self._intervals[loser][twin+1:]
+        block_length = sum([lengths[letter] for letter in block])
+
+        # complete turns on the block (we stay strictly greater than the
+        # loser to be able to move again)
+        turns = int(winner_length // block_length)
+        remainder = winner_length - turns * block_length
+        if remainder == 0 :
+            turns -= 1
+            remainder = block_length
+
+        counts = dict([(letter, turns) for letter in block])
+        n = turns * len(block)
+        for letter in reversed(block) :
+            if remainder <= lengths[letter] : break
+            remainder -= lengths[letter]
+            counts[letter] += 1
+            n += 1
+
+        return winner, counts, n, remainder
+
+
+    def zorich_move(self, lengths) :
+        r"""
+        Perform a Zorich move (the accelerated Rauzy induction) with respect
+        to the specified lengths.
+
+        All the consecutive Rauzy moves with the same winner are done in one
+        step. The lengths are modified in place : the winner receives its
+        length after the induction.
+
+        INPUT:
+            lengths -- a dictionnary letter -> (positive) length
+
+        OUTPUT:
+            a 2-uple (winner, number of Rauzy moves performed)
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : lengths = {'a': 2, 'b': 3, 'c': 13}
+            sage : p.zorich_move(lengths)
+            (0, 5)
+            sage : p
+            a b c
+            c a b
+            sage : lengths
+            {'a': 2, 'b': 3, 'c': 1}
+        """
+        winner, counts, n, remainder = self._zorich_losers(lengths)
+
+        # the complete turns let the permutation invariant
+        for k in range(n % len(counts)) :
+            self.rauzy_move(winner)
+
+        lengths[self._intervals[winner][-1]] = remainder
+
+        return winner, n
+
+
+    def zorich_move_matrix(self, lengths) :
+        r"""
+        Return the matrix of the Zorich move associated to the lengths.
+
+        It is the product of the matrices of all the Rauzy moves which
+        compose the Zorich move. As for rauzy_move_substitution, the
+        permutation must be the one before the move.
+
+        INPUT:
+            lengths -- a dictionnary letter -> (positive) length
+
+        OUTPUT:
+            a Matrix (indexed by the alphabet of the permutation)
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : p.zorich_move_matrix({'a': 2, 'b': 3, 'c': 13})
+            [1 0 0]
+            [0 1 0]
+            [3 2 1]
+        """
+        winner, counts, n, remainder = self._zorich_losers(lengths)
+
+        winner_index = self._alphabet.rank(self._intervals[winner][-1])
+
+        m = identity_matrix(len(self._alphabet))
+        for letter, count in counts.iteritems() :
+            m[winner_index, self._alphabet.rank(letter)] += count
+        return m
+
+
+    def zorich_move_substitution(self, lengths) :
+        r"""
+        Return the substitution of the Zorich move associated to the lengths.
+
+        It is the composition of the substitutions of all the Rauzy moves
+        which compose the Zorich move. As for rauzy_move_substitution, the
+        permutation must be the one before the move.
+
+        INPUT:
+            lengths -- a dictionnary letter -> (positive) length
+
+        OUTPUT:
+            a WordMorphism
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : s = p.zorich_move_substitution({'a': 2, 'b': 3, 'c': 13})
+        """
+        winner, counts, n, remainder = self._zorich_losers(lengths)
+
+        winner_letter = self._intervals[winner][-1]
+
+        # the substitutions of the Rauzy moves with the same winner commute
+        s = WordMorphism(dict([(letter,[letter]) for letter in self._intervals[0]]))
+        for letter, count in counts.iteritems() :
+            if count == 0 : continue
+            d = dict([(b,[b]) for b in self._intervals[0]])
+            if winner == 0 :
+                d[letter] = [letter, winner_letter]
+            else :
+                d[letter] = [winner_letter, letter]
+            s = s * (WordMorphism(d) ** count)
+
+        return s
+
         
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -266,7 +436,7 @@ class LabeledAbelianPermutation(LabeledPermutation, AbelianPermutation) :
 
         For more information, try help RauzyDiagram
         """
-        return LabeledAbelianRauzyDiagram(self)
+        return LabeledAbelianRauzyDiagram(self, **kwds)
 
 
 #####################################################################
@@ -328,6 +498,7 @@ class LabeledQuadraticPermutation(LabeledPermutation, QuadraticPermutation) :
     AUTHORS:
         - Vincent Delecroix (2008-12-20)
     """
+    __slots__ = ()
 
     def copy(self) :
         r"""
@@ -345,16 +516,15 @@ class LabeledQuadraticPermutation(LabeledPermutation, QuadraticPermutation) :
         AUTHORS:
             - Vincent Delecroix (2008-20-12)
         """
-        p = LabeledQuadraticPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
-        p._intervals[0].extend(self._intervals[0])
-        p._intervals[1].extend(self._intervals[1])
+        p = LabeledQuadraticPermutation.__new__(LabeledQuadraticPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._intervals = [self._intervals[0][:], self._intervals[1][:]]
+        p._alphabet = self._alphabet
         return p
        
 
 
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -367,7 +537,7 @@ class LabeledQuadraticPermutation(LabeledPermutation, QuadraticPermutation) :
 
         For more information, try help RauzyDiagram or help LabeledQuadraticPermutation
         """
-        return LabeledQuadraticRauzyDiagram(self)
+        return LabeledQuadraticRauzyDiagram(self, **kwds)
 
 
 #######################
@@ -379,12 +549,13 @@ class FlippedLabeledPermutation(LabeledPermutation) :
 
     ...NOT FOR USAGE...
     """
+    __slots__ = ()
 
     def __init__(self, a, flips=[]) :
         self._intervals = [a[0][:], a[1][:]]
 
-        self._twin = [[],[]]
         self._init_twin(a)
+        self._init_alphabet(a)
         self._init_flips(a,flips)
 
 
@@ -392,8 +563,9 @@ class FlippedLabeledPermutation(LabeledPermutation) :
         r"""
         the permutations as a list of two lists
         """
-        a0 = zip(self._intervals[0], self._flips[0])
-        a1 = zip(self._intervals[1], self._flips[1])
+        flips = self._flip_lists()
+        a0 = zip(self._intervals[0], flips[0])
+        a1 = zip(self._intervals[1], flips[1])
         return [a0,a1]
 
 
@@ -416,6 +588,7 @@ class FlippedLabeledPermutation(LabeledPermutation) :
 
 
 
+
 class FlippedLabeledAbelianPermutation(FlippedLabeledPermutation, FlippedAbelianPermutation) :
     r"""
     labeled Abelian permutation
@@ -457,6 +630,7 @@ class FlippedLabeledAbelianPermutation(FlippedLabeledPermutation, FlippedAbelian
     AUTHORS:
         - Vincent Delecroix (2008-12-20)
     """
+    __slots__ = ()
 
     def copy(self) :
         r"""
@@ -474,13 +648,11 @@ class FlippedLabeledAbelianPermutation(FlippedLabeledPermutation, FlippedAbelian
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        p = FlippedLabeledAbelianPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
-        p._flips[0].extend(self._flips[0])
-        p._flips[1].extend(self._flips[1])
-        p._intervals[0].extend(self._intervals[0])
-        p._intervals[1].extend(self._intervals[1])
+        p = FlippedLabeledAbelianPermutation.__new__(FlippedLabeledAbelianPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._flips = self._flips
+        p._intervals = [self._intervals[0][:], self._intervals[1][:]]
+        p._alphabet = self._alphabet
         return p
 
 
@@ -510,13 +682,13 @@ class FlippedLabeledAbelianPermutation(FlippedLabeledPermutation, FlippedAbelian
         up_letter = self._intervals[0][-1]
         down_letter = self._intervals[1][-1]
 
-        d = dict([(letter,letter) for letter in self._intervals[0]])
-        d[loser_letter] = down_letter + up_letter
+        d = dict([(letter,[letter]) for letter in self._intervals[0]])
+        d[loser_letter] = [down_letter, up_letter]
 
         return WordMorphism(d)
 
         
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -533,10 +705,11 @@ class FlippedLabeledAbelianPermutation(FlippedLabeledPermutation, FlippedAbelian
 
         For more information, try help RauzyDiagram
         """
-        return FlippedLabeledAbelianRauzyDiagram(self)
+        return FlippedLabeledAbelianRauzyDiagram(self, **kwds)
 
 
 class FlippedLabeledQuadraticPermutation(FlippedLabeledPermutation, FlippedQuadraticPermutation) :
+    __slots__ = ()
 
     def copy(self) :
         r"""
@@ -554,17 +727,15 @@ class FlippedLabeledQuadraticPermutation(FlippedLabeledPermutation, FlippedQuadr
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        p = FlippedLabeledQuadraticPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
-        p._flips[0].extend(self._flips[0])
-        p._flips[1].extend(self._flips[1])
-        p._intervals[0].extend(self._intervals[0])
-        p._intervals[1].extend(self._intervals[1])
+        p = FlippedLabeledQuadraticPermutation.__new__(FlippedLabeledQuadraticPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._flips = self._flips
+        p._intervals = [self._intervals[0][:], self._intervals[1][:]]
+        p._alphabet = self._alphabet
         return p
 
         
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -581,7 +752,7 @@ class FlippedLabeledQuadraticPermutation(FlippedLabeledPermutation, FlippedQuadr
 
         For more information, try help RauzyDiagram
         """
-        return FlippedRauzyDiagram(self)
+        return FlippedLabeledQuadraticRauzyDiagram(self, **kwds)
 
 
 ##################################
@@ -595,11 +766,74 @@ class NeighbourError(Exception):
         return self.value
     
 
+def _perron_root(rows, tol=1e-12, max_iter=10000) :
+    r"""
+    Perron root of a primitive nonnegative matrix given by its rows (power
+    iteration).
+    """
+    n = len(rows)
+    v = [1.] * n
+    root = 0.
+    for n_iter in xrange(max_iter) :
+        w = [sum([a*x for a,x in zip(row, v)]) for row in rows]
+        s = sum(w)
+        w = [x / s for x in w]
+        if abs(s - root) <= tol * s : return s
+        root = s
+        v = w
+    return root
+
+
+def _loop_perron_root(item) :
+    r"""
+    Returns (path, Perron root) for an item (path, rows) (the function is at
+    the top level of the module to be used by a pool of processes).
+    """
+    path, rows = item
+    return path, _perron_root(rows)
+
+
+def _is_irreducible(columns) :
+    r"""
+    Test of irreducibility of a nonnegative matrix given by its columns (the
+    graph of its nonzero entries is strongly connected).
+    """
+    n = len(columns)
+    for transpose in (False, True) :
+        seen = [False] * n
+        seen[0] = True
+        stack = [0]
+        while stack :
+            j = stack.pop()
+            for i in xrange(n) :
+                if transpose : a = columns[i][j]
+                else : a = columns[j][i]
+                if a and not seen[i] :
+                    seen[i] = True
+                    stack.append(i)
+        if not all(seen) : return False
+    return True
+
+
+
 class LabeledRauzyDiagram(SageObject) :
     r"""
     Template for Rauzy diagrams of labeled permutations
     """
 
+    def numerize(self, letter) :
+        r"""
+        Returns the indice of a letter in the alphabet of the diagram.
+        """
+        return self._alphabet.rank(letter)
+
+
+    def alphabetize(self, i) :
+        r"""
+        Returns the letter of indice i in the alphabet of the diagram.
+        """
+        return self._alphabet[i]
+
     
     def permutation_to_vertex(self, p) :
         r"""
@@ -670,6 +904,22 @@ class LabeledRauzyDiagram(SageObject) :
         return str(self._neighbours[i])
 
 
+    def _frozen_class(self) :
+        r"""
+        Returns the class of the frozen diagrams built by freeze.
+        """
+        return FrozenLabeledRauzyDiagram
+
+
+    def _last_letters(self, i) :
+        r"""
+        Returns the last letters of the top and of the bottom of the vertex
+        i.
+        """
+        return (self._permutations[i][0].split()[-1],
+                self._permutations[i][1].split()[-1])
+
+
     def path_composition(self, path, function, composition = None) :
         r"""
         Compose an edges function on a path
@@ -704,11 +954,11 @@ class LabeledRauzyDiagram(SageObject) :
             elif (type(step) == tuple) and (len(step) == 2) :
                 for j in range(step[1]) :
                     if composition == None :
-                        result = result * function(i, step)
+                        result = result * function(i, step[0])
                     else :
                         result = composition(result, function(i, step[0]))
-                    if self._neighbours[i][step] == -1 :
-                        raise NeighbourError
+                    if self._neighbours[i][step[0]] == -1 :
+                        raise NeighbourError("No neighbour with this edge type")
                     i = self._neighbours[i][step[0]]
             else : raise TypeError("No neighbour with this edge type")
 
@@ -730,15 +980,16 @@ class LabeledRauzyDiagram(SageObject) :
             sage : d = RauzyDiagram('a b c', 'c b a')
             sage : d.edge_to_substitution(0,1)
         """
-        d = dict([(letter,letter) for letter in self._alphabet])
+        d = dict([(letter,[letter]) for letter in self._alphabet])
         if (i == None) and (winner == None) : return WordMorphism(d)
 
-        loser_letter = self._permutations[i][1-winner][-1]
+        last = self._last_letters(i)
+        loser_letter = last[1-winner]
 
-        up_letter = self._permutations[i][0][-1]
-        down_letter = self._permutations[i][1][-1]
+        up_letter = last[0]
+        down_letter = last[1]
 
-        d[loser_letter] = down_letter + up_letter
+        d[loser_letter] = [down_letter, up_letter]
 
         return WordMorphism(d)
 
@@ -762,8 +1013,9 @@ class LabeledRauzyDiagram(SageObject) :
         """
         if (i == None) and (winner == None) : return identity_matrix(len(self._alphabet))
 
-        winner_index = self.numerize(self._permutations[i][winner][-1])
-        loser_index = self.numerize(self._permutations[i][1-winner][-1])
+        last = self._last_letters(i)
+        winner_index = self.numerize(last[winner])
+        loser_index = self.numerize(last[1-winner])
 
         m = identity_matrix(len(self._alphabet))
         m[winner_index, loser_index] = 1
@@ -782,7 +1034,7 @@ class LabeledRauzyDiagram(SageObject) :
             A list of one letter
         """
         if i == None : return []
-        return [self._permutations[i][winner][-1]]
+        return [self._last_letters(i)[winner]]
 
 
     def edge_to_loser(self, i = None, winner = None) :
@@ -797,7 +1049,7 @@ class LabeledRauzyDiagram(SageObject) :
             A list of one letter
         """
         if i == None : return []
-        return [self._permutations[i][1-winner][-1]]
+        return [self._last_letters(i)[1-winner]]
 
     
     def path_to_winner(self, *args) :
@@ -815,6 +1067,141 @@ class LabeledRauzyDiagram(SageObject) :
     def path_to_matrix(self, *args) :
         return self.path_composition(args, self.edge_to_matrix)
 
+
+    def primitive_loops(self, i=0, max_length=10, processes=None, chunksize=1000) :
+        r"""
+        Iterator over the primitive loops through the vertex i with their
+        Perron root (the dilatation of the corresponding pseudo-Anosov).
+
+        The loops are found by a depth first search of length at most
+        max_length. A branch is cut as soon as it can not come back to i
+        before max_length (the distances to i are computed once). Each loop
+        is given once : a loop which is a rotation (at another passage
+        through i) of a loop with smaller edge types or a power of a shorter
+        loop is skipped. The matrix of the path is updated at each step of
+        the search (the matrix of an edge is the identity plus one entry, so
+        the update costs O(n)) and a loop is kept if its matrix is primitive
+        (as the matrices are bigger than the identity, it means
+        irreducible).
+
+        The Perron roots are computed by power iterations, eventually in a
+        pool of processes. The loops are given as soon as they are found
+        (by chunks when a pool is used).
+
+        INPUT:
+            i -- (defaut: 0) a vertex
+            max_length -- (defaut: 10) the maximal length of the loops
+            processes -- (defaut: None) the number of processes used to
+            compute the Perron roots (None means no pool)
+            chunksize -- (defaut: 1000) the number of loops sent at once to
+            the pool
+
+        OUTPUT:
+            an iterator of 2-uples (path, Perron root), the paths are in the
+            format of path_composition
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b', 'b a')
+            sage : [(path, round(root, 6)) for path,root in d.primitive_loops(0, 2)]
+            [((0, 0, 1), 2.618034)]
+        """
+        loops = self._primitive_loops(i, max_length)
+
+        if processes is None :
+            for path, rows in loops :
+                yield path, _perron_root(rows)
+            return
+
+        from multiprocessing import Pool
+        from itertools import islice
+
+        pool = Pool(processes)
+        try :
+            while True :
+                chunk = list(islice(loops, chunksize * processes))
+                if chunk == [] : break
+                for result in pool.imap(_loop_perron_root, chunk, chunksize) :
+                    yield result
+        finally :
+            pool.terminate()
+
+
+    def _primitive_loops(self, i, max_length) :
+        r"""
+        Iterator over the primitive loops through i (see primitive_loops)
+        with the rows of their matrices.
+        """
+        N = len(self._permutations)
+        n = len(self._alphabet)
+
+        # distances to i (breadth first search on the reversed edges)
+        predecessors = [[] for j in xrange(N)]
+        for j,neighbours in enumerate(self._neighbours) :
+            for k in neighbours :
+                if k >= 0 : predecessors[k].append(j)
+        distance = [-1] * N
+        distance[i] = 0
+        queue = [i]
+        for j in queue :
+            for k in predecessors[j] :
+                if distance[k] == -1 :
+                    distance[k] = distance[j] + 1
+                    queue.append(k)
+
+        # the letters (winner, loser) of each edge
+        letters = {}
+        def edge_letters(j, t) :
+            if (j,t) not in letters :
+                letters[j,t] = (self.numerize(self._permutations[j][t].split()[-1]),
+                                self.numerize(self._permutations[j][1-t].split()[-1]))
+            return letters[j,t]
+
+        # the path : its edge types, its vertices and the columns of the
+        # matrices of its prefixes (t is the next edge type to try)
+        steps = []
+        vertices = [i]
+        columns = [[tuple([int(a == b) for a in xrange(n)]) for b in xrange(n)]]
+        t = 0
+
+        while True :
+            if t == 2 :
+                if steps == [] : return
+                t = steps.pop() + 1
+                vertices.pop()
+                columns.pop()
+                continue
+
+            j = vertices[-1]
+            k = self._neighbours[j][t]
+            if k < 0 or distance[k] == -1 or len(steps) + 1 + distance[k] > max_length :
+                t += 1
+                continue
+
+            # the matrix of the edge is the identity plus the entry (w,l)
+            w, l = edge_letters(j, t)
+            c = columns[-1][:]
+            c[l] = tuple([a + b for a,b in zip(c[l], c[w])])
+
+            steps.append(t)
+            vertices.append(k)
+            columns.append(c)
+            if k == i and self._is_canonical_loop(steps, vertices) and _is_irreducible(c) :
+                yield tuple([i] + steps), [list(row) for row in zip(*c)]
+            t = 0
+
+
+    def _is_canonical_loop(self, steps, vertices) :
+        r"""
+        Test if the loop (steps are the edge types and vertices the vertices
+        visited) is smaller than its rotations at the other passages through
+        its first vertex (which excludes the powers of shorter loops).
+        """
+        i = vertices[0]
+        for k in xrange(1, len(steps)) :
+            if vertices[k] == i and steps[k:] + steps[:k] <= steps :
+                return False
+        return True
+
         
 class LabeledAbelianRauzyDiagram(LabeledRauzyDiagram, RauzyDiagram) :
     r"""
@@ -846,8 +1233,6 @@ class LabeledAbelianRauzyDiagram(LabeledRauzyDiagram, RauzyDiagram) :
             - Vincent Delecroix (2008-12-20)
         """
         self._alphabet = Alphabet(p[0])   # an OrderedAlphabet_Finite
-        self.numerize = lambda l : self._alphabet.rank(l)
-        self.alphabetize = lambda i : self._alphabet[i]
 
     def vertex_to_permutation(self, i) :
         r"""
@@ -910,9 +1295,7 @@ class LabeledQuadraticRauzyDiagram(LabeledRauzyDiagram, RauzyDiagram) :
         for letter in p[0]+p[1] :
             if letter not in tmp_alphabet : tmp_alphabet.append(letter)
 
-        self._alphabet = tmp_alphabet
-        self.numerize = lambda l : self._alphabet.index(i)
-        self.alphabetize = lambda i : self._alphabet[i]
+        self._alphabet = Alphabet(tmp_alphabet)
 
 
     def vertex_to_permutation(self, i) :
@@ -939,12 +1322,116 @@ class LabeledQuadraticRauzyDiagram(LabeledRauzyDiagram, RauzyDiagram) :
 ########
 ## FLIP
 
-class FlippedLabeledRauzyDiagram(FlippedRauzyDiagram, LabeledRauzyDiagram) :
-    def first_vertex(self,p):
-        pass
+class FlippedLabeledRauzyDiagram(LabeledRauzyDiagram, FlippedRauzyDiagram) :
+    r"""
+    Template for Rauzy diagrams of flipped labeled permutations.
+
+    A vertex is stored as (top, bottom, flips) where top and bottom are the
+    strings of labels and flips is the flip mask of the permutation (see
+    FlippedGeneralizedPermutation).
+    """
+    def first_vertex(self, p) :
+        r"""
+        A special intialization before the insertion of the first vertex.
+        """
+        self._alphabet = p._alphabet
+
+
+    def permutation_to_vertex(self, p) :
+        r"""
+        Translation of a flipped labeled permutation to a vertex.
+        """
+        return (' '.join(p._intervals[0]), ' '.join(p._intervals[1]), p._flips)
+
+
+    def _vertex_letters(self, i) :
+        r"""
+        The two lists of letters of the vertex i (with a minus sign for the
+        flipped ones) and the list of flipped letters.
+        """
+        a0 = self._permutations[i][0].split()
+        a1 = self._permutations[i][1].split()
+        flips = self._permutations[i][2]
+
+        l = []
+        flipped = []
+        for p,letter in enumerate(a0 + a1) :
+            if (flips >> p) & 1 :
+                l.append("-" + letter)
+                if letter not in flipped : flipped.append(letter)
+            else :
+                l.append(" " + letter)
+        return [l[:len(a0)], l[len(a0):]], flipped
+
+
+    def vertex_to_str(self, i) :
+        r"""
+        String for the representation of a vertex.
+        """
+        l = self._vertex_letters(i)[0]
+        return ' '.join(l[0]) + "\\n" + ' '.join(l[1])
+
+
+    def vertex_to_one_line_str(self, i) :
+        r"""
+        One line string for the representation of a vertex.
+        """
+        l = self._vertex_letters(i)[0]
+        return ' '.join(l[0]) + ", " + ' '.join(l[1])
+
+
+    def vertex_to_permutation(self, i) :
+        r"""
+        Translation of a vertex indice to a permutation.
+        """
+        a0 = self._permutations[i][0].split()
+        a1 = self._permutations[i][1].split()
+        return self._permutation_class([a0,a1], flips=self._vertex_letters(i)[1])
+
+
 
 class FlippedLabeledAbelianRauzyDiagram(FlippedLabeledRauzyDiagram) :
-    pass
+    r"""
+    Labeled Rauzy diagram of flipped Abelian permutations.
+
+    EXAMPLES:
+        sage : d = RauzyDiagram('a b c d', 'd c b a', flips=['a'])
+        sage : d
+          0 : -a  b  c  d,  d  c  b -a  [1, -2]
+          1 : -a  b  c  d,  d -a  c  b  [2, 3]
+          2 : -a  b  c  d,  d  b -a  c  [0, 2]
+          3 : -a  b  d  c,  d -a  c  b  [3, 1]
+    """
+    _permutation_class = FlippedLabeledAbelianPermutation
+
+
 
 class FlippedLabeledQuadraticRauzyDiagram(FlippedLabeledRauzyDiagram) :
-    pass
+    r"""
+    Labeled Rauzy diagram of flipped quadratic permutations.
+
+    EXAMPLES:
+        sage : d = RauzyDiagram('a b b', 'c c a', flips=['b'])
+    """
+    _permutation_class = FlippedLabeledQuadraticPermutation
+
+
+
+class FrozenLabeledRauzyDiagram(FrozenRauzyDiagram, LabeledRauzyDiagram) :
+    r"""
+    Frozen Rauzy diagram of labeled permutations (see
+    RauzyDiagram.freeze) : the path functions of labeled diagrams read the
+    vertices in the file.
+
+    EXAMPLES:
+        sage : d = RauzyDiagram('a b c d', 'd c b a').freeze()
+        sage : d.path_to_matrix(0, 0, 1) == RauzyDiagram('a b c d', 'd c b a').path_to_matrix(0, 0, 1)
+        True
+    """
+    def _last_letters(self, i) :
+        r"""
+        Returns the last letters of the top and of the bottom of the vertex
+        i.
+        """
+        p = self[i]
+        return (p._intervals[0][-1], p._intervals[1][-1])
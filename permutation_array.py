@@ -0,0 +1,336 @@
+r"""
+Arrays of permutations
+
+    A PermutationArray stores many permutations of the same type and with the
+    same number of intervals in a few flat arrays of integers instead of one
+    object per permutation. A permutation object is only created when an
+    element is accessed. An array of quadratic permutations could also
+    contain Abelian ones (each element is returned with its own type).
+
+    The storage of a permutation is the involution on the 2n extremities of
+    intervals : the positions 0, ..., k-1 are the intervals of the top and
+    the positions k, ..., 2n-1 the ones of the bottom. For each row we keep
+    k, the 2n twin positions, the 2n labels (only for labeled permutations,
+    as indices in a common alphabet) and the 2n flips (only for flipped
+    permutations).
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    sage : a = GeneralizedPermutations(['a b c\\nc b a','a b c\\nc a b'], compact=True)
+    sage : len(a)
+    2
+    sage : a[1]
+    a b c
+    c a b
+
+    The Rauzy moves and the tests are applied to every row by one call. They
+    loop over the rows in Python, on a copy of each row of the flat arrays
+    (see _row) :
+    sage : a.is_rauzy_movable(0)
+    array('b', [1, 1])
+    sage : a.rauzy_move(0)
+    sage : a[1]
+    a b c
+    c b a
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from array import array
+
+from sage import SageObject
+#from sage.structure.sage_object import SageObject
+
+from labeled import LabeledAbelianPermutation, LabeledQuadraticPermutation
+from labeled import FlippedLabeledAbelianPermutation, FlippedLabeledQuadraticPermutation
+from reduced import ReducedAbelianPermutation, ReducedQuadraticPermutation
+from reduced import FlippedReducedAbelianPermutation, FlippedReducedQuadraticPermutation
+from involution import involution_rauzy_movability, involution_rauzy_move
+from involution import involution_reducibility
+
+
+class PermutationArray(SageObject) :
+    r"""
+    Array of permutations of the same type and the same length.
+
+    INPUT:
+        n -- the number of intervals
+        quadratic -- a boolean (defaut: False)
+        reduced -- a boolean (defaut: False)
+        flipped -- a boolean (defaut: False)
+        alphabet -- (defaut: None) the alphabet of reduced permutations or
+        the letters of labeled permutations
+
+    EXAMPLES:
+        sage : a = PermutationArray(3)
+        sage : a.append(['a b c'.split(), 'c b a'.split()])
+        sage : a[0]
+        a b c
+        c b a
+    """
+    def __init__(self, n, quadratic=False, reduced=False, flipped=False, alphabet=None) :
+        self._n = n
+        self._quadratic = quadratic
+        self._reduced = reduced
+        self._flipped = flipped
+
+        self._k = array('i')
+        self._generalized = array('b')
+        self._twin = array('i')
+        self._labels = array('i')
+        self._flips = array('b')
+
+        if alphabet is None :
+            self._alphabet = None
+            self._letters = []
+        else :
+            self._alphabet = alphabet
+            self._letters = list(alphabet)
+        self._rank = dict([(letter,i) for i,letter in enumerate(self._letters)])
+
+
+    @classmethod
+    def from_intervals(cls, data, reduced=False, flips=[], alphabet=None, invalid='raise') :
+        r"""
+        Build an array from an iterable of 2-uples (intervals, generalized).
+
+        The type and the number of intervals of the array are given by the
+        first item and the None items are skipped. An item which does not
+        fit in the array (an other number of intervals or a quadratic item
+        in an Abelian array) raises a ValueError if invalid is 'raise' and
+        is skipped otherwise.
+        """
+        result = None
+        for item in data :
+            if item is None : continue
+            a, generalized = item
+            if result is None :
+                result = cls((len(a[0]) + len(a[1])) // 2, quadratic=generalized,
+                             reduced=reduced, flipped=(flips != []), alphabet=alphabet)
+            if result._fits(a, generalized) :
+                result.append(a, flips)
+            elif invalid == 'raise' :
+                raise ValueError("the permutation does not fit in the array")
+
+        if result is None : result = cls(0, reduced=reduced, flipped=(flips != []), alphabet=alphabet)
+        return result
+
+
+    def __len__(self) :
+        r"""
+        Number of permutations.
+        """
+        return len(self._k)
+
+
+    def __repr__(self) :
+        if self._quadratic : t = "quadratic"
+        else : t = "Abelian"
+        if self._reduced : t = "reduced " + t
+        else : t = "labeled " + t
+        if self._flipped : t = "flipped " + t
+        return "Array of %d %s permutations on %d intervals" %(len(self), t, self._n)
+
+
+    def _fits(self, a, generalized) :
+        r"""
+        Test if a permutation (its two lists of labels and whether it is
+        quadratic) can be added to the array (see append). It is done
+        without exception, for the items of from_intervals.
+        """
+        if len(a[0]) + len(a[1]) != 2*self._n : return False
+        if generalized and not self._quadratic : return False
+        if self._reduced or self._alphabet is None : return True
+        rank = self._rank
+        for letter in a[0] + a[1] :
+            if letter not in rank : return False
+        return True
+
+
+    def append(self, a, flips=[]) :
+        r"""
+        Add a permutation given by its two lists of labels (they must define
+        a valid permutation of the type of the array).
+
+        A ValueError is raised (and the array is not modified) if the
+        permutation has not n intervals, if it is quadratic and the array
+        is Abelian or if a letter is not in the alphabet.
+        """
+        n = self._n
+        k = len(a[0])
+        if k + len(a[1]) != 2*n :
+            raise ValueError("the permutation must have %d intervals" %(n))
+
+        row = [0] * (2*n)
+        first = {}
+        for p,letter in enumerate(a[0] + a[1]) :
+            if letter in first :
+                q = first[letter]
+                row[p] = q
+                row[q] = p
+            else :
+                first[letter] = p
+
+        generalized = (k != n) or any(row[p] < k for p in range(k))
+        if generalized and not self._quadratic :
+            raise ValueError("not an Abelian permutation")
+
+        if not self._reduced :
+            rank = self._rank
+            if self._alphabet is not None :
+                for letter in a[0] + a[1] :
+                    if letter not in rank :
+                        raise ValueError("%s is not in the alphabet" %(str(letter)))
+            for letter in a[0] + a[1] :
+                if letter not in rank :
+                    rank[letter] = len(self._letters)
+                    self._letters.append(letter)
+                self._labels.append(rank[letter])
+
+        self._k.append(k)
+        self._generalized.append(generalized)
+        self._twin.extend(row)
+
+        if self._flipped :
+            flips = set(flips)
+            for letter in a[0] + a[1] :
+                if letter in flips : self._flips.append(-1)
+                else : self._flips.append(1)
+
+
+    def _intervals(self, i) :
+        r"""
+        The two lists of labels of the i-th permutation.
+        """
+        n = self._n
+        k = self._k[i]
+        if self._reduced :
+            if self._alphabet is None : letters = [str(j) for j in range(1,n+1)]
+            else : letters = self._letters
+            twin = self._twin[2*n*i : 2*n*(i+1)]
+            l = [None] * (2*n)
+            i_a = 0
+            for p in range(2*n) :
+                if l[p] is None :
+                    l[p] = l[twin[p]] = letters[i_a]
+                    i_a += 1
+        else :
+            letters = self._letters
+            l = [letters[j] for j in self._labels[2*n*i : 2*n*(i+1)]]
+        return [l[:k], l[k:]]
+
+
+    def __getitem__(self, i) :
+        r"""
+        Build the i-th permutation.
+        """
+        if type(i) != int : raise TypeError("must be an integer")
+        if i < 0 : i += len(self)
+        if (i < 0) or (i >= len(self)) : raise IndexError("index out of range")
+
+        a = self._intervals(i)
+        if self._reduced : alphabet = self._alphabet
+        else : alphabet = None
+
+        if self._flipped :
+            n = self._n
+            flipped = self._flips[2*n*i : 2*n*(i+1)]
+            flips = []
+            for letter,f in zip(a[0] + a[1], flipped) :
+                if (f == -1) and (letter not in flips) : flips.append(letter)
+
+            if self._reduced :
+                if self._generalized[i] : return FlippedReducedQuadraticPermutation(a, alphabet=alphabet, flips=flips)
+                return FlippedReducedAbelianPermutation(a, alphabet=alphabet, flips=flips)
+            if self._generalized[i] : return FlippedLabeledQuadraticPermutation(a, flips=flips)
+            return FlippedLabeledAbelianPermutation(a, flips=flips)
+
+        if self._reduced :
+            if self._generalized[i] : return ReducedQuadraticPermutation(a, alphabet=alphabet)
+            return ReducedAbelianPermutation(a, alphabet=alphabet)
+        if self._generalized[i] : return LabeledQuadraticPermutation(a)
+        return LabeledAbelianPermutation(a)
+
+
+    def __iter__(self) :
+        for i in range(len(self)) :
+            yield self[i]
+
+
+    def _row(self, i) :
+        r"""
+        The 2n twin positions of the i-th permutation (as a list).
+        """
+        N = 2*self._n
+        return self._twin[N*i : N*(i+1)].tolist()
+
+
+    def is_rauzy_movable(self, winner=0) :
+        r"""
+        Test of Rauzy movability of each permutation.
+
+        INPUT:
+            winner -- 0 or 1 (defaut: 0)
+
+        OUTPUT:
+            an array of 0 and 1 (one for each permutation)
+        """
+        result = array('b', [0]) * len(self)
+        for i in range(len(self)) :
+            if involution_rauzy_movability(self._row(i), self._k[i], winner) :
+                result[i] = 1
+        return result
+
+
+    def rauzy_move(self, winner) :
+        r"""
+        Perform a Rauzy move on each permutation.
+
+        The rows which are not Rauzy movable are not modified.
+
+        INPUT:
+            winner -- 0 or 1 or a list of winners (one for each row, None
+            means no move)
+        """
+        N = 2*self._n
+        if type(winner) == int : winners = [winner] * len(self)
+        else : winners = winner
+        if len(winners) != len(self) :
+            raise ValueError("there must be one winner for each row")
+
+        for i in range(len(self)) :
+            w = winners[i]
+            if w is None : continue
+            row = self._row(i)
+            if not involution_rauzy_movability(row, self._k[i], w) : continue
+
+            if self._reduced : labels = None
+            else : labels = self._labels[N*i : N*(i+1)]
+            if self._flipped : flips = self._flips[N*i : N*(i+1)]
+            else : flips = None
+
+            self._k[i] = involution_rauzy_move(row, self._k[i], w, labels, flips)
+
+            self._twin[N*i : N*(i+1)] = array('i', row)
+            if labels is not None : self._labels[N*i : N*(i+1)] = labels
+            if flips is not None : self._flips[N*i : N*(i+1)] = flips
+
+
+    def is_reducible(self) :
+        r"""
+        Test of reducibility of each permutation.
+
+        OUTPUT:
+            an array of 0 and 1 (one for each permutation)
+        """
+        result = array('b', [0]) * len(self)
+        for i in range(len(self)) :
+            if involution_reducibility(self._row(i), self._k[i]) :
+                result[i] = 1
+        return result
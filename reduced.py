@@ -30,6 +30,7 @@ class ReducedPermutation(SageObject) :
 
     ...DO NOT USE...
     """
+    __slots__ = ()
 
     def __init__(self, intervals=None, alphabet=None) :
         r"""
@@ -43,9 +44,6 @@ class ReducedPermutation(SageObject) :
         """
         if intervals is None : intervals = [[],[]]
 
-        self._twin = [[],[]]
-
-
         self._init_twin(intervals)
 
         if alphabet == None :
@@ -56,15 +54,28 @@ class ReducedPermutation(SageObject) :
         else :
             self._alphabet = Alphabet(alphabet)
             if len(alphabet) < len(self) : raise TypeError("The alphabet is too short")
-        
-        self.alphabetize = lambda i : self._alphabet[i]
 
 
-#TODO:    def alphabetize(self) :
-# if there is no _alphabet : just use a standard alphabet
-# it there is just rank it.
+    def alphabetize(self, i) :
+        r"""
+        Returns the letter of the i-th interval.
+        """
+        return self._alphabet[i]
+
+
+    def _buffer_key(self, buffer) :
+        r"""
+        The key of reduced permutations is the list of labels renumbered
+        in their order of apparition.
+        """
+        numbers = {}
+        key = [len(buffer[0])]
+        for i in (0,1) :
+            for label in buffer[i] :
+                if label not in numbers : numbers[label] = len(numbers)
+                key.append(numbers[label])
+        return tuple(key)
 
-       
 
     def get_alphabet(self) :
         r"""
@@ -163,25 +174,7 @@ class ReducedAbelianPermutation(ReducedPermutation, AbelianPermutation):
          4 : b c d a  [4, 5]
          5 : c d b a  [3, 2]
     """
-
-    def copy(self) :
-        r"""
-        Do a copy of the Abelian permutation.
-
-        EXAMPLES :
-            sage : p = GeneralizedPermutation('a b c', 'c b a', reduced = True)
-            sage : q = p.copy()
-            sage : p == q
-            True
-            sage : p.rauzy_move(0)
-            sage : p == q
-            False
-        """
-        p = ReducedAbelianPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
-        p._alphabet = self._alphabet
-        return p
+    __slots__ = ()
 
     
     def __list__(self) :
@@ -189,7 +182,7 @@ class ReducedAbelianPermutation(ReducedPermutation, AbelianPermutation):
         Mutation of the permutation to a list of two lists.
         """
         a0 = map(self.alphabetize, range(0,len(self)))
-        a1 = map(self.alphabetize, self._twin[1])
+        a1 = map(self.alphabetize, self._involution[self._k:])
         return [a0,a1]
         
 
@@ -210,14 +203,14 @@ class ReducedAbelianPermutation(ReducedPermutation, AbelianPermutation):
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        return self._twin[0] == other._twin[0]
+        return self._involution == other._involution
 
 
     def __ne__(self,other) :
         r"""
         Test of difference
         """
-        return self._twin[0] != other._twin[0]
+        return self._involution != other._involution
     
 
     def copy(self) :
@@ -233,15 +226,13 @@ class ReducedAbelianPermutation(ReducedPermutation, AbelianPermutation):
             sage : p == q
             False
         """
-        q = ReducedAbelianPermutation(("",""))
-        q._twin = [self._twin[0][:], self._twin[1][:]]
-        q._alphabet = self._alphabet
-        q.alphabetize = lambda i : self._alphabet[i]
-
-        return q
+        p = ReducedAbelianPermutation.__new__(ReducedAbelianPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._alphabet = self._alphabet
+        return p
         
         
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -264,7 +255,7 @@ class ReducedAbelianPermutation(ReducedPermutation, AbelianPermutation):
         AUTHORS :
             - Vincent Delecroix (2008-12-20)
         """
-        return ReducedAbelianRauzyDiagram(self)
+        return ReducedAbelianRauzyDiagram(self, **kwds)
 
 
 #####################################################################
@@ -286,13 +277,23 @@ def alphabetized_qtwin(twin, alphabet) :
 def numerized_qflips(twin, flips) :
     r"""
     Return a list of flips as numbers.
+
+    INPUT:
+        twin -- the twin of a quadratic permutation
+        flips -- the flip mask (the bit p is set if the interval at position
+        p, top first and then bottom, is flipped)
+
+    EXAMPLES:
+        sage : p = GeneralizedPermutation('a b b', 'c c a', reduced=True, flips=['b'])
+        sage : numerized_qflips(p._twin, p._flips)
+        [2]
     """
-    ntwin = alphabetized_qtwin(twin, range(1,20))  # TO MODIFY !!!
+    n = (len(twin[0]) + len(twin[1])) // 2
+    ntwin = alphabetized_qtwin(twin, range(1,n+1))
     l = []
-    for interval in (0,1) :
-        for j,flip in enumerate (self._flips[i]):
-            if (self._flips == -1) and (ntwin[i][j] not in l) :
-                l.append(ntwin[i][j])
+    for p,number in enumerate(ntwin[0] + ntwin[1]) :
+        if (flips >> p) & 1 and (number not in l) :
+            l.append(number)
     return l
         
 
@@ -358,6 +359,7 @@ class ReducedQuadraticPermutation(ReducedPermutation, QuadraticPermutation):
          2 : ('a a b', 'b c c')  [2, 3]
          3 : ('a a', 'b b c c')  [0, -1]
     """
+    __slots__ = ()
 
     def copy(self) :
         r"""
@@ -375,9 +377,8 @@ class ReducedQuadraticPermutation(ReducedPermutation, QuadraticPermutation):
         AUTHORS :
             - Vincent Delecroix (2008-20-12)
         """
-        p = ReducedQuadraticPermutation(([],[]))
-        p._twin[0].extend(self._twin[0])
-        p._twin[1].extend(self._twin[1])
+        p = ReducedQuadraticPermutation.__new__(ReducedQuadraticPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
         p._alphabet = self._alphabet
         return p
 
@@ -418,17 +419,17 @@ class ReducedQuadraticPermutation(ReducedPermutation, QuadraticPermutation):
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        return (self._twin == other._twin)
+        return (self._k == other._k) and (self._involution == other._involution)
 
 
     def __ne__(self, other) :
         r"""
         Test of difference
         """
-        return (self._twin != other._twin)
+        return (self._k != other._k) or (self._involution != other._involution)
 
 
-    def rauzy_diagram(self) :
+    def rauzy_diagram(self, **kwds) :
         r"""
         Create the Rauzy diagram associated with this permutation
 
@@ -452,7 +453,7 @@ class ReducedQuadraticPermutation(ReducedPermutation, QuadraticPermutation):
             - Vincent Delecroix (2008-12-20)
         """
 
-        return ReducedQuadraticRauzyDiagram(self)
+        return ReducedQuadraticRauzyDiagram(self, **kwds)
 
 
 
@@ -466,13 +467,11 @@ class FlippedReducedPermutation(ReducedPermutation) :
 
     ... DO NOT USE...
     """
-    def __init__(self, intervals=[[],[]], flips=[[],[]], alphabet=None) :
-        self._twin = [[],[]]
+    __slots__ = ()
 
+    def __init__(self, intervals=[[],[]], flips=[], alphabet=None) :
         if alphabet == None : self._init_alphabet(intervals)
         else : self._alphabet = alphabet
-        
-        self.alphabetize = lambda i : self._alphabet[i]
 
         self._init_twin(intervals)
         self._init_flips(intervals, flips)
@@ -490,13 +489,17 @@ class FlippedReducedAbelianPermutation(FlippedReducedPermutation, FlippedAbelian
         -c -a  b
         -c  b -a
     """
+    __slots__ = ()
+
     def _init_alphabet(self,a) :
         r"""
         Intialization procedure of the alphabet of self
         """
         tmp_alphabet = []
+        seen = set()
         for letter in a[0]+a[1] :
-            if letter not in tmp_alphabet :
+            if letter not in seen :
+                seen.add(letter)
                 tmp_alphabet.append(letter)
 
         self._alphabet = tuple(tmp_alphabet)
@@ -506,8 +509,9 @@ class FlippedReducedAbelianPermutation(FlippedReducedPermutation, FlippedAbelian
         r"""
         Mutation of the permutation in a list of two lists
         """
-        a0 = zip(map(self.alphabetize, range(0,len(self))), self._flips[0])
-        a1 = zip(map(self.alphabetize, self._twin[1]), self._flips[1])
+        flips = self._flip_lists()
+        a0 = zip(map(self.alphabetize, range(0,len(self))), flips[0])
+        a1 = zip(map(self.alphabetize, self._involution[self._k:]), flips[1])
         return [a0,a1]
 
     
@@ -515,51 +519,55 @@ class FlippedReducedAbelianPermutation(FlippedReducedPermutation, FlippedAbelian
         r"""
         Tests equality.
         """
-        return (self._twin[0] == other._twin[0]) and (self._flips[0] == other._flips[0])
+        return (self._involution == other._involution) and (self._flips == other._flips)
 
 
     def __ne__(self, other) :
         r"""
         Tests difference.
         """
-        return (self._twin[0] != other._twin[0]) or (self._flips[0] != other._flips[0])
+        return (self._involution != other._involution) or (self._flips != other._flips)
 
 
     def copy(self) :
-        p = FlippedReducedAbelianPermutation()
-        p._twin = [self._twin[0][:], self._twin[1][:]]
-        p._flips = [self._flips[0][:], self._flips[1][:]]
+        p = FlippedReducedAbelianPermutation.__new__(FlippedReducedAbelianPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._flips = self._flips
         p._alphabet = self._alphabet
         return p
 
-    def rauzy_diagram(self):
-        return FlippedReducedAbelianRauzyDiagram(self)
+    def rauzy_diagram(self, **kwds) :
+        return FlippedReducedAbelianRauzyDiagram(self, **kwds)
 
 
 class FlippedReducedQuadraticPermutation(FlippedReducedPermutation, FlippedQuadraticPermutation) :
     r"""
     Flipped Reduced Quadratic Permutation.
     """
+    __slots__ = ()
+
     def __list__(self) :
         r"""
         Mutation of the permutation in a list of two lists.
         """
         i_a = 0
-        l = ([False]*len(self._twin[0]),[False]*len(self._twin[1]))
+        flips = self._flip_lists()
+        twin = self._twin
+        l = ([False]*len(twin[0]),[False]*len(twin[1]))
         # False means empty here
         for i in range(2) :
             for j in range(len(l[i])) :
                if  l[i][j] == False :
-                    l[i][j] = (self.alphabetize(i_a), self._flips[i][j])
-                    l[self._twin[i][j][0]][self._twin[i][j][1]] = (self.alphabetize(i_a), self._flips[i][j])
+                    l[i][j] = (self.alphabetize(i_a), flips[i][j])
+                    l[twin[i][j][0]][twin[i][j][1]] = (self.alphabetize(i_a), flips[i][j])
                     i_a += 1
         return l
 
 
     def copy(self) :
-        p = FlippedReducedQuadraticPermutation()
-        p._twin = [self._twin[0][:], self._twin[1][:]]
-        p._flips = [self._flips[0][:], self._flips[1][:]]
+        p = FlippedReducedQuadraticPermutation.__new__(FlippedReducedQuadraticPermutation)
+        p._set_flat_twin(self._k, self._involution[:])
+        p._flips = self._flips
         p._alphabet = self._alphabet
         return p
 
@@ -569,8 +577,10 @@ class FlippedReducedQuadraticPermutation(FlippedReducedPermutation, FlippedQuadr
         Intialization procedure of the alphabet of self
         """
         tmp_alphabet = []
+        seen = set()
         for letter in a[0]+a[1] :
-            if letter not in tmp_alphabet :
+            if letter not in seen :
+                seen.add(letter)
                 tmp_alphabet.append(letter)
 
         self._alphabet = tuple(tmp_alphabet)
@@ -580,17 +590,17 @@ class FlippedReducedQuadraticPermutation(FlippedReducedPermutation, FlippedQuadr
         r"""
         Tests equality.
         """
-        return (self._twin == other._twin) and (self._flips == other._flips)
+        return (self._k == other._k) and (self._involution == other._involution) and (self._flips == other._flips)
 
 
     def __ne__(self, other) :
         r"""
         Test inequality.
         """
-        return (self._twin != other._twin) or (self._flips != other._flips)
+        return (self._k != other._k) or (self._involution != other._involution) or (self._flips != other._flips)
 
-    def rauzy_diagram(self) :
-        return FlippedReducedQuadraticRauzyDiagram(self)
+    def rauzy_diagram(self, **kwds) :
+        return FlippedReducedQuadraticRauzyDiagram(self, **kwds)
 
 ###################################################
 #############    RAUZY DIAGRAMS    ################
@@ -633,11 +643,11 @@ class ReducedAbelianRauzyDiagram(ReducedRauzyDiagram, RauzyDiagram) :
     """
     
     def permutation_to_vertex(self, p) :
-        return tuple(p._twin[0])
+        return tuple(p._involution[p._k:])
         
 
     def vertex_to_permutation(self, i) :
-        a1 = self._permutations[i]
+        a1 = list(self._permutations[i])
         a0 = range(len(a1))
         alphabet = self.alphabet
         return ReducedAbelianPermutation([a0,a1], alphabet=alphabet)
@@ -682,7 +692,8 @@ class ReducedQuadraticRauzyDiagram(ReducedRauzyDiagram, RauzyDiagram) :
         
 
     def vertex_to_permutation(self, i) :
-        raise NotImplementedError
+        a = alphabetized_qtwin(self._permutations[i], self.alphabet)
+        return ReducedQuadraticPermutation(a, alphabet=self.alphabet)
 
 
     def vertex_to_str(self, i) :
@@ -708,53 +719,53 @@ class FlippedReducedAbelianRauzyDiagram(ReducedRauzyDiagram, FlippedRauzyDiagram
     r"""
     Reduced Rauzy diagram of flipped Abelian permutations.
 
-    EXAMPLES:
-        sage : d = RauzyDiagram('a b c', 'c b a', reduced = True, flips=['a'])
+    A vertex is stored as (twin, flips) where twin is the bottom twin list
+    and flips the flip mask of the top (the bit j is set if the j-th letter
+    is flipped).
 
+    EXAMPLES:
+        sage : d = RauzyDiagram('a b c d', 'd c b a', reduced = True, flips=['a'])
+        sage : d
+         0 :  d  c  b -a   [1, -2]
+         1 :  d -a  c  b   [2, 3]
+         2 :  d  b -a  c   [0, 2]
+         3 :  c -a  d  b   [3, 1]
     """
     
     def permutation_to_vertex(self, p) :
-        flips = [k for k,_ in filter(lambda (i,j) : j == -1, enumerate(p._flips[0]))]
-        return (p._twin[0], flips)
+        return (tuple(p._involution[p._k:]), p._flips & ((1 << len(p)) - 1))
 
 
     def vertex_to_permutation(self, i) :
-        raise NotImplementedError
+        twin, flips = self._permutations[i]
+        a0 = range(len(twin))
+        a1 = list(twin)
+        flips = [j for j in a0 if (flips >> j) & 1]
+        return FlippedReducedAbelianPermutation([a0,a1], flips, alphabet=self.alphabet)
+
+
+    def _vertex_letters(self, i) :
+        r"""
+        The two lists of flipped letters (with a minus sign) of the vertex i.
+        """
+        twin, flips = self._permutations[i]
+        l = [[],[]]
+        for j in range(len(twin)) :
+            if (flips >> j) & 1 : l[0].append("-" + self.alphabetize(j))
+            else : l[0].append(" " + self.alphabetize(j))
+        for j in twin :
+            if (flips >> j) & 1 : l[1].append("-" + self.alphabetize(j))
+            else : l[1].append(" " + self.alphabetize(j))
+        return l
 
 
     def vertex_to_str(self, i) :
-        str0 = ""
-        str1 = ""
-        flips = map(self.alphabetize, self._permutations[i][1])
-  
-        for letter in self.alphabet :
-            if letter in flips :
-                str0 += "-"+letter+" "
-            else :
-                str0 += " "+letter+" "
-
-        for j in self._permutations[i][0] :
-            letter = self.alphabetize(j)
-            if letter in flips :
-                str1 += "-"+letter+" "
-            else :
-                str1 += " "+letter+" "
-            
-        return str0 + "\\n" + str1
+        l = self._vertex_letters(i)
+        return ' '.join(l[0]) + " \\n" + ' '.join(l[1]) + " "
 
 
     def vertex_to_one_line_str(self, i) :
-        str1 = ""
-        flips = map(self.alphabetize, self._permutations[i][1])
-
-        for j in self._permutations[i][0] :
-            letter = self.alphabetize(j)
-            if letter in flips :
-                str1 += "-"+letter+" "
-            else :
-                str1 += " "+letter+" "
-            
-        return str1
+        return ' '.join(self._vertex_letters(i)[1]) + " "
 
 
     def edges_to_str(self, i) :
@@ -768,31 +779,38 @@ class FlippedReducedAbelianRauzyDiagram(ReducedRauzyDiagram, FlippedRauzyDiagram
 
 class FlippedReducedQuadraticRauzyDiagram(ReducedRauzyDiagram, FlippedRauzyDiagram) :
     r"""
-    Reduced Rauzy diagram of flipped Abelian permutations.
+    Reduced Rauzy diagram of flipped quadratic permutations.
+
+    A vertex is stored as (twin, flips) where twin is the twin (as tuples)
+    and flips the flip mask of the permutation.
 
     EXAMPLES:
-        sage : d = RauzyDiagram('a b c', 'c b a', reduced = True, flips=['a'])
+        sage : d = RauzyDiagram('a b b', 'c c a', reduced = True, flips=['b'])
 
     """
     def permutation_to_vertex(self, p) :
-        return (p._twin, p._flips)
+        return ((tuple(p._twin[0]), tuple(p._twin[1])), p._flips)
 
 
     def vertex_to_permutation(self, i) :
-        raise NotImplementedError
+        twin, flips = self._permutations[i]
+        a = alphabetized_qtwin(twin, range(1, len(self.alphabet)+1))
+        flips = [label for p,label in enumerate(a[0] + a[1]) if (flips >> p) & 1]
+        return FlippedReducedQuadraticPermutation(a, flips, alphabet=self.alphabet)
 
 
     def vertex_to_all_str(self, i, separator=" ") :
         s = ["",""]
-        atwin = alphabetized_qtwin(self._permutations[i][0], self.alphabet)
-        flips = self._permutations[i][1]
+        twin, flips = self._permutations[i]
+        atwin = alphabetized_qtwin(twin, self.alphabet)
+        p = 0
         for k in (0,1) :
-            for letter,flip in zip(atwin[k], flips[k]) :
-                if flip == 1 :
-                    s[k] += " "+letter+" "
-                else :
+            for letter in atwin[k] :
+                if (flips >> p) & 1 :
                     s[k] += "-"+letter+" "
-                    
+                else :
+                    s[k] += " "+letter+" "
+                p += 1
             
         return s[0] + separator + s[1]
 
@@ -1,21 +1,305 @@
 SageObject = object
 
 class Alphabet(tuple) :
-    rank = tuple.__getitem__
+    unrank = tuple.__getitem__
 
-    def unrank(self, letter) :
-        l = list(self)
-        return l.index(letter)
+    def rank(self, letter) :
+        return self.index(letter)
 
-class Matrix :
+class CombinatorialObject(SageObject) :
+    r"""
+    Pure python replacement of the Sage combinatorial objects (a wrapper
+    around the list self._list).
+    """
+    def __init__(self, l) :
+        self._list = l
+
+    def __getitem__(self, i) :
+        return self._list[i]
+
+    def __len__(self) :
+        return len(self._list)
+
+    def __iter__(self) :
+        return iter(self._list)
+
+    def __contains__(self, x) :
+        return x in self._list
+
+    def __eq__(self, other) :
+        if isinstance(other, CombinatorialObject) : other = other._list
+        return list(self._list) == list(other)
+
+    def __ne__(self, other) :
+        return not self.__eq__(other)
+
+    def __repr__(self) :
+        return str(list(self._list))
+
+    def index(self, x) :
+        return list(self._list).index(x)
+
+class CombinatorialClass(SageObject) :
     pass
 
-def identity_matrix(*args):
-    raise NotImplementedError
+class Matrix(object) :
+    r"""
+    Pure python replacement of the Sage dense matrices.
+
+    Only what is used in the library is here : creation from a list of rows,
+    access by a 2-uple of indices, product and comparison.
+    """
+    def __init__(self, rows) :
+        self._rows = [list(row) for row in rows]
+
+    def nrows(self) :
+        return len(self._rows)
+
+    def ncols(self) :
+        if self._rows == [] : return 0
+        return len(self._rows[0])
+
+    def rows(self) :
+        return [row[:] for row in self._rows]
+
+    def __getitem__(self, ij) :
+        if type(ij) == tuple :
+            return self._rows[ij[0]][ij[1]]
+        return self._rows[ij][:]
+
+    def __setitem__(self, ij, value) :
+        self._rows[ij[0]][ij[1]] = value
+
+    def __mul__(self, other) :
+        columns = zip(*other._rows)
+        return Matrix([[sum(a*b for a,b in zip(row, col)) for col in columns] for row in self._rows])
+
+    def __eq__(self, other) :
+        return isinstance(other, Matrix) and self._rows == other._rows
+
+    def __ne__(self, other) :
+        return not self.__eq__(other)
+
+    def __repr__(self) :
+        return '\n'.join('[' + ' '.join(map(str,row)) + ']' for row in self._rows)
 
-def WordMorphism(dict) :
-    def __call__(self,w) :
-        raise NotImplementedError
+def identity_matrix(n) :
+    return Matrix([[int(i == j) for j in range(n)] for i in range(n)])
+
+class WordMorphism(object) :
+    r"""
+    Pure python replacement of the Sage word morphisms.
+
+    A morphism is either explicit (given by the images of the letters) or the
+    composition of two morphisms. Compositions are never expanded : the
+    product s * t just creates a node pointing to s and t, so that a morphism
+    is a DAG whose leaves are explicit morphisms (s ** n shares its factors
+    and has only O(log n) nodes).
+
+    For each node, the abelianization (number of occurrences of each letter
+    in the image of each letter) and the lengths of the images are computed
+    once and memoized. They are enough to get the k-th letter of a huge image
+    by descending the DAG, without expanding anything (the cost is linear in
+    the number of elementary morphisms composed, not in the length of the
+    image).
+
+    EXAMPLES:
+        sage : s = WordMorphism({'a': ['a','b'], 'b': ['a']})
+        sage : s('ab')
+        ['a', 'b', 'a']
+        sage : t = s ** 40
+        sage : t.image_length('a')
+        267914296
+        sage : t.image_letter('a', 100000)
+        'b'
+    """
+    def __init__(self, images=None, left=None, right=None) :
+        r"""
+        INPUT:
+            images -- a dictionnary letter -> word (a string or a list of
+            letters)
+            left, right -- two morphisms (for the composition left * right)
+        """
+        if images is not None :
+            self._images = dict([(letter, tuple(image)) for letter,image in images.items()])
+        else :
+            self._images = None
+        self._left = left
+        self._right = right
+        self._counts = None
+        self._lengths = None
+
+    def is_composition(self) :
+        return self._images is None
+
+    def domain(self) :
+        r"""
+        Returns the list of letters on which the morphism is defined.
+        """
+        node = self
+        while node._images is None : node = node._right
+        return node._images.keys()
 
     def __mul__(self, other) :
-        raise NotImplementedError
+        r"""
+        Composition (s * t)(w) = s(t(w)) (no computation is done)
+        """
+        return WordMorphism(left=self, right=other)
+
+    def __pow__(self, n) :
+        r"""
+        n-th iterate of the morphism obtained with O(log n) compositions.
+        """
+        if n < 0 : raise ValueError("the exponent must be non negative")
+        if n == 0 :
+            return WordMorphism(dict([(letter,(letter,)) for letter in self.domain()]))
+        result = None
+        power = self
+        while True :
+            if n & 1 :
+                if result is None : result = power
+                else : result = result * power
+            n >>= 1
+            if n == 0 : return result
+            power = power * power
+
+    def _nodes(self) :
+        r"""
+        Non computed nodes of the DAG under self, children before parents.
+        """
+        order = []
+        seen = set()
+        stack = [(self, False)]
+        while stack :
+            node, expanded = stack.pop()
+            if node._counts is not None : continue
+            if expanded :
+                order.append(node)
+            elif id(node) not in seen :
+                seen.add(id(node))
+                stack.append((node, True))
+                if node._images is None :
+                    stack.append((node._left, False))
+                    stack.append((node._right, False))
+        return order
+
+    def abelianization(self) :
+        r"""
+        Returns a dictionnary letter -> (dictionnary letter -> number of
+        occurrences in the image).
+
+        The result is memoized (as for all the nodes of the DAG).
+        """
+        for node in self._nodes() :
+            if node._images is not None :
+                counts = {}
+                for letter, image in node._images.iteritems() :
+                    c = counts[letter] = {}
+                    for b in image : c[b] = c.get(b,0) + 1
+            else :
+                left_counts = node._left._counts
+                counts = {}
+                for letter, right_count in node._right._counts.iteritems() :
+                    c = counts[letter] = {}
+                    for b, nb in right_count.iteritems() :
+                        for d, nd in left_counts[b].iteritems() :
+                            c[d] = c.get(d,0) + nb * nd
+            node._counts = counts
+            node._lengths = dict([(letter, sum(c.itervalues())) for letter,c in counts.iteritems()])
+        return self._counts
+
+    def image_length(self, w) :
+        r"""
+        Length of the image of a letter (or of a word if w is not a letter).
+        """
+        if self._lengths is None : self.abelianization()
+        if not isinstance(w, (list, tuple)) and w in self._lengths : return self._lengths[w]
+        return sum([self._lengths[letter] for letter in w])
+
+    def _search(self, letter, k, weights) :
+        r"""
+        Returns (b, j) such that the position k in the concatenation of the
+        weights of the letters of self(letter) is the position j in the
+        weight of b.
+        """
+        # the left morphisms still to go through (with their weights)
+        pending = []
+        node = self
+        while True :
+            if node._images is None :
+                # node(letter) = left(right(letter)) : weights of the letters
+                # of right(letter) through left
+                left_weights = {}
+                for b, c in node._left.abelianization().iteritems() :
+                    left_weights[b] = sum([n * weights[d] for d,n in c.iteritems()])
+                pending.append((node._left, weights))
+                node, weights = node._right, left_weights
+                continue
+
+            for b in node._images[letter] :
+                if k < weights[b] : break
+                k -= weights[b]
+            else :
+                raise IndexError("position out of the image")
+            letter = b
+            if not pending : return letter, k
+            node, weights = pending.pop()
+
+    def image_letter(self, w, k) :
+        r"""
+        Returns the k-th letter of the image of w (a letter or a word).
+
+        The image is never expanded : we just descend in the DAG of the
+        compositions using the memoized lengths.
+        """
+        if self._lengths is None : self.abelianization()
+        if not isinstance(w, (list, tuple)) and w in self._lengths : w = (w,)
+        if k < 0 : k += self.image_length(w)
+        for letter in w :
+            if k < self._lengths[letter] : break
+            k -= self._lengths[letter]
+        else :
+            raise IndexError("position out of the image")
+
+        node = self
+        while node._images is None :
+            letter, k = node._right._search(letter, k, node._left._lengths)
+            node = node._left
+        return node._images[letter][k]
+
+    def __call__(self, w) :
+        r"""
+        Returns the image of the word w (as a list of letters).
+        """
+        result = []
+        stack = [(self, letter, None) for letter in reversed(list(w))]
+        while stack :
+            node, letter, after = stack.pop()
+            if node._images is None :
+                stack.append((node._right, letter, (node._left, after)))
+            elif after is None :
+                result.extend(node._images[letter])
+            else :
+                for b in reversed(node._images[letter]) :
+                    stack.append((after[0], b, after[1]))
+        return result
+
+    def __eq__(self, other) :
+        if not isinstance(other, WordMorphism) : return False
+        if self is other : return True
+        if self.abelianization() != other.abelianization() : return False
+        for letter in self.domain() :
+            if self(letter) != other(letter) : return False
+        return True
+
+    def __ne__(self, other) :
+        return not self.__eq__(other)
+
+    def __repr__(self) :
+        images = []
+        for letter in sorted(self.domain()) :
+            if self.image_length(letter) <= 30 :
+                images.append("%s->%s" %(letter, ''.join(map(str,self(letter)))))
+            else :
+                images.append("%s->(%d letters)" %(letter, self.image_length(letter)))
+        return "WordMorphism: " + ', '.join(images)
@@ -0,0 +1,407 @@
+r"""
+Local service of Rauzy diagrams
+
+    A DiagramService keeps the Rauzy diagrams it builds in memory (the least
+    recently used ones are dropped when there are more than cache_size) and
+    answers queries on them : the permutation of a vertex, its neighbours,
+    the index of a permutation, the shortest paths and some statistics. The
+    diagrams never leave the service.
+
+    Identical requests which arrive while the diagram is being built wait
+    for the same build. The builds are done in a pool of processes (the
+    diagrams are sent back with the compact pickling of the diagrams).
+
+    The service speaks JSON-RPC 2.0 over a Unix socket or a TCP socket on
+    localhost, one request (a JSON object) by line and one response by line.
+    Each connection is served by a thread. The methods are :
+        build(top, bottom, reduced=false, flips=[]) -- returns {"diagram" :
+        id, "vertices" : number of vertices}
+        vertex(diagram, i) -- returns [top, bottom] (the flipped intervals
+        are prefixed by '-')
+        neighbours(diagram, i) -- returns [j0, j1] (-1 for no move, -2 for a
+        reducible permutation of a flipped diagram)
+        index(diagram, top, bottom) -- returns the vertex of a permutation
+        (or null)
+        shortest_path(diagram, i, j) -- returns [i, t1, t2, ...] (or null)
+        statistics(diagram) -- returns the numbers of vertices, edges,
+        strongly connected components and sinks
+        service_statistics() -- returns the counts of the service
+
+    The id of a diagram only depends on the request, so a diagram dropped
+    from the cache is built again by the same build request.
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    sage : server = serve('/tmp/rauzy.socket', processes=2)
+    sage : threading.Thread(target=server.serve_forever).start()
+
+    and in another process :
+    sage : c = ServiceClient('/tmp/rauzy.socket')
+    sage : d = c.call('build', top='a b c d', bottom='d c b a')
+    sage : d
+    {u'diagram': u'...', u'vertices': 7}
+    sage : c.call('neighbours', diagram=d['diagram'], i=0)
+    [0, 1]
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from collections import OrderedDict
+from hashlib import sha1
+import inspect
+import json
+import os
+import socket
+import SocketServer
+import threading
+from multiprocessing import TimeoutError
+
+import constructor
+
+
+# the errors of JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+UNKNOWN_DIAGRAM = -32001
+
+
+class ServiceError(Exception) :
+    r"""
+    Error of a request (with its JSON-RPC code).
+    """
+    def __init__(self, code, message) :
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def _str(x) :
+    r"""
+    The strings received in JSON are unicode : the constructor wants str.
+    """
+    if isinstance(x, unicode) : return x.encode('utf-8')
+    return x
+
+
+def _build_diagram(top, bottom, reduced, flips) :
+    r"""
+    Build a Rauzy diagram (in a process of the pool).
+    """
+    return constructor.RauzyDiagram(top, bottom, reduced=reduced, flips=flips)
+
+
+class DiagramService(object) :
+    r"""
+    Rauzy diagrams built on request and kept in a LRU cache.
+
+    INPUT:
+        processes -- (defaut: None) the number of processes of the pool of
+        builds (None means that the builds are done in the thread of the
+        request)
+        cache_size -- (defaut: 32) the maximal number of diagrams kept
+        timeout -- (defaut: 3600) the maximal time in seconds of a build in
+        the pool (the waiting requests get an error after it, for example
+        if a process of the pool died)
+
+    EXAMPLES:
+        sage : s = DiagramService()
+        sage : d = s.build('a b c', 'c b a')
+        sage : s.neighbours(d['diagram'], 0)
+        [1, 2]
+    """
+    def __init__(self, processes=None, cache_size=32, timeout=3600) :
+        self._cache_size = cache_size
+        self._timeout = timeout
+        # the diagrams and their options (reduced, flips)
+        self._cache = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._counts = {'requests' : 0, 'hits' : 0, 'builds' : 0, 'coalesced' : 0, 'evictions' : 0}
+
+        self._pool = None
+        if processes is not None :
+            from multiprocessing import Pool
+            self._pool = Pool(processes)
+
+
+    def close(self) :
+        r"""
+        Stop the pool of processes.
+        """
+        if self._pool is not None :
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+    def call(self, method, params) :
+        r"""
+        Returns the result of a method (params is a dictionnary or a list).
+        """
+        if method.startswith('_') or method not in self.methods :
+            raise ServiceError(METHOD_NOT_FOUND, "no method %s" %(method))
+        f = getattr(self, method)
+        with self._lock :
+            self._counts['requests'] += 1
+        if isinstance(params, dict) :
+            args, kwds = [], dict([(str(k), _str(v)) for k,v in params.items()])
+        else :
+            args, kwds = [_str(v) for v in params], {}
+        try :
+            inspect.getcallargs(f, *args, **kwds)
+        except TypeError, error :
+            raise ServiceError(INVALID_PARAMS, str(error))
+        return f(*args, **kwds)
+
+    methods = ('build', 'vertex', 'neighbours', 'index', 'shortest_path', 'statistics', 'service_statistics')
+
+
+    def _diagram(self, diagram) :
+        r"""
+        Returns the diagram of an id and its options (reduced, flips) (the
+        diagram becomes the most recently used).
+        """
+        with self._lock :
+            entry = self._cache.get(diagram)
+            if entry is None :
+                raise ServiceError(UNKNOWN_DIAGRAM, "unknown diagram (build it again)")
+            del self._cache[diagram]
+            self._cache[diagram] = entry
+            return entry
+
+
+    def _vertex(self, d, i) :
+        if type(i) != int or i < 0 or i >= len(d) :
+            raise ServiceError(INVALID_PARAMS, "no vertex %s" %(i))
+        return i
+
+
+    def build(self, top, bottom, reduced=False, flips=[]) :
+        r"""
+        Build the Rauzy diagram of a permutation (if it is not in the
+        cache) and returns its id and its number of vertices.
+        """
+        flips = sorted(set(map(_str, flips)))
+        try :
+            p = constructor.GeneralizedPermutation(top, bottom, reduced=reduced, flips=flips)
+        except Exception, error :
+            raise ServiceError(INVALID_PARAMS, str(error))
+        diagram = sha1(repr((type(p).__name__, p._key(([],[]))))).hexdigest()
+
+        with self._lock :
+            entry = self._cache.get(diagram)
+            if entry is not None :
+                self._counts['hits'] += 1
+                del self._cache[diagram]
+                self._cache[diagram] = entry
+                return {'diagram' : diagram, 'vertices' : len(entry[0])}
+
+            building = self._building.get(diagram)
+            if building is None :
+                # this request builds the diagram, the others wait for it
+                building = self._building[diagram] = [threading.Event(), None, None]
+                self._counts['builds'] += 1
+                owner = True
+            else :
+                self._counts['coalesced'] += 1
+                owner = False
+
+        if owner :
+            try :
+                if self._pool is None :
+                    d = _build_diagram(top, bottom, reduced, flips)
+                else :
+                    d = self._pool.apply_async(_build_diagram, (top, bottom, reduced, flips)).get(self._timeout)
+                building[1] = d
+            except TimeoutError :
+                building[2] = "no result after %s seconds" %(self._timeout)
+            except Exception, error :
+                building[2] = error
+
+            with self._lock :
+                del self._building[diagram]
+                if building[1] is not None :
+                    self._cache[diagram] = (building[1], (reduced, flips))
+                    while len(self._cache) > self._cache_size :
+                        self._cache.popitem(last=False)
+                        self._counts['evictions'] += 1
+            building[0].set()
+
+        else :
+            building[0].wait()
+
+        if building[2] is not None :
+            raise ServiceError(SERVER_ERROR, "build failed : %s" %(building[2]))
+        return {'diagram' : diagram, 'vertices' : len(building[1])}
+
+
+    def vertex(self, diagram, i) :
+        r"""
+        Returns the permutation of the vertex i as two strings.
+        """
+        d = self._diagram(diagram)[0]
+        return str(d[self._vertex(d, i)]).split('\n')
+
+
+    def neighbours(self, diagram, i) :
+        r"""
+        Returns the two neighbours of the vertex i.
+        """
+        d = self._diagram(diagram)[0]
+        return list(d._neighbours[self._vertex(d, i)])
+
+
+    def index(self, diagram, top, bottom) :
+        r"""
+        Returns the vertex of a permutation (None if it is not in the
+        diagram).
+        """
+        d, (reduced, flips) = self._diagram(diagram)
+        try :
+            p = constructor.GeneralizedPermutation(top, bottom, reduced=reduced, flips=flips)
+        except Exception, error :
+            raise ServiceError(INVALID_PARAMS, str(error))
+        return d._index.get(p._key(([],[])))
+
+
+    def shortest_path(self, diagram, i, j) :
+        r"""
+        Returns the shortest path from i to j (see RauzyDiagram.shortest_path).
+        """
+        d = self._diagram(diagram)[0]
+        path = d.shortest_path(self._vertex(d, i), self._vertex(d, j))
+        if path is None : return None
+        return list(path)
+
+
+    def statistics(self, diagram) :
+        r"""
+        Returns the numbers of vertices, edges, strongly connected
+        components and sinks of a diagram.
+        """
+        d = self._diagram(diagram)[0]
+        components = d.strongly_connected_components()
+        return {'vertices' : len(d),
+                'edges' : sum([j >= 0 for n in d._neighbours for j in n]),
+                'components' : max(components) + 1 if len(components) else 0,
+                'sinks' : len(d.sinks(components))}
+
+
+    def service_statistics(self) :
+        r"""
+        Returns the counts of requests, cache hits, builds, coalesced
+        builds and evictions, and the number of diagrams in the cache.
+        """
+        with self._lock :
+            counts = dict(self._counts)
+            counts['cached'] = len(self._cache)
+        return counts
+
+
+    def handle(self, line) :
+        r"""
+        Returns the response (a JSON string) to a request (a JSON string).
+        """
+        id = None
+        try :
+            try :
+                request = json.loads(line)
+            except ValueError :
+                raise ServiceError(PARSE_ERROR, "parse error")
+            if not isinstance(request, dict) or not isinstance(request.get('method'), basestring) :
+                raise ServiceError(INVALID_REQUEST, "invalid request")
+            id = request.get('id')
+            result = self.call(str(request['method']), request.get('params', {}))
+            response = {'jsonrpc' : '2.0', 'id' : id, 'result' : result}
+        except ServiceError, error :
+            response = {'jsonrpc' : '2.0', 'id' : id, 'error' : {'code' : error.code, 'message' : str(error)}}
+        except Exception, error :
+            response = {'jsonrpc' : '2.0', 'id' : id, 'error' : {'code' : SERVER_ERROR, 'message' : str(error)}}
+        return json.dumps(response)
+
+
+
+class _Handler(SocketServer.StreamRequestHandler) :
+    r"""
+    One request by line, one response by line.
+    """
+    def handle(self) :
+        while True :
+            line = self.rfile.readline()
+            if not line : break
+            if not line.strip() : continue
+            self.wfile.write(self.server.service.handle(line) + '\n')
+            self.wfile.flush()
+
+
+class UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer) :
+    daemon_threads = True
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer) :
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(address, processes=None, cache_size=32, timeout=3600) :
+    r"""
+    Returns a server of a DiagramService (call its method serve_forever).
+
+    INPUT:
+        address -- the path of a Unix socket or a 2-uple (host, port)
+        processes -- (defaut: None) see DiagramService
+        cache_size -- (defaut: 32) see DiagramService
+        timeout -- (defaut: 3600) see DiagramService
+    """
+    if isinstance(address, tuple) :
+        server = TCPServer(address, _Handler)
+    else :
+        if os.path.exists(address) : os.remove(address)
+        server = UnixServer(address, _Handler)
+    server.service = DiagramService(processes, cache_size, timeout)
+    return server
+
+
+
+class ServiceClient(object) :
+    r"""
+    Client of a DiagramService served by serve.
+
+    INPUT:
+        address -- the path of a Unix socket or a 2-uple (host, port)
+    """
+    def __init__(self, address) :
+        if isinstance(address, tuple) :
+            self._socket = socket.create_connection(address)
+        else :
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(address)
+        self._file = self._socket.makefile('rb')
+        self._id = 0
+
+
+    def call(self, method, *args, **kwds) :
+        r"""
+        Returns the result of a method of the service (the arguments are
+        given by position or by name). A ServiceError is raised for an
+        error.
+        """
+        self._id += 1
+        request = {'jsonrpc' : '2.0', 'id' : self._id, 'method' : method, 'params' : kwds or list(args)}
+        self._socket.sendall(json.dumps(request) + '\n')
+        response = json.loads(self._file.readline())
+        if 'error' in response :
+            raise ServiceError(response['error']['code'], response['error']['message'])
+        return response['result']
+
+
+    def close(self) :
+        self._file.close()
+        self._socket.close()
@@ -9,7 +9,6 @@ every method here start with the special word 'twin'.
 TODO:
     Construct the inheritance as combinatorial types inclusion
     (to allow stratas manipulations)
-    Have an independent flip tableau (to have the same _twin_rauzy_move
 
     Wrap the twin : not access 'directly' to it (it will be defined in C later).
 
@@ -30,9 +29,23 @@ TODO:
 #*****************************************************************************
 
 from string import replace
+from array import array
+from time import time
+import os
+import zlib
+import cPickle
+import mmap
+import struct
+import tempfile
 
 from sage import SageObject
 #from sage.structure.sage_object import SageObject
+from sage import Alphabet
+#from sage.combinat.words.alphabet import Alphabet
+
+from involution import involution_loser_to, involution_rauzy_movability
+from involution import involution_rauzy_move, involution_reducibility
+from involution import quadratic_reducibility
 
 
 defaut_alphabet = Alphabet("123456789")
@@ -43,6 +56,29 @@ defaut_alphabet = Alphabet("123456789")
 # think about alphabetize.
 
 
+def _typecode(n) :
+    r"""
+    Returns the smallest typecode of array for the integers 0, ..., n-1.
+    """
+    if n <= 0x100 : return 'B'
+    if n <= 0x10000 : return 'H'
+    return 'i'
+
+
+def _unpickle_permutation(cls, k, typecode, involution, flips, alphabet, labels) :
+    r"""
+    Rebuild a permutation pickled by GeneralizedPermutation.__reduce__.
+    """
+    p = cls.__new__(cls)
+    p._set_flat_twin(k, array('i', array(typecode, involution)))
+    if alphabet is not None : p._alphabet = alphabet
+    if flips is not None : p._flips = flips
+    if labels is not None :
+        labels = [alphabet[i] for i in array(typecode, labels)]
+        p._intervals = [labels[:k], labels[k:]]
+    return p
+
+
 def is_GeneralizedPermutation(obj):
     r"""
     Returns True if obj is a Generalized Permutation
@@ -60,13 +96,18 @@ class GeneralizedPermutation(SageObject) :
     r"""
     General template for all types of GeneralizedPermutation.
     """
+    # all the data of the subclasses (which must not add any other attribute) :
+    # the twins are the involution of the positions (top first and then
+    # bottom, see _set_flat_twin) and the length _k of the top
+    __slots__ = ('_k', '_involution', '_flips', '_alphabet', '_intervals')
+
     def __repr__(self) :
         l = list(self)
         return ' '.join(map(str,l[0])) + "\n" + ' '.join(map(str,l[1]))
 
 
     def __len__(self) :
-        return (len(self._twin[0]) + len(self._twin[1])) / 2
+        return len(self._involution) / 2
 
 
     def length_top(self) :
@@ -85,7 +126,7 @@ class GeneralizedPermutation(SageObject) :
             p.length_top()
             7
         """
-        return len(self._twin[0])
+        return self._k
 
 
     def length_bottom(self) :
@@ -104,7 +145,7 @@ class GeneralizedPermutation(SageObject) :
             sage : p.length_bottom()
             3
         """
-        return len(self._twin[1])
+        return len(self._involution) - self._k
 
 
     def length(self, interval=None) :
@@ -132,9 +173,11 @@ class GeneralizedPermutation(SageObject) :
 
         """
         if interval == None :
-            return len(self._twin[0]),len(self._twin[1])
+            return self._k, len(self._involution) - self._k
+        elif interval == 0 :
+            return self._k
         else :
-            return len(self._twin[interval])
+            return len(self._involution) - self._k
             
 
 
@@ -170,17 +213,364 @@ class GeneralizedPermutation(SageObject) :
             return s[i[0]][i[1]]
 
 
+    def __reduce__(self) :
+        r"""
+        Compact pickling (for the exchanges between processes).
+
+        The twin is stored as a string of integers (the position of the
+        twin of each position, top first and then bottom, see _set_flat_twin)
+        with the flip mask, the alphabet and the numbers in the alphabet of
+        the labels of the intervals (only for labeled permutations).
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : cPickle.loads(cPickle.dumps(p, 2)) == p
+            True
+        """
+        return (_unpickle_permutation, self._compact_state())
+
+
+    def _compact_state(self, alphabet=None) :
+        r"""
+        Returns the arguments of _unpickle_permutation (see __reduce__).
+
+        INPUT:
+            alphabet -- (defaut: None) the alphabet in which the labels are
+            numbered (the one of self if None)
+        """
+        k = self._k
+        involution = self._involution
+        typecode = _typecode(len(involution))
+        if alphabet is None : alphabet = getattr(self, '_alphabet', None)
+
+        labels = None
+        if hasattr(self, '_intervals') :
+            rank = dict([(letter,i) for i,letter in enumerate(alphabet)])
+            labels = array(typecode, [rank[letter] for letter in self._intervals[0] + self._intervals[1]]).tostring()
+
+        return (type(self), k, typecode, array(typecode, involution).tostring(),
+                getattr(self, '_flips', None), alphabet, labels)
+
+
+    def _set_flat_twin(self, k, involution) :
+        r"""
+        Set the twins from the length of the top and the involution of the
+        positions (the position p < k is the position p of the top and the
+        position p >= k is the position p-k of the bottom).
+
+        The involution (an array('i')) is the only storage of the twins : it
+        is modified in place by the Rauzy moves.
+        """
+        self._k = k
+        self._involution = involution
+
+
+    def _init_twin(self, a=None) :
+        r"""
+        Initialization of the twins from the lists of labels of the top and
+        of the bottom.
+        """
+        if a is None : a = [[],[]]
+
+        labels = a[0] + a[1]
+        involution = array('i', [0]) * len(labels)
+        first = {}
+        # position of the first occurence of each letter
+        for p,c in enumerate(labels) :
+            if c in first :
+                involution[p] = first[c]
+                involution[first[c]] = p
+            else :
+                first[c] = p
+
+        self._set_flat_twin(len(a[0]), involution)
+
+
+    @property
+    def _twin(self) :
+        r"""
+        The twins as two lists (top and bottom), built from the involution
+        (see _twin_lists) for the code which does not use the involution.
+        """
+        return self._twin_lists()
+
+
+    def _winner_flipped(self, winner) :
+        r"""
+        Returns True if the winner of a Rauzy move is flipped.
+
+        The function is redefined in the flipped class.
+        """
+        return False
+
+
+    def _get_loser_to(self, winner) :
+        r"""
+        Returns the new position (interval, position) of the loser of a
+        Rauzy move (see involution.involution_loser_to).
+        """
+        to_pos, k = involution_loser_to(self._involution, self._k, winner, self._winner_flipped(winner))[1:]
+        if to_pos < k : return (0, to_pos)
+        return (1, to_pos - k)
+
+
+    def is_rauzy_movable(self, winner=0) :
+        r"""
+        Test of Rauzy movability (see involution.involution_rauzy_movability).
+
+        INPUT:
+            winner -- (defaut: 0) 0 or 1
+
+        OUTPUT:
+            a boolean
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : p.is_rauzy_movable(1)
+            True
+            sage : p = GeneralizedPermutation('a b c', 'b a c')
+            sage : p.is_rauzy_movable(0)
+            False
+            sage : p = GeneralizedPermutation('a b b', 'c c a')
+            sage : p.is_rauzy_movable(1)
+            True
+        """
+        return involution_rauzy_movability(self._involution, self._k, winner)
+
+
     def rauzy_move(self, winner) :
         loser_to = self._get_loser_to(winner)
-        # beware here, loser_to can contain 2 or 3 items
-        # (depending on the presence of flip)
 
-        self._twin_rauzy_move(winner, loser_to)
-        
+        self._k = involution_rauzy_move(self._involution, self._k, winner)
+
         if hasattr(self, '_move_data') :
             self._move_data((winner, self.length_top() - 1),
                            (1-winner, self.length_bottom() - 1),
-                           loser_to[:2])
+                           loser_to)
+
+
+    def rauzy_moves(self, winners, backend='list') :
+        r"""
+        Perform a sequence of Rauzy moves.
+
+        With the backend 'tree' the moves are done on a TwinTree (see
+        twin_tree.py) : each move costs O(log n) instead of O(n) and self is
+        updated once at the end (in O(n)). It is faster for long walks on
+        permutations with thousands of intervals.
+
+        INPUT:
+            winners -- an iterable of 0 and 1
+            backend -- (defaut: 'list') 'list' or 'tree'
+
+        A ValueError is raised if a move is not possible (self is then the
+        permutation obtained after the previous moves).
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c d', 'd c b a')
+            sage : p.rauzy_moves([0, 1, 1], backend='tree')
+            sage : p
+            a b c d
+            d a c b
+        """
+        if backend == 'list' :
+            for winner in winners :
+                if not self.is_rauzy_movable(winner) :
+                    raise ValueError("the permutation is not Rauzy movable")
+                self.rauzy_move(winner)
+            return
+
+        if backend != 'tree' :
+            raise ValueError("backend must be 'list' or 'tree'")
+
+        t = self.twin_tree()
+        try :
+            for winner in winners :
+                if not t.is_rauzy_movable(winner) :
+                    raise ValueError("the permutation is not Rauzy movable")
+                t.rauzy_move(winner)
+        finally :
+            self._set_twin_tree(t)
+
+
+    def twin_tree(self) :
+        r"""
+        Returns the twins of self stored in a TwinTree.
+
+        The labels of the tree are the positions of the first occurrences
+        of the letters (top first and then bottom).
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b b', 'c c a')
+            sage : p.twin_tree().twin(1)
+            2
+        """
+        from twin_tree import TwinTree
+
+        twin = self._involution
+        k = self._k
+        labels = [min(p,q) for p,q in enumerate(twin)]
+        flips = getattr(self, '_flips', 0)
+        flips = [labels[p] for p in range(len(twin)) if (flips >> p) & 1]
+        return TwinTree([labels[:k], labels[k:]], flips=flips)
+
+
+    def _set_twin_tree(self, t) :
+        r"""
+        Set the twin (and the labels and the flips) from a TwinTree built
+        by twin_tree().
+        """
+        if hasattr(self, '_intervals') :
+            old = self._involution
+            letters = self._intervals[0] + self._intervals[1]
+            letter = dict([(min(p,q), letters[p]) for p,q in enumerate(old)])
+
+        a = t.intervals()
+        k = len(a[0])
+        self._set_flat_twin(k, array('i', t.twin_list()))
+
+        if hasattr(self, '_intervals') :
+            self._intervals = [[letter[x] for x in a[0]], [letter[x] for x in a[1]]]
+
+        if hasattr(self, '_flips') :
+            f = t.flips()
+            self._flips = 0
+            for p,flip in enumerate(f[0] + f[1]) :
+                if flip == -1 : self._flips |= 1 << p
+
+
+    def involution(self) :
+        r"""
+        Returns the permutation stored as one flat involution (see
+        involution.GeneralizedPermutation).
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : p.involution().twin(0)
+            5
+        """
+        from involution import GeneralizedPermutation
+        return GeneralizedPermutation.from_permutation(self)
+
+
+    def singularities(self) :
+        r"""
+        Returns the orders of the singularities of the suspensions of the
+        permutation (in decreasing order, 0 for the marked points). The
+        permutation must be irreducible (a reducible one has no suspension)
+        and not flipped (the suspensions of a flipped permutation are not
+        translation or half-translation surfaces, a ValueError is raised).
+
+        The sides of the suspension polygon are the intervals (the top and
+        the bottom ones), the two sides of an interval are glued by a
+        translation (one on the top, one on the bottom) or by a half turn
+        (both on the same line). The corners around a singularity are found
+        by turning around it and each corner between two intervals of the
+        same line is one vertical separatrix of the singularity : a
+        singularity of an Abelian differential of order k has 2(k+1) of
+        them and a singularity of a quadratic differential of order k has
+        k+2 of them.
+
+        OUTPUT:
+            a list of integers
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c d', 'd c b a')
+            sage : p.singularities()
+            [2]
+            sage : p = GeneralizedPermutation('a a b', 'b c c')
+            sage : p.singularities()
+            [-1, -1, -1, -1]
+        """
+        if isinstance(self, FlippedGeneralizedPermutation) :
+            raise ValueError("a flipped permutation has no stratum")
+
+        involution = self._involution
+        l = self._k
+        N = len(involution)
+
+        # the ends of the sides are 2p (left) and 2p+1 (right) for the
+        # position p, the corner of an end is given by its other end
+        corner = [0] * (2*N)
+        for p in range(N) :
+            if p != 0 and p != l : corner[2*p] = 2*p - 1
+            if p != l-1 and p != N-1 : corner[2*p+1] = 2*p + 2
+        corner[0], corner[2*l] = 2*l, 0
+        corner[2*l-1], corner[2*N-1] = 2*N-1, 2*l-1
+
+        def glue(e) :
+            p, end = e // 2, e % 2
+            q = involution[p]
+            if (p < l) == (q < l) : return 2*q + 1 - end
+            return 2*q + end
+
+        interior = lambda e : e not in (0, 2*l, 2*l-1, 2*N-1)
+
+        orders = []
+        seen = [False] * (2*N)
+        for e in range(2*N) :
+            if seen[e] : continue
+
+            # turn around the singularity (and mark the turn in the other
+            # direction)
+            separatrices = 0
+            f = e
+            while not seen[f] :
+                seen[f] = True
+                seen[corner[f]] = True
+                separatrices += interior(f)
+                f = corner[glue(f)]
+
+            if isinstance(self, AbelianPermutation) : orders.append(separatrices // 2 - 1)
+            else : orders.append(separatrices - 2)
+
+        orders.sort(reverse=True)
+        return orders
+
+
+    def stratum(self) :
+        r"""
+        Returns the stratum of the suspensions of the permutation as a
+        string (see singularities, a ValueError is raised for a flipped
+        permutation).
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : p.stratum()
+            'H(0, 0)'
+        """
+        if isinstance(self, AbelianPermutation) : letter = 'H'
+        else : letter = 'Q'
+        return letter + '(' + ', '.join(map(str, self.singularities())) + ')'
+
+
+    def _key(self, buffer) :
+        r"""
+        Returns a hashable key of the permutation (two permutations are equal
+        if and only if they have the same key).
+
+        INPUT:
+            buffer -- a 2-uple of lists used as working space
+        """
+        self._fill_buffer(buffer)
+        return self._buffer_key(buffer)
+
+
+    def _rauzy_move_key(self, winner, buffer) :
+        r"""
+        Returns the key of the permutation obtained after a Rauzy move.
+
+        The permutation is not modified (and no permutation is created) :
+        the move is done on the labels written in buffer.
+
+        INPUT:
+            winner -- 0 or 1
+            buffer -- a 2-uple of lists used as working space
+        """
+        loser_interval_to, loser_position_to = self._get_loser_to(winner)[:2]
+        self._fill_buffer(buffer)
+
+        buffer[loser_interval_to].insert(loser_position_to, buffer[1-winner].pop())
+        return self._buffer_key(buffer)
 
 
 def is_AbelianPermutation(obj):
@@ -210,15 +600,17 @@ class AbelianPermutation(GeneralizedPermutation) :
     AUTHORS:
         - Vincent Delecroix (2008-12-20)
     """
-    def _init_twin(self, a=None):
-        if a is None : a = [[],[]]
+    __slots__ = ()
 
-        self._twin = [a[0][:],a[1][:]]
-        for i in range(len(self._twin[0])) :
-            c = self._twin[0][i]
-            j = self._twin[1].index(c)
-            self._twin[0][i] = j
-            self._twin[1][j] = i
+
+    def _twin_lists(self) :
+        r"""
+        Returns the twins as two lists : the position in the bottom of the
+        twin of each top interval and the position in the top of the twin of
+        each bottom interval.
+        """
+        k = self._k
+        return [[j - k for j in self._involution[:k]], self._involution[k:].tolist()]
 
 
     def _init_alphabet(self,a) :
@@ -230,34 +622,13 @@ class AbelianPermutation(GeneralizedPermutation) :
         self._alphabet = Alphabet(a[0])
 
 
-    def _get_loser_to(self, winner) :
-        r"""
-        This function return the position of the future loser position.
-
-        The function is redefined in the flipped class.
-        """
-        return (1-winner, self._twin[winner][-1]+1)
-        
-
-    def _twin_rauzy_move(self, winner_interval, loser_to) :
+    def _fill_buffer(self, buffer) :
         r"""
-        Do a Rauzy move (only on the twin_list) for this choice of winner.
+        Write labels of the intervals in buffer[0] and buffer[1] (the labels
+        are the positions in the top interval).
         """
-        loser_interval = 1 - winner_interval
-
-        loser_twin_interval = winner_interval
-        loser_twin_position = self._twin[loser_interval][-1]
-
-        loser_interval_to, loser_position_to = loser_to
-
-        # move the loser
-        del self._twin[loser_interval][-1]
-        self._twin[loser_interval_to].insert(loser_position_to, loser_twin_position)
-        self._twin[loser_twin_interval][loser_twin_position] = loser_position_to
-
-        # increment the twins in the winner interval
-        for j in range(loser_position_to + 1, self.length(loser_interval_to)) :
-            self._twin[winner_interval][self._twin[loser_interval_to][j]] += 1
+        buffer[0][:] = range(self._k)
+        buffer[1][:] = self._involution[self._k:]
 
 
     def is_reducible(self, return_decomposition=False) :
@@ -279,59 +650,16 @@ class AbelianPermutation(GeneralizedPermutation) :
             sage : p.is_reducible()
             True
         """
+        if not return_decomposition :
+            return involution_reducibility(self._involution, self._k)
+
         s0, s1 = 0, 0
         for i in range(len(self)-1) :
             s0 += i
-            s1 += self._twin[0][i]
+            s1 += self._involution[i] - self._k
             if s0 == s1 :
-                if return_decomposition :
-                    return True, (self[0][:i+1], self[0][i+1:], self[1][:i+1], self[1][i+1:])
-                return True
-        if return_decomposition :
-            return False, None
-        return False
-
-
-    def is_rauzy_movable(self, winner=0) :
-        r"""
-        Test of Rauzy movability (with an eventual specified choice of winner)
-
-        An abelian permutation is rauzy_movable with 0 and 1 type
-        simultaneously. But, for compatibility with quadratic permutations, a
-        winner could be specified.
-
-        A Rauzy move can be performed on an abelian permutation if and only the
-        two extremities intervals don't have the same label.
-
-        remark : rauzy_movability implies reducibility
-        
-        INPUT:
-            eventually a winner : 0 or 1
-
-        OUTPUT:
-            a boolean
-
-        EXAMPLES:
-            sage : p = GeneralizedPermutation('a b c', 'c b a')
-            sage : p.is_rauzy_movable()
-            True
-            sage : p.is_rauzy_movable(0)
-            True
-            sage : p.is_rauzy_movable(1)
-            True
-
-            sage : p = GeneralizedPermutation('a b c', 'b a c')
-            sage : p.is_rauzy_movable()
-            False
-            sage : p.is_rauzy_movable(0)
-            False
-            sage : p.is_rauzy_movable(1)
-            False
-
-        AUTHORS:
-            - Vincent Delecroix (2008-12-20)
-        """
-        return self._twin[winner][-1] != len(self._twin[winner]) - 1
+                return True, (self[0][:i+1], self[0][i+1:], self[1][:i+1], self[1][i+1:])
+        return False, None
 
 
     def strata(self) :
@@ -384,28 +712,17 @@ class QuadraticPermutation(GeneralizedPermutation) :
 
     ...DO NOT USE...
     """
+    __slots__ = ()
 
 
-    def _init_twin(self,a):
-        # creation of the twin
-        self._twin = [[],[]]
-        l = [[(0,j) for j in range(len(a[0]))],[(1,j) for j in range(len(a[1]))]]
-        for i in range(2) :
-            for j in range(len(l[i])) :
-                if l[i][j] == (i,j) :
-                    if a[i][j] in a[i][j+1:] :
-                        # two up or two down
-                        j2 = (a[i][j+1:]).index(a[i][j]) + j + 1
-                        l[i][j] = (i,j2)
-                        l[i][j2] = (i,j)
-                    else :
-                        # one up, one down (here i=0)
-                        j2 = a[1].index(a[i][j])
-                        l[0][j] = (1,j2)
-                        l[1][j2] = (0,j)
-
-        self._twin[0] = l[0]
-        self._twin[1] = l[1]
+    def _twin_lists(self) :
+        r"""
+        Returns the twins as two lists : the twin (interval, position) of
+        each top interval and of each bottom interval.
+        """
+        k = self._k
+        twin = [(0,j) if j < k else (1,j-k) for j in self._involution]
+        return [twin[:k], twin[k:]]
 
 
     def _init_alphabet(self, intervals) :
@@ -415,8 +732,10 @@ class QuadraticPermutation(GeneralizedPermutation) :
         assignement to self._alphabet.
         """
         tmp_alphabet = []
+        seen = set()
         for letter in intervals[0] + intervals[1] :
-            if letter not in tmp_alphabet :
+            if letter not in seen :
+                seen.add(letter)
                 tmp_alphabet.append(letter)
 
         self._alphabet = Alphabet(tmp_alphabet)
@@ -456,158 +775,49 @@ class QuadraticPermutation(GeneralizedPermutation) :
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        l0 = self.length_top()
-        l1 = self.length_bottom()
-        s = list(self)
-
-        # testing no corner empty eventually one or two on the left
-        A11, A12, A21, A22 = [], [], [], []
-        for i1 in range(0, l0) :
-            if (i1 > 0) and (s[0][i1-1] in A11) :
-                A11 = []
-                break
-            A11 = s[0][:i1]
-
-            for i2 in range(l0 - 1, i1 - 1, -1) :
-                if s[0][i2] in A12 :
-                    A12 = []
-                    break
-                A12 = s[0][i2:]
-
-              
-                for i3 in range(0, l1) :
-                    if (i3 > 0) and (s[1][i3-1] in A21) :
-                        A21 = []
-                        break
-                    A21 = s[1][:i3]
-
-                    
-                    for i4 in range(l1 - 1, i3 - 1, -1) :
-                        if s[1][i4] in A22 :
-                            A22 = []
-                            break
-                        A22 = s[1][i4:]
-    
-
-                        if sorted(A11 + A22) == sorted(A12 + A21) :
-                            if return_decomposition :
-                                return True, (A11,A12,A21,A22)
-                            return True
-
-                    else : A22 = []
-                else : A21 = []
-            else : A12 = []
-        else : A11 = []        
-
-
-        # testing two corners empty on the right (i2 = i4 = 0)
-        A11, A21 = s[0][:1], s[1][:1]
-
-        for i1 in range(1, l0) :
-            if s[0][i1-1] in A11 :
-                A11 = s[0][:1]
-                break
-            A11 = s[0][:i1]
-
-            
-            for i3 in range(1, l1) :
-                if s[1][i3-1] in A21 :
-                    A21 = s[1][:1]
-                    break
-                A21 = s[1][:i3]
-
-                if sorted(A11)  == sorted(A21) :
-                    if return_decomposition :
-                        return True,(A11,A12,A21,A22)
-                    return True
-            else : A11 = s[0][:1]
-        else : A21 = s[1][:1]
-                
-        if return_decomposition :
-            return False, ()
-        return False
-
-
-    def is_rauzy_movable(self,winner) :
-        r"""
-        Test of Rauzy movability (with an eventual specified choice of winner)
-
-        A quadratic (or generalized) permutation is rauzy_movable with 0 and 1
-        type depending on the possible length of the last interval. It's
-        depend of the length equation.
-
-        INPUT:
-            a winner : 0 or 1
-
-        OUTPUT:
-            a boolean
-
-        EXAMPLES:
-            sage : p = GeneralizedPermutation('a b b', 'c c a')
-            sage : p.is_reducible()
-            False
-            sage : p = GeneralizedPermutation('a b c', 'b a c')
-            sage : p.is_reducible()
-            True
-
-        AUTHORS:
-            - Vincent Delecroix (2008-12-20)
-        """
-        loser = 1 - winner
-        
-        # the same letter at the right-end (False)
-        if (self._twin[0][-1][0] == 1) and (self._twin[0][-1][1] == self.length_bottom() - 1) :
-            return False
-        
-        # the winner (or loser) letter is repeated on the other interval (True)
-        if self._twin[winner][-1][0] == loser : return True
-        if self._twin[loser][-1][0] == winner : return True
-
-        # the loser letters is the only letter repeated in the loser interval (False)
-        if [i for i,_ in self._twin[loser]].count(loser) == 2 :
-            return False
+        if not return_decomposition :
+            return involution_reducibility(self._involution, self._k)
+        return quadratic_reducibility(list(self), True)
 
-        return True
 
-
-    def _get_loser_to(self, winner) :
+    def _fill_buffer(self, buffer) :
         r"""
-        This function return the position of the future loser position.
-
-        The function is redefined in the flipped class.
+        Write labels of the intervals in buffer[0] and buffer[1] (the label
+        of an interval is the position of its first occurrence).
         """
-        loser = 1 - winner
-        
-        if self._twin[winner][-1][0] == loser :
-            return (loser, self._twin[winner][-1][1] + 1)
-        else :
-            return (winner, self._twin[winner][-1][1])
+        k = self._k
+        labels = [min(p,q) for p,q in enumerate(self._involution)]
+        buffer[0][:] = labels[:k]
+        buffer[1][:] = labels[k:]
 
-        
-
-    def _twin_rauzy_move(self, winner_interval, loser_to) :
-        loser_interval = 1 - winner_interval
 
-        loser_interval_to, loser_position_to = loser_to
-        loser_twin_interval, loser_twin_position = self._twin[loser_interval][-1]
+###################
+##### FLIPPED #####
+###################
+def _move_bit(mask, from_pos, to_pos) :
+    r"""
+    Move the bit of mask at from_pos to to_pos (the bits between are shifted).
+    """
+    bit = (mask >> from_pos) & 1
+    mask = (mask & ((1 << from_pos) - 1)) | ((mask >> (from_pos + 1)) << from_pos)
+    return (mask & ((1 << to_pos) - 1)) | ((mask >> to_pos) << (to_pos + 1)) | (bit << to_pos)
 
-        # increment the twins in the winner interval
-        interval = [(self._twin[loser_interval_to][j], j) for j in range(loser_position_to, len(self._twin[loser_interval_to]))]
-        for (i,j),k in interval : self._twin[i][j] = (loser_interval_to, k+1)
-        
-        # prepare the loser new position in its twin
-        self._twin[loser_twin_interval][loser_twin_position] = loser_to
 
-        # move the loser
-        loser_twin = self._twin[loser_interval][-1]
-        self._twin[loser_interval_to].insert(loser_position_to, loser_twin)
-        del self._twin[loser_interval][-1]
+def _flips_rauzy_move(mask, winner_pos, loser_pos, twin_pos, to_pos) :
+    r"""
+    Returns the flip mask after a Rauzy move.
 
+    The positions are the ones of the winner, the loser and the twin of the
+    loser before the move and the new position of the loser (see
+    FlippedGeneralizedPermutation._flip_positions). The new flip of the loser
+    is the product of the flips of the winner and the loser (a xor of bits).
+    """
+    flip = ((mask >> winner_pos) ^ (mask >> loser_pos)) & 1
+    mask &= ~((1 << loser_pos) | (1 << twin_pos))
+    mask |= (flip << loser_pos) | (flip << twin_pos)
+    return _move_bit(mask, loser_pos, to_pos)
 
 
-###################
-##### FLIPPED #####
-###################
 def _labelize_flip(t) :
     if t[1] == 1 :
         return ' ' + str(t[0])
@@ -619,9 +829,10 @@ class FlippedGeneralizedPermutation(GeneralizedPermutation) :
     r"""
     General template for all flipped types
 
-    flip is integrated in the twin with 1 or -1
+    the flips are stored in the integer _flips : the bit p is set if the
+    interval at position p (top first, then bottom) is flipped
     """
-    pass
+    __slots__ = ()
 
 
     def __repr__(self) :
@@ -646,104 +857,143 @@ class FlippedGeneralizedPermutation(GeneralizedPermutation) :
     def rauzy_move(self, winner) :
         loser_to = self._get_loser_to(winner)
 
-        self._flip_rauzy_move(winner, loser_to)
-        self._twin_rauzy_move(winner, loser_to)
-        
+        flips = self._flips_after_rauzy_move(winner)
+        self._k = involution_rauzy_move(self._involution, self._k, winner, flipped=self._winner_flipped(winner))
+        self._flips = flips
+
         if hasattr(self, '_move_data') :
             self._move_data((winner, self.length_top() - 1),
                            (1-winner, self.length_bottom() - 1),
                            loser_to)
 
 
-    def _init_flips(self, a, flips):
-        self._flips = [a[0][:],a[1][:]]
-        for k in range(2) :
-            for i,c in enumerate(self._flips[k]) :
-                if c in flips :
-                    flip = -1
-                else :
-                    flip = 1
-                self._flips[k][i] = flip
-
+    def _key(self, buffer) :
+        r"""
+        Returns a hashable key of the permutation (see
+        GeneralizedPermutation._key).
+        """
+        self._fill_buffer(buffer)
+        return (self._buffer_key(buffer), self._flips)
 
 
+    def _rauzy_move_key(self, winner, buffer) :
+        r"""
+        Returns the key of the permutation obtained after a Rauzy move (see
+        GeneralizedPermutation._rauzy_move_key).
+        """
+        loser_to = self._get_loser_to(winner)
+        flips = self._flips_after_rauzy_move(winner)
 
-class FlippedAbelianPermutation(AbelianPermutation, FlippedGeneralizedPermutation) :
-    r"""
-    General template for all flipped abelian permutation
-    
-    ...DO NOT USE...
+        self._fill_buffer(buffer)
+        buffer[loser_to[0]].insert(loser_to[1], buffer[1-winner].pop())
+        return (self._buffer_key(buffer), flips)
 
-    TODO :
-      the _twin and the _flips lists must be implemented with Pyrex
-      (or Cython) as a tableau.
-    """
 
+    def _position(self, interval, position) :
+        r"""
+        Position of an interval in the concatenation of the top and the
+        bottom (the position of its bit in the flip mask).
+        """
+        if position < 0 : position += self.length(interval)
+        if interval == 1 : position += self._k
+        return position
 
-    def _get_loser_to(self, winner) :
+
+    def _flip(self, interval, position) :
         r"""
-        This function return the position of the future loser position.
+        Returns the flip (1 or -1) of the interval at the given position.
         """
-        if self._flips[winner][-1] == 1 :
-            # non flipped winner
-            return (1-winner, self._twin[winner][-1]+1)
-        else :
-            # flipped winner
-            return (1-winner, self._twin[winner][-1])
-        
+        if (self._flips >> self._position(interval, position)) & 1 : return -1
+        return 1
 
-    def _flip_rauzy_move(self, winner, loser_to) :
-        loser = 1 - winner
 
-        loser_twin_interval, loser_twin_position = winner, self._twin[loser][-1]
-        loser_interval_to, loser_position_to = loser_to
+    def _flip_lists(self) :
+        r"""
+        Returns the flips (1 or -1) as two lists.
+        """
+        k = self._k
+        l = [1 - 2*((self._flips >> p) & 1) for p in range(len(self._involution))]
+        return [l[:k], l[k:]]
 
-        flip = self._flips[winner][-1] * self._flips[loser][-1]
 
-        self._flips[loser_twin_interval][loser_twin_position] = flip
+    def _winner_flipped(self, winner) :
+        r"""
+        Returns True if the winner of a Rauzy move is flipped.
+        """
+        return self._flip(winner, -1) == -1
 
-        del self._flips[loser][-1]
-        self._flips[loser_interval_to].insert(loser_position_to, flip)
-        
 
+    def _flip_positions(self, winner) :
+        r"""
+        Returns the positions (in the flip mask) involved in a Rauzy move :
+        the winner, the loser, the twin of the loser and the new position of
+        the loser.
+        """
+        involution = self._involution
+        winner_pos = self._position(winner, -1)
+        from_pos, to_pos = involution_loser_to(involution, self._k, winner, self._winner_flipped(winner))[:2]
+        return (winner_pos, from_pos, involution[from_pos], to_pos)
 
 
-class FlippedQuadraticPermutation(QuadraticPermutation, FlippedGeneralizedPermutation) :
-    """Everything concerning the twin list is here"""
+    def _flips_after_rauzy_move(self, winner) :
+        r"""
+        Returns the flip mask after a Rauzy move.
 
+        The bit p of the mask is set if the interval at position p (top
+        first, then bottom) is flipped.
+        """
+        return _flips_rauzy_move(self._flips, *self._flip_positions(winner))
 
-    def _get_loser_to(self, winner) :
+
+    def _init_flips(self, a, flips):
+        flips = set(flips)
+        self._flips = 0
+        for p,c in enumerate(a[0] + a[1]) :
+            if c in flips : self._flips |= 1 << p
+
+
+    def flip_layers_rauzy_diagram(self, reducible=False) :
         r"""
-        This function return the position of the future loser position.
+        Returns the flipped Rauzy diagrams of all the flips of self as one
+        graph (the flips of self are ignored).
 
-        The function is redefined in the flipped class.
+        INPUT:
+            reducible -- (defaut: False) allow or not reducible permutations
+
+        OUTPUT:
+            a FlipLayersRauzyDiagram
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a', flips=['a'])
+            sage : d = p.flip_layers_rauzy_diagram()
+            sage : d.vertex(0)
+            (0, 0)
         """
-        loser = 1 - winner
-        
-        if self._twin[winner][-1][0] == loser :
-            if self._flips[winner][-1] == 1 :
-                return (loser, self._twin[winner][-1][1] + 1)
-            else :
-                return (loser, self._twin[winner][-1][1])
-        else :
-            if self._flips[winner][-1] == 1 :
-                return (winner, self._twin[winner][-1][1])
-            else :
-                return (winner, self._twin[winner][-1][1] + 1)
+        return FlipLayersRauzyDiagram(self, reducible)
 
 
-    def _flip_rauzy_move(self, winner, loser_to) :
-        loser = 1 - winner
 
-        loser_twin_interval, loser_twin_position = self._twin[loser][-1]
-        loser_interval_to, loser_position_to = loser_to
 
-        flip = self._flips[winner][-1] * self._flips[loser][-1]
+class FlippedAbelianPermutation(AbelianPermutation, FlippedGeneralizedPermutation) :
+    r"""
+    General template for all flipped abelian permutation
+    
+    ...DO NOT USE...
+
+    TODO :
+      the _twin lists must be implemented with Pyrex (or Cython) as a
+      tableau.
+    """
+    __slots__ = ()
+
+
+
+class FlippedQuadraticPermutation(QuadraticPermutation, FlippedGeneralizedPermutation) :
+    """Everything concerning the twin list is here"""
+    __slots__ = ()
+
 
-        self._flips[loser_twin_interval][loser_twin_position] = flip
 
-        del self._flips[loser][-1]
-        self._flips[loser_interval_to].insert(loser_position_to, flip)
 
 
 ##############################
@@ -753,15 +1003,32 @@ class RauzyDiagram(SageObject) :
     r"""
     General template for Rauzy Diagram
     """
-    def __init__(self, p) :
-        self._permutations = [p.copy()]
-        self._neighbours = [[None,None]]
+    def __init__(self, p, **kwds) :
+        r"""
+        INPUT:
+            p -- a permutation
+            kwds -- the options of complete (progress, budgets and
+            cancellation)
+        """
+        self._permutations = []
+        self._neighbours = []
 
-        self.complete()
+        # index of the vertices from their keys and working space for the
+        # computation of the keys (see GeneralizedPermutation._key)
+        self._index = {}
+        self._buffer = ([],[])
+
+        # the vertices before _cursor are explored (their neighbours are
+        # known) and the ones before _stored are in the vertex storage (the
+        # others are permutations)
+        self._cursor = 0
+        self._stored = 0
+
+        self.add_vertex(p.copy())
 
         self._n = len(p)
         self.first_vertex(self._permutations[0])
-        self._permutations = map(self.permutation_to_vertex, self._permutations)
+        self.complete(**kwds)
 
 
     def __repr__(self) :
@@ -810,7 +1077,8 @@ class RauzyDiagram(SageObject) :
         return len(self._permutations)
 
 
-    def complete(self) :
+    def complete(self, progress=None, progress_interval=1000, max_vertices=None, max_time=None, cancel=None,
+                 checkpoint=None, checkpoint_interval=60.) :
         r"""
         Completion of the Rauzy diagram.
 
@@ -819,47 +1087,295 @@ class RauzyDiagram(SageObject) :
         functions __getitem__ and is_rauzy_movable and rauzy_move which must
         be defined for child and their corresponding permutation types.
 
+        The key of a neighbour is computed without doing the move (see
+        GeneralizedPermutation._rauzy_move_key) and a new permutation is
+        created only if the key is not yet in the diagram.
+
+        The completion stops when the number of vertices reaches
+        max_vertices (it could be exceeded by the two neighbours of the last
+        vertex explored), after max_time seconds or when cancel is set. The
+        diagram is then partial : the vertices of the frontier (see
+        frontier) have no neighbours yet and a new call to complete resumes
+        the exploration.
+
+        INPUT:
+            progress -- (defaut: None) a function called every
+            progress_interval explored vertices and at the end, with a
+            dictionnary whose keys are 'vertices' (the number of vertices
+            discovered), 'explored', 'frontier' (the number of vertices to
+            explore), 'time' (seconds) and 'rate' (explored vertices by
+            second)
+            progress_interval -- (defaut: 1000) see progress
+            max_vertices -- (defaut: None) a maximal number of vertices
+            max_time -- (defaut: None) a maximal time in seconds
+            cancel -- (defaut: None) an object with a method is_set (for
+            example a threading.Event) to cancel the completion
+            checkpoint -- (defaut: None) a file name where the diagram is
+            saved every checkpoint_interval seconds and at the end (see
+            save_checkpoint and load_checkpoint)
+            checkpoint_interval -- (defaut: 60.) see checkpoint
+
+        OUTPUT:
+            True if the diagram is complete and False otherwise
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c d e', 'e d c b a')
+            sage : d = RauzyDiagram('a b c d e', 'e d c b a', max_vertices=10)
+            sage : d.is_complete()
+            False
+            sage : d.complete()
+            True
+
+            sage : d = RauzyDiagram('a b c d e', 'e d c b a', max_vertices=10, checkpoint='d.ckpt')
+            sage : d = load_checkpoint('d.ckpt')
+            sage : d.complete(checkpoint='d.ckpt')
+            True
+
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        i = 0
-        N = len(self._permutations)
+        start = last_checkpoint = time()
+        explored = 0
+        i = self._cursor
+
+        while i < len(self._permutations) :
+            if max_vertices is not None and len(self._permutations) >= max_vertices : break
+            if max_time is not None and time() - start >= max_time : break
+            if cancel is not None and cancel.is_set() : break
+
+            if i < self._stored :
+                # an unexplored vertex of a partial diagram
+                p = self.vertex_to_permutation(i)
+            else :
+                p = self._permutations[i]
+            self._complete_vertex(i, p)
+
+            i += 1
+            self._cursor = i
+            explored += 1
+            if progress is not None and explored % progress_interval == 0 :
+                progress(self._progress(explored, start))
+            if checkpoint is not None and time() - last_checkpoint >= checkpoint_interval :
+                self.save_checkpoint(checkpoint)
+                last_checkpoint = time()
 
-        while i < N :
-            p = self._permutations[i]
+        self._store()
+        if checkpoint is not None : self.save_checkpoint(checkpoint)
+        if progress is not None : progress(self._progress(explored, start))
+        return self.is_complete()
 
-            for t in (0,1) :
-                if p.is_rauzy_movable(t) :
+
+    def _complete_vertex(self, i, p) :
+        r"""
+        Compute the neighbours of the vertex i (the permutation p) and add
+        the new ones to the diagram.
+        """
+        for t in (0,1) :
+            if p.is_rauzy_movable(t) :
+                key = p._rauzy_move_key(t, self._buffer)
+                j = self._index.get(key)
+                if j is None :
                     q = p.copy()
                     q.rauzy_move(t)
-                    j = self.add_vertex(q)
-                    self._neighbours[i][t] = j
-                else :
-                    self._neighbours[i][t] = -1
-                
-            i += 1
-            N = len(self._permutations)
+                    j = self.add_vertex(q, key)
+                self._neighbours[i][t] = j
+            else :
+                self._neighbours[i][t] = -1
 
 
-    def add_vertex(self, p) :
+    def _progress(self, explored, start) :
         r"""
-        Add a vertex if it's not yet in and return the corresponding index
+        Returns the dictionnary given to the progress function of complete.
+        """
+        t = time() - start
+        N = len(self._permutations)
+        return {'vertices' : N,
+                'explored' : self._cursor,
+                'frontier' : N - self._cursor,
+                'time' : t,
+                'rate' : (t > 0 and explored / t) or 0.}
+
+
+    def _store(self) :
+        r"""
+        Translate the new vertices from permutations to the vertex storage.
+        """
+        for j in xrange(self._stored, len(self._permutations)) :
+            self._permutations[j] = self.permutation_to_vertex(self._permutations[j])
+        self._stored = len(self._permutations)
+
+
+    def save_checkpoint(self, filename) :
+        r"""
+        Save the diagram (complete or not) in a file.
+
+        The vertices are first translated to the vertex storage. The file
+        contains the attributes of the diagram, the vertices, the table of
+        neighbours as an array of integers and the cursor of the completion
+        (pickled and compressed). The index of the vertices is not saved : it
+        is computed again by load_checkpoint.
+
+        The file is written under a temporary name and then renamed, so that
+        an interruption never leaves a broken checkpoint.
+
+        INPUT:
+            filename -- a file name
+        """
+        f = open(filename + '.tmp', 'wb')
+        f.write(zlib.compress(cPickle.dumps(self._state(), 2)))
+        f.close()
+        os.rename(filename + '.tmp', filename)
+
+
+    # the attributes which are not saved (see _state)
+    _computed_attributes = ('_permutations', '_neighbours', '_index', '_buffer')
+
+    def _state(self) :
+        r"""
+        Returns the data saved by save_checkpoint and pickle : the class,
+        the attributes (but the ones of _computed_attributes), the vertices
+        and the table of neighbours as a string of integers (-3 for the
+        neighbours of the unexplored vertices).
+        """
+        self._store()
+
+        state = dict(self.__dict__)
+        for name in self._computed_attributes :
+            del state[name]
+
+        neighbours = array('i')
+        for n in self._neighbours :
+            for j in n :
+                if j is None : neighbours.append(-3)
+                else : neighbours.append(j)
+
+        return (type(self), state, self._permutations, neighbours.tostring())
+
 
-        (perhaps a try...except is less performant than a count)
+    def _compute_index(self) :
+        r"""
+        Compute the index of the vertices from their keys.
+        """
+        self._buffer = ([],[])
+        self._index = {}
+        for j in xrange(len(self._permutations)) :
+            self._index[self.vertex_to_permutation(j)._key(self._buffer)] = j
+
+
+    def __reduce__(self) :
+        r"""
+        Compact pickling (for the exchanges between processes).
+
+        The vertices are pickled in their storage, the neighbours as a string
+        of integers and the index of the vertices is computed again (see
+        _state).
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : e = cPickle.loads(cPickle.dumps(d, 2))
+            sage : e._neighbours == d._neighbours
+            True
+        """
+        return (_diagram_from_state, self._state())
+
+
+    def _frozen_class(self) :
+        r"""
+        Returns the class of the frozen diagrams built by freeze (it gives
+        them the functions of the type of self which read the vertices).
+        """
+        return FrozenRauzyDiagram
+
+
+    def freeze(self, filename=None) :
+        r"""
+        Write the diagram in a file and returns it as a FrozenRauzyDiagram.
+
+        The file is mapped in memory (read only). Processes which attach to
+        the same file (a FrozenRauzyDiagram is pickled as its file name)
+        share the pages of the vertices and of the neighbours.
+
+        INPUT:
+            filename -- (defaut: None) the name of the file (a temporary file
+            if None)
+
+        OUTPUT:
+            a FrozenRauzyDiagram
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c d', 'd c b a').freeze()
+            sage : d[3] == RauzyDiagram('a b c d', 'd c b a')[3]
+            True
+            sage : d.remove()
+        """
+        if not self.is_complete() : raise ValueError("the diagram is not complete")
+        if filename is None :
+            fd, filename = tempfile.mkstemp(suffix='.frozen')
+            os.close(fd)
+
+        n = len(self)
+        p = self[0]
+        cls, k, typecode, involution, flips, alphabet, labels = p._compact_state()
+        N = len(p._involution)
+        flip_bytes = (flips is not None) and (N + 7) // 8
+        width = array(typecode).itemsize * (N + 1) + (labels is not None and len(labels)) + flip_bytes
+
+        header = cPickle.dumps({'cls' : cls, 'alphabet' : alphabet, 'typecode' : typecode,
+                                'size' : n, 'length' : N, 'labeled' : labels is not None,
+                                'flip_bytes' : flip_bytes, 'width' : width, 'n' : self._n,
+                                'frozen' : self._frozen_class(),
+                                'diagram_alphabet' : getattr(self, '_alphabet', None)}, 2)
+        header += '\0' * (-len(header) % 8)
+
+        f = open(filename + '.tmp', 'wb')
+        f.write(struct.pack('<Q', len(header)) + header)
+        f.write(self._adjacency().tostring())
+        for i in xrange(n) :
+            cls, k, typecode, involution, flips, alphabet, labels = self[i]._compact_state(alphabet)
+            f.write(array(typecode, [k]).tostring() + involution)
+            if labels is not None : f.write(labels)
+            if flip_bytes : f.write(''.join([chr((flips >> (8*b)) & 0xff) for b in xrange(flip_bytes)]))
+        f.close()
+        os.rename(filename + '.tmp', filename)
+
+        return FrozenRauzyDiagram(filename)
+
+
+    def is_complete(self) :
+        r"""
+        Returns True if all the vertices are explored (see complete).
+        """
+        return self._cursor == len(self._permutations)
+
+
+    def frontier(self) :
+        r"""
+        Returns the list of vertices which are not yet explored (their
+        neighbours are None).
+        """
+        return range(self._cursor, len(self._permutations))
+
+
+    def add_vertex(self, p, key=None) :
+        r"""
+        Add a vertex if it's not yet in and return the corresponding index
 
         INPUT:
-            A permutations
+            p -- a permutation
+            key -- (defaut: None) the key of p if it is already computed
 
         AUTHORS:
             - Vincent Delecroix (2008-20-12)
         """
-        try :
-            return self._permutations.index(p)
+        if key is None : key = p._key(self._buffer)
 
-        except ValueError :
+        j = self._index.get(key)
+        if j is None :
+            j = len(self._permutations)
+            self._index[key] = j
             self._permutations.append(p)
             self._neighbours.append([None,None])
-            return len(self._permutations) - 1
+        return j
 
 
     def vertex_to_permutation(self, i) :
@@ -908,6 +1424,296 @@ class RauzyDiagram(SageObject) :
         pass
 
 
+    def _adjacency(self) :
+        r"""
+        Returns the table of neighbours as one array : the neighbours of the
+        vertex i are at positions 2i and 2i+1 (negative if there is no edge).
+        """
+        a = array('i')
+        for n in self._neighbours : a.extend(n)
+        return a
+
+
+    def _bfs(self, sources) :
+        r"""
+        Breadth first search from the vertices of sources.
+
+        OUTPUT:
+            a 2-uple of arrays indexed by vertices : the distances (-1 for
+            the vertices which are not reachable) and the edges followed to
+            reach the vertices (2j+t for the edge of type t from the vertex
+            j, -1 for the sources)
+        """
+        N = len(self._permutations)
+        adj = self._adjacency()
+        distance = array('i', [-1]) * N
+        edge = array('i', [-1]) * N
+
+        queue = array('i')
+        for i in sources :
+            if distance[i] == -1 :
+                distance[i] = 0
+                queue.append(i)
+
+        head = 0
+        while head < len(queue) :
+            i = queue[head]
+            head += 1
+            for e in (2*i, 2*i+1) :
+                j = adj[e]
+                if j >= 0 and distance[j] == -1 :
+                    distance[j] = distance[i] + 1
+                    edge[j] = e
+                    queue.append(j)
+
+        return distance, edge
+
+
+    def distances(self, sources) :
+        r"""
+        Distances from a set of vertices (the length of the shortest path
+        from one of them).
+
+        INPUT:
+            sources -- a vertex or a list of vertices
+
+        OUTPUT:
+            an array (of type 'i') indexed by vertices (-1 for the vertices
+            which are not reachable)
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : list(d.distances(0))
+            [0, 1, 1]
+        """
+        if type(sources) == int : sources = [sources]
+        return self._bfs(sources)[0]
+
+
+    def _path_from_edges(self, edge, i, j) :
+        r"""
+        Returns the path from i to j read in the edges of a breadth first
+        search from i (see _bfs).
+        """
+        steps = []
+        while j != i :
+            e = edge[j]
+            steps.append(e % 2)
+            j = e // 2
+        steps.reverse()
+        return tuple([i] + steps)
+
+
+    def shortest_path(self, i, j) :
+        r"""
+        Returns a shortest path from the vertex i to the vertex j.
+
+        The path is a tuple (i, t1, t2, ...) of the starting vertex followed
+        by the types of the edges, as accepted by path_composition.
+
+        INPUT:
+            i, j -- two vertices
+
+        OUTPUT:
+            a tuple or None if j is not reachable from i
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : d.shortest_path(1, 2)
+            (1, 0, 1)
+        """
+        distance, edge = self._bfs([i])
+        if distance[j] == -1 : return None
+        return self._path_from_edges(edge, i, j)
+
+
+    def shortest_loop(self, i) :
+        r"""
+        Returns a shortest (non empty) loop through the vertex i.
+
+        INPUT:
+            i -- a vertex
+
+        OUTPUT:
+            a tuple (i, t1, t2, ...) as in shortest_path or None if there is
+            no loop through i
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : d.shortest_loop(1)
+            (1, 1)
+        """
+        best = None
+        for t in (0,1) :
+            j = self._neighbours[i][t]
+            if j < 0 : continue
+            path = self.shortest_path(j, i)
+            if path is not None and (best is None or len(path) < len(best)) :
+                best = (i, t) + path[1:]
+        return best
+
+
+    def distance_table(self) :
+        r"""
+        Returns the table of distances between all pairs of vertices.
+
+        The table is stored as an array of unsigned shorts : the distance
+        from i to j is at the position i*N + j where N is the number of
+        vertices and 65535 stands for no path. The memory needed is 2N^2
+        bytes.
+
+        OUTPUT:
+            an array (of type 'H')
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : list(d.distance_table())
+            [0, 1, 1, 1, 0, 2, 1, 2, 0]
+        """
+        N = len(self._permutations)
+        table = array('H')
+        for i in xrange(N) :
+            distance = self._bfs([i])[0]
+            if max(distance) >= 65535 : raise ValueError("distances too big for the table")
+            table.extend([(x == -1 and 65535) or x for x in distance])
+        return table
+
+
+    def strongly_connected_components(self) :
+        r"""
+        Returns the strongly connected components of the diagram.
+
+        The algorithm is the one of Tarjan written without recursion (so
+        that the size of the diagram is not limited by the recursion limit).
+        The components are numbered in reverse topological order : there is
+        no edge from a component to a component with a bigger number.
+
+        OUTPUT:
+            an array (of type 'i') of component numbers indexed by vertices
+
+        EXAMPLES:
+            sage : d = RauzyDiagram('a b c', 'c b a')
+            sage : list(d.strongly_connected_components())
+            [0, 0, 0]
+        """
+        N = len(self._permutations)
+        adj = self._adjacency()
+
+        index = array('i', [-1]) * N
+        low = array('i', [0]) * N
+        component = array('i', [-1]) * N
+        stack = array('i')
+        n_index = 0
+        n_component = 0
+
+        for s in xrange(N) :
+            if index[s] != -1 : continue
+
+            index[s] = low[s] = n_index
+            n_index += 1
+            stack.append(s)
+            # the call stack : vertices and next edge to explore
+            calls = array('i', [s])
+            edges = array('i', [0])
+
+            while calls :
+                v = calls[-1]
+                t = edges[-1]
+                if t < 2 :
+                    edges[-1] = t + 1
+                    w = adj[2*v + t]
+                    if w < 0 : continue
+                    if index[w] == -1 :
+                        index[w] = low[w] = n_index
+                        n_index += 1
+                        stack.append(w)
+                        calls.append(w)
+                        edges.append(0)
+                    elif component[w] == -1 and index[w] < low[v] :
+                        # w is on the stack
+                        low[v] = index[w]
+                else :
+                    calls.pop()
+                    edges.pop()
+                    if low[v] == index[v] :
+                        w = -1
+                        while w != v :
+                            w = stack.pop()
+                            component[w] = n_component
+                        n_component += 1
+                    if calls and low[v] < low[calls[-1]] :
+                        low[calls[-1]] = low[v]
+
+        return component
+
+
+    def condensation(self, components=None) :
+        r"""
+        Returns the condensation of the diagram (the graph of its strongly
+        connected components, which has no cycle).
+
+        INPUT:
+            components -- (defaut: None) the result of
+            strongly_connected_components if it is already computed
+
+        OUTPUT:
+            a list indexed by components of the sorted lists of the
+            components that follow them
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a')
+            sage : d = p.rauzy_diagram()
+            sage : d.condensation()
+            [[]]
+        """
+        if components is None : components = self.strongly_connected_components()
+        n = max(components) + 1 if len(components) else 0
+
+        successors = [set() for c in xrange(n)]
+        for i,neighbours in enumerate(self._neighbours) :
+            c = components[i]
+            for j in neighbours :
+                if j >= 0 and components[j] != c : successors[c].add(components[j])
+        return [sorted(l) for l in successors]
+
+
+    def sinks(self, components=None) :
+        r"""
+        Returns the strongly connected components with no edge to another
+        component.
+
+        INPUT:
+            components -- (defaut: None) the result of
+            strongly_connected_components if it is already computed
+
+        OUTPUT:
+            a list of component numbers
+        """
+        return [c for c,l in enumerate(self.condensation(components)) if l == []]
+
+
+    def loop_counts(self, components=None) :
+        r"""
+        Returns the number of loops (edges from a vertex to itself) in each
+        strongly connected component.
+
+        INPUT:
+            components -- (defaut: None) the result of
+            strongly_connected_components if it is already computed
+
+        OUTPUT:
+            a list indexed by components
+        """
+        if components is None : components = self.strongly_connected_components()
+        n = max(components) + 1 if len(components) else 0
+
+        counts = [0] * n
+        for i,neighbours in enumerate(self._neighbours) :
+            for j in neighbours :
+                if j == i : counts[components[i]] += 1
+        return counts
+
+
     def dot(self,
             edge0_label = "", edge0_style = "dotted",
             edge1_label = "", edge1_style = "bold",
@@ -991,14 +1797,14 @@ class RauzyDiagram(SageObject) :
         s += "\n\t/* edges of type 0 */\n"
         s += "\tedge [%s];\n" %(edge0_properties)
         for i,n in enumerate(self._neighbours) :
-            if n[0] != -1 :
+            if n[0] >= 0 :
                 s += """\t%d->%d;\n""" %(i,n[0])
 
         #edges 1
         s += "\n\t/* edges of type 1 */\n"
         s += "\tedge [%s];\n" %(edge1_properties)
         for i,n in enumerate(self._neighbours) :
-            if n[1] != -1 :
+            if n[1] >= 0 :
                 s += """\t%d->%d;\n""" %(i,n[1])
 
         # end
@@ -1008,6 +1814,44 @@ class RauzyDiagram(SageObject) :
 
 
 
+def load_checkpoint(filename) :
+    r"""
+    Load a Rauzy diagram saved by RauzyDiagram.save_checkpoint.
+
+    If the diagram is not complete, a call to its method complete resumes
+    the completion from the saved cursor and the result is the same as the
+    one of an uninterrupted completion.
+
+    INPUT:
+        filename -- a file name
+
+    OUTPUT:
+        a Rauzy diagram
+    """
+    f = open(filename, 'rb')
+    data = cPickle.loads(zlib.decompress(f.read()))
+    f.close()
+    return _diagram_from_state(*data)
+
+
+def _diagram_from_state(cls, state, vertices, neighbours) :
+    r"""
+    Rebuild a Rauzy diagram from the data of RauzyDiagram._state.
+    """
+    d = cls.__new__(cls)
+    d.__dict__.update(state)
+    d._permutations = vertices
+
+    neighbours = array('i', neighbours)
+    d._neighbours = []
+    for i in xrange(0, len(neighbours), 2) :
+        d._neighbours.append([None if j == -3 else j for j in neighbours[i:i+2]])
+
+    d._compute_index()
+    return d
+
+
+
 class FlippedRauzyDiagram(RauzyDiagram) :
     r"""
     Generic class for flipped Rauzy Diagram.
@@ -1015,40 +1859,635 @@ class FlippedRauzyDiagram(RauzyDiagram) :
     The main difference is that is possible to exclude reducible
     permutations of our graph.
     """
+    def __init__(self, p, **kwds) :
+        # reducible permutations met during the completion : their keys give
+        # the order in which they were met, the permutation and the number of
+        # edges to it
+        self._reducible = {}
+
+        RauzyDiagram.__init__(self, p, **kwds)
+
 
-    def complete(self, reducible=False) :
+    def complete(self, reducible=False, **kwds) :
         r"""
         Completion of the Rauzy diagram.
 
 
         INPUT:
             reducible -- (defaut: False) allow or not reducible permutations.
+            kwds -- progress, budgets and cancellation (see
+            RauzyDiagram.complete)
         A Rauzy diagram is the reunion of all permutations that could be
         obtained with successive rauzy moves. This function just use the
         functions __getitem__ and is_rauzy_movable and rauzy_move which must
         be defined for child and their corresponding permutation types.
 
+        The reducibility is tested once for each permutation : the
+        irreducible ones are the vertices of the diagram and the reducible
+        ones are recorded with the number of edges to them (see
+        reducible_permutations).
+
         AUTHORS:
             - Vincent Delecroix (2008-12-20)
         """
-        i = 0
+        self._allow_reducible = reducible
+        return RauzyDiagram.complete(self, **kwds)
+
+
+    def _complete_vertex(self, i, p) :
+        r"""
+        Compute the neighbours of the vertex i (the permutation p) and add
+        the new ones to the diagram (-2 for a reducible neighbour).
+        """
+        for t in (0,1) :
+            if p.is_rauzy_movable(t) :
+                key = p._rauzy_move_key(t, self._buffer)
+                j = self._index.get(key)
+                if j is not None :
+                    self._neighbours[i][t] = j
+                    continue
+
+                r = self._reducible.get(key)
+                if r is not None :
+                    r[2] += 1
+                    self._neighbours[i][t] = -2
+                    continue
+
+                q = p.copy()
+                q.rauzy_move(t)
+                if (self._allow_reducible == True) or not q.is_reducible() :
+                    j = self.add_vertex(q, key)
+                    self._neighbours[i][t] = j
+                else :
+                    self._reducible[key] = [len(self._reducible), q, 1]
+                    self._neighbours[i][t] = -2
+            else :
+                self._neighbours[i][t] = -1
+
+
+    def reducible_permutations(self) :
+        r"""
+        Returns the reducible permutations excluded from the diagram.
+
+        OUTPUT:
+            a list of 2-uples (permutation, number of edges to it) in the
+            order in which they were met
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b', 'b a', flips=['a'])
+            sage : d = p.rauzy_diagram()
+            sage : d.reducible_permutations()
+            [(-b -a
+            -b -a, 1)]
+        """
+        return [(q.copy(), n) for _,q,n in sorted(self._reducible.values())]
+
+
+    def _transitions(self, i) :
+        r"""
+        Returns the transitions of the absorbing Markov chain from the vertex
+        i as a list of 2-uples (neighbour, probability) : the possible Rauzy
+        moves are equiprobable and the neighbour -2 is the absorption (a
+        reducible permutation).
+        """
+        l = [n for n in self._neighbours[i] if n != -1]
+        if l == [] : return []
+        return [(n, 1. / len(l)) for n in l]
+
+
+    def absorption(self, tol=1e-12, max_iter=100000) :
+        r"""
+        Absorption probabilities and expected hitting times of the reducible
+        permutations.
+
+        The diagram is seen as an absorbing Markov chain : from each vertex
+        the possible Rauzy moves are equiprobable and the moves to a
+        reducible permutation (the edges -2) are absorbed. The two linear
+        systems are solved by Gauss-Seidel iterations on the table of
+        neighbours (no matrix is built).
+
+        INPUT:
+            tol -- (defaut: 1e-12) the maximal change in one iteration at
+            which the iterations stop
+            max_iter -- (defaut: 100000) the maximal number of iterations
+
+        OUTPUT:
+            a 2-uple of lists indexed by the vertices : the probabilities of
+            absorption and the expected number of moves before absorption
+            (float('inf') if the absorption is not sure)
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a', flips=['a'])
+            sage : d = p.rauzy_diagram()
+            sage : h, e = d.absorption()
+            sage : [round(x, 6) for x in h]
+            [1.0, 1.0]
+            sage : [round(x, 6) for x in e]
+            [4.0, 4.0]
+        """
         N = len(self._permutations)
+        transitions = [self._transitions(i) for i in range(N)]
+
+        h = [0.] * N
+        for n_iter in xrange(max_iter) :
+            delta = 0.
+            for i in xrange(N) :
+                x = 0.
+                for j,q in transitions[i] :
+                    if j == -2 : x += q
+                    else : x += q * h[j]
+                delta = max(delta, abs(x - h[i]))
+                h[i] = x
+            if delta <= tol : break
+
+        # the hitting times are finite only when the absorption is sure
+        sure = [abs(x - 1.) <= 1e-9 for x in h]
+        e = [0.] * N
+        for n_iter in xrange(max_iter) :
+            delta = 0.
+            for i in xrange(N) :
+                if not sure[i] : continue
+                x = 1.
+                for j,q in transitions[i] :
+                    if j != -2 : x += q * e[j]
+                delta = max(delta, abs(x - e[i]))
+                e[i] = x
+            if delta <= tol * max(1., max(e)) : break
+
+        for i in xrange(N) :
+            if not sure[i] : e[i] = float('inf')
+        return h, e
+
+
+    def absorption_monte_carlo(self, i=0, samples=1000, max_steps=10000, seed=None) :
+        r"""
+        Monte Carlo estimate of the absorption by running random lengths
+        through the Rauzy induction with flips.
+
+        Each sample starts at the vertex i with random lengths (satisfying
+        the length equation). At each step the winner is the longer of the
+        two last intervals, the length of the loser is subtracted from the
+        one of the winner and the diagram is followed until a reducible
+        permutation is met (or max_steps moves).
+
+        INPUT:
+            i -- (defaut: 0) the starting vertex
+            samples -- (defaut: 1000) the number of samples
+            max_steps -- (defaut: 10000) the maximal number of moves of a
+            sample
+            seed -- (defaut: None) seed of the random generator
+
+        OUTPUT:
+            a 2-uple : the proportion of absorbed samples and the mean
+            number of moves before absorption (None if no sample is absorbed)
+
+        EXAMPLES:
+            sage : p = GeneralizedPermutation('a b c', 'c b a', flips=['a'])
+            sage : d = p.rauzy_diagram()
+            sage : d.absorption_monte_carlo(samples=100, seed=0)[0]
+            1.0
+        """
+        from random import Random
+        from array import array
+        from involution import GeneralizedPermutation, involution_rauzy_move
+
+        random = Random(seed).random
+        p = GeneralizedPermutation.from_permutation(self[i])
+        N = len(p._list)
+
+        # the letters are numbered by the position of their first extremity
+        letters = array('i', [min(j, p._list[j]) for j in range(N)])
+
+        # letters with both extremities in the top (resp. bottom)
+        inner = ([], [])
+        for j in range(N) :
+            t = p._list[j]
+            if j < t and ((j < p._k) == (t < p._k)) :
+                inner[int(j >= p._k)].append(j)
+
+        absorbed = 0
+        steps = 0
+        for n_sample in xrange(samples) :
+            involution = array('i', p._list)
+            flips = array('b', p._flips)
+            data = array('i', letters)
+            k = p._k
+            lengths = [random() for j in range(N)]
+            if inner[0] :
+                # the length equation : same total length in the top and the bottom
+                c = sum([lengths[j] for j in inner[1]]) / sum([lengths[j] for j in inner[0]])
+                for j in inner[0] : lengths[j] *= c
+
+            v = i
+            for n_step in xrange(max_steps) :
+                top, bottom = lengths[data[k-1]], lengths[data[-1]]
+                if top > bottom :
+                    winner = 0
+                    lengths[data[k-1]] -= bottom
+                elif bottom > top :
+                    winner = 1
+                    lengths[data[-1]] -= top
+                else :
+                    break
+
+                v = self._neighbours[v][winner]
+                if v < 0 :
+                    if v == -2 :
+                        absorbed += 1
+                        steps += n_step + 1
+                    break
+                k = involution_rauzy_move(involution, k, winner, data, flips)
+
+        if absorbed == 0 : return 0., None
+        return float(absorbed) / samples, float(steps) / absorbed
+
+
+
+class FlipLayersRauzyDiagram(RauzyDiagram) :
+    r"""
+    Flipped Rauzy diagrams of all the flips of a permutation.
+
+    The vertices are the pairs (twin, flip mask) reachable from the 2^n flip
+    masks of the starting permutation (the layers). The twin move only
+    depends on the twin and on the flip of the winner : it is computed once
+    for each of them and shared by all the layers, the flip masks are then
+    moved with bit operations (see _flips_rauzy_move).
+
+    INPUT:
+        p -- a flipped permutation (its flips are ignored)
+        reducible -- (defaut: False) allow or not reducible permutations
+
+    EXAMPLES:
+        sage : p = GeneralizedPermutation('a b', 'b a', flips=['a'])
+        sage : d = p.flip_layers_rauzy_diagram()
+        sage : d
+          0 :  a  b,  b  a  [0, 0]
+          1 : -a  b,  b -a  [2, -2]
+          2 :  a -b, -b  a  [-2, 1]
+          3 : -a -b, -b -a  [3, 3]
+        sage : d.index(d[2])
+        2
+    """
+    def __init__(self, p, reducible=False) :
+        self._reducible = reducible
+
+        # the twins (stored as permutations with no flip), their index from
+        # their keys and their moves for each winner and flip of the winner
+        self._twins = []
+        self._twin_index = {}
+        self._twin_moves = []
+
+        self._permutations = []
+        self._neighbours = []
+        self._index = {}
+        self._buffer = ([],[])
+
+        q = p.copy()
+        q._flips = 0
+        u = self._add_twin(q)
+        for mask in self._layers(q) :
+            self.add_vertex((u, mask))
+        self.complete()
+
+        self._n = len(p)
+
+
+    def _layers(self, p) :
+        r"""
+        Returns the flip masks of all the subsets of letters of p.
+        """
+        p._fill_buffer(self._buffer)
+        letters = []
+        masks = {}
+        for pos,label in enumerate(self._buffer[0] + self._buffer[1]) :
+            if label not in masks :
+                letters.append(label)
+                masks[label] = 0
+            masks[label] |= 1 << pos
+
+        layers = [0]
+        for letter in letters :
+            layers += [mask | masks[letter] for mask in layers]
+        return layers
+
+
+    def _add_twin(self, p) :
+        r"""
+        Add the twin of p (a permutation with no flip) if it's not yet in and
+        return the corresponding index.
+        """
+        p._fill_buffer(self._buffer)
+        key = p._buffer_key(self._buffer)
+
+        u = self._twin_index.get(key)
+        if u is None :
+            u = len(self._twins)
+            self._twin_index[key] = u
+            self._twins.append(p)
+            self._twin_moves.append([None,None,None,None])
+        return u
+
+
+    def _twin_move(self, u, winner, flip) :
+        r"""
+        Returns the twin obtained after a Rauzy move and the positions
+        needed to move the flip masks (see
+        FlippedGeneralizedPermutation._flip_positions).
+
+        The twin is -1 if the move is not possible and -2 if the result is
+        reducible (and reducible permutations are not allowed).
+        """
+        moves = self._twin_moves[u]
+        m = moves[2*winner + flip]
+        if m is not None : return m
+
+        p = self._twins[u]
+        if not p.is_rauzy_movable(winner) :
+            m = (-1, None)
+        else :
+            q = p.copy()
+            q._flips = flip << q._position(winner, -1)
+            positions = q._flip_positions(winner)
+            q.rauzy_move(winner)
+            q._flips = 0
+
+            if (self._reducible == False) and q.is_reducible() :
+                m = (-2, None)
+            else :
+                m = (self._add_twin(q), positions)
+
+        moves[2*winner + flip] = m
+        return m
+
+
+    def complete(self) :
+        r"""
+        Completion of the diagram.
 
-        while i < N :
-            p = self._permutations[i]
+        Each twin move is computed once (see _twin_move) and each edge is
+        then a bit operation on the flip mask.
+        """
+        i = 0
+        while i < len(self._permutations) :
+            u, mask = self._permutations[i]
+            p = self._twins[u]
 
             for t in (0,1) :
-                if p.is_rauzy_movable(t) :
-                    q = p.copy()
-                    q.rauzy_move(t)
-                    if (reducible == True) or not q.is_reducible() :
-                        j = self.add_vertex(q)
-                        self._neighbours[i][t] = j
-                    else :
-                        self._neighbours[i][t] = -2
+                flip = (mask >> p._position(t, -1)) & 1
+                v, positions = self._twin_move(u, t, flip)
+                if v < 0 :
+                    self._neighbours[i][t] = v
                 else :
-                    self._neighbours[i][t] = -1
-                
+                    self._neighbours[i][t] = self.add_vertex((v, _flips_rauzy_move(mask, *positions)))
+
             i += 1
-            N = len(self._permutations)
+        self._cursor = i
+
+
+    def add_vertex(self, vertex) :
+        r"""
+        Add a vertex (a 2-uple (twin, flip mask)) if it's not yet in and
+        return the corresponding index.
+        """
+        j = self._index.get(vertex)
+        if j is None :
+            j = len(self._permutations)
+            self._index[vertex] = j
+            self._permutations.append(vertex)
+            self._neighbours.append([None,None])
+        return j
+
+
+    _computed_attributes = RauzyDiagram._computed_attributes + ('_twin_index',)
+
+    def _store(self) :
+        r"""
+        The vertices are always stored as 2-uples (twin, flip mask).
+        """
+        pass
+
+
+    def _compute_index(self) :
+        r"""
+        Compute the index of the vertices and the one of the twins.
+        """
+        self._buffer = ([],[])
+        self._index = dict([(vertex,j) for j,vertex in enumerate(self._permutations)])
+        self._twin_index = {}
+        for u,p in enumerate(self._twins) :
+            p._fill_buffer(self._buffer)
+            self._twin_index[p._buffer_key(self._buffer)] = u
+
+
+    def vertex(self, i) :
+        r"""
+        Returns the vertex i as a 2-uple (twin, flip mask).
+        """
+        return self._permutations[i]
+
+
+    def index(self, p) :
+        r"""
+        Returns the index of the flipped permutation p (or None if p is not
+        in the diagram).
+        """
+        p._fill_buffer(self._buffer)
+        u = self._twin_index.get(p._buffer_key(self._buffer))
+        if u is None : return None
+        return self._index.get((u, p._flips))
+
+
+    def vertex_to_permutation(self, i) :
+        u, mask = self._permutations[i]
+        p = self._twins[u].copy()
+        p._flips = mask
+        return p
+
+
+    def vertex_to_str(self, i) :
+        return str(self[i])
+
+
+    def vertex_to_one_line_str(self, i) :
+        return replace(str(self[i]), "\n", ", ")
+
+
+
+class FrozenRecords(object) :
+    r"""
+    Read only view of n records of fixed width in a memory map.
+    """
+    def __init__(self, buf, offset, width, n) :
+        self._buf = buf
+        self._offset = offset
+        self._width = width
+        self._len = n
+
+
+    def __len__(self) :
+        return self._len
+
 
+    def __getitem__(self, i) :
+        if i < 0 : i += self._len
+        if i < 0 or i >= self._len : raise IndexError("vertex out of range")
+        start = self._offset + self._width * i
+        return self._buf[start:start+self._width]
+
+
+
+class FrozenNeighbours(FrozenRecords) :
+    r"""
+    Read only view of the table of neighbours in a memory map : t[i] is
+    the list of the two neighbours of the vertex i (as in the _neighbours
+    of a RauzyDiagram).
+    """
+    def __init__(self, buf, offset, n) :
+        FrozenRecords.__init__(self, buf, offset, struct.calcsize('ii'), n)
+
+
+    def __getitem__(self, i) :
+        if i < 0 : i += self._len
+        if i < 0 or i >= self._len : raise IndexError("vertex out of range")
+        return list(struct.unpack_from('ii', self._buf, self._offset + self._width * i))
+
+
+    def __iter__(self) :
+        for i in xrange(self._len) :
+            yield self[i]
+
+
+
+class FrozenRauzyDiagram(RauzyDiagram) :
+    r"""
+    Read only Rauzy diagram stored in a file mapped in memory (see
+    RauzyDiagram.freeze).
+
+    The file contains a header (the type and the alphabet of the
+    permutations, the widths), the table of neighbours as integers and the
+    vertices as records of fixed width (the length of the top and the flat
+    twin, the numbers of the labels for labeled permutations and the flip
+    mask for flipped ones, see GeneralizedPermutation.__reduce__). Nothing
+    is loaded : the permutations are built from the records when they are
+    asked and the pages of the file are shared by all the processes which
+    attach to it.
+
+    The index of the vertices is not available (the diagram is read only).
+
+    INPUT:
+        filename -- the name of a file written by RauzyDiagram.freeze
+
+    EXAMPLES:
+        sage : d = RauzyDiagram('a b c d', 'd c b a').freeze('d.frozen')
+        sage : e = FrozenRauzyDiagram('d.frozen')
+        sage : e.shortest_path(0, 3)
+        (0, 0, 0)
+    """
+    def __new__(cls, filename) :
+        r"""
+        The diagram is built in the frozen class of the diagram which was
+        frozen (see RauzyDiagram._frozen_class).
+        """
+        f = open(filename, 'rb')
+        h = struct.unpack('<Q', f.read(8))[0]
+        header = cPickle.loads(f.read(h))
+        f.close()
+        return RauzyDiagram.__new__(header.get('frozen', cls))
+
+
+    def __init__(self, filename) :
+        self._filename = filename
+        f = open(filename, 'rb')
+        self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+
+        h = struct.unpack_from('<Q', self._mmap, 0)[0]
+        header = cPickle.loads(self._mmap[8:8+h])
+        self._vertex_class = header['cls']
+        self._vertex_alphabet = header['alphabet']
+        self._typecode = header['typecode']
+        self._length = header['length']
+        self._labeled = header['labeled']
+        self._flip_bytes = header['flip_bytes']
+        self._n = header['n']
+        if header.get('diagram_alphabet') is not None :
+            self._alphabet = header['diagram_alphabet']
+
+        n = header['size']
+        self._neighbours = FrozenNeighbours(self._mmap, 8 + h, n)
+        self._permutations = FrozenRecords(self._mmap, 8 + h + 8*n, header['width'], n)
+        self._cursor = self._stored = n
+
+
+    def __repr__(self) :
+        return "Frozen Rauzy diagram with %d vertices in %s" %(len(self), self._filename)
+
+
+    def __reduce__(self) :
+        r"""
+        A frozen diagram is pickled as its file name.
+        """
+        return (FrozenRauzyDiagram, (self._filename,))
+
+
+    def vertex_to_permutation(self, i) :
+        r"""
+        Build the permutation of the vertex i from its record.
+        """
+        record = self._permutations[i]
+        size = array(self._typecode).itemsize
+        k = array(self._typecode, record[:size])[0]
+        start = size
+        end = start + size * self._length
+        involution = record[start:end]
+
+        labels = None
+        if self._labeled :
+            start, end = end, end + size * self._length
+            labels = record[start:end]
+
+        flips = None
+        if self._flip_bytes :
+            flips = 0
+            for b,c in enumerate(record[end:end+self._flip_bytes]) :
+                flips |= ord(c) << (8*b)
+
+        return _unpickle_permutation(self._vertex_class, k, self._typecode, involution,
+                                     flips, self._vertex_alphabet, labels)
+
+
+    def vertex_to_str(self, i) :
+        return str(self[i])
+
+
+    def vertex_to_one_line_str(self, i) :
+        return replace(str(self[i]), "\n", ", ")
+
+
+    def _adjacency(self) :
+        r"""
+        Returns the table of neighbours as one array (see
+        RauzyDiagram._adjacency), read at once from the file.
+        """
+        a = array('i')
+        a.fromstring(self._mmap[self._neighbours._offset:self._permutations._offset])
+        return a
+
+
+    def add_vertex(self, p, key=None) :
+        raise TypeError("a frozen Rauzy diagram is read only")
+
+
+    def close(self) :
+        r"""
+        Close the memory map (the diagram can not be used any more).
+        """
+        self._mmap.close()
+
+
+    def remove(self) :
+        r"""
+        Close the memory map and remove the file.
+        """
+        self.close()
+        os.remove(self._filename)
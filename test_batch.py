@@ -0,0 +1,106 @@
+import constructor as gp
+
+##############################
+# BATCH CONSTRUCTION TESTING
+
+a_list = (("a b","b a"),
+          ("a b c","c b a"),
+          ("a b c d","d a c b"),
+          ("a b b","c c a"),
+          ("a a b","b c c"),
+          ("1 2 2","3 1 3 4 4"))
+
+flips_list = ([], ['a'], ['1','3'])
+
+for reduced in (True, False) :
+    for flips in flips_list :
+        items = [a for a in a_list if all([f in (a[0] + ' ' + a[1]).split() for f in flips])]
+        strings = [a[0] + "\n" + a[1] for a in items]
+
+        l1 = [gp.GeneralizedPermutation(a, reduced=reduced, flips=flips) for a in items]
+        l2 = list(gp.GeneralizedPermutations(items, reduced=reduced, flips=flips))
+        l3 = list(gp.GeneralizedPermutations(strings, reduced=reduced, flips=flips))
+
+        for p,q,r in zip(l1,l2,l3) :
+            if type(p) != type(q) or type(p) != type(r) or p != q or p != r :
+                print "BATCH ERROR"
+                print p
+                print q
+                print r
+
+        # compact arrays (same type and same length)
+        for a in items :
+            c = gp.GeneralizedPermutations([a, a], reduced=reduced, flips=flips, compact=True)
+            p = gp.GeneralizedPermutation(a, reduced=reduced, flips=flips)
+            if len(c) != 2 or type(c[1]) != type(p) or c[1] != p :
+                print "COMPACT BATCH ERROR"
+                print p
+                print c[1]
+
+
+##########
+# TWINS
+
+for a in a_list :
+    p = gp.GeneralizedPermutation(a, reduced=True)
+    q = list(gp.GeneralizedPermutations([p._twin], reduced=True))[0]
+    if p != q :
+        print "TWIN BATCH ERROR"
+        print p
+        print q
+
+
+###################
+# INVALID ITEMS
+
+invalid_list = ("a b\nb c",
+                "a a a\nb b b",
+                "a b b\nc c",
+                "a a b\nb",
+                "a b c",
+                ([1,0],[0,1]),
+                ([(0,0)],[(1,0)]))
+
+l = list(gp.GeneralizedPermutations(invalid_list, invalid='none'))
+if l != [None] * len(invalid_list) :
+    print "INVALID BATCH ERROR (none)"
+    print l
+
+l = list(gp.GeneralizedPermutations(invalid_list + a_list, invalid='skip'))
+if len(l) != len(a_list) :
+    print "INVALID BATCH ERROR (skip)"
+    print l
+
+for a in invalid_list :
+    try :
+        list(gp.GeneralizedPermutations([a]))
+    except (gp.NoMatchingTwin, gp.NoAdmissibleLength, gp.WrongParameter, TypeError) :
+        pass
+    else :
+        print "INVALID BATCH ERROR (raise)"
+        print a
+
+#################################
+# BATCH CONSTRUCTION OF DIAGRAMS
+seeds = ["a b c d / d c b a", "a b c d / d a c b", "a b / b a", "a b c d / d c b a",
+         "a b b / c c a", "a a b / b c c", "a b c / b c a"]
+
+for reduced in (True, False) :
+    diagrams = [gp.GeneralizedPermutation(s.split('/'), reduced=reduced).rauzy_diagram() for s in seeds]
+
+    for processes in (None, 2) :
+        l = list(gp.RauzyDiagrams(seeds, reduced=reduced, separator='/', processes=processes))
+
+        if sorted(i for i,j,d in l) != range(len(seeds)) :
+            print "BATCH DIAGRAM ERROR : SEEDS", reduced, processes
+
+        for i,j,d in l :
+            if (d is None) == (i == j) :
+                print "BATCH DIAGRAM ERROR : DUPLICATE", reduced, processes, i, j
+            elif d is not None and (len(d) != len(diagrams[i]) or d._neighbours != diagrams[i]._neighbours) :
+                print "BATCH DIAGRAM ERROR : DIAGRAM", reduced, processes, i
+            elif diagrams[j]._index.get(diagrams[i][0]._key(([],[]))) is None :
+                print "BATCH DIAGRAM ERROR : NOT IN THE CLASS", reduced, processes, i, j
+
+        if processes is None and len([d for i,j,d in l if d is not None]) != len(set(len(d) for d in diagrams)) :
+            print "BATCH DIAGRAM ERROR : NUMBER OF BUILDS", reduced
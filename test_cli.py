@@ -0,0 +1,73 @@
+import json, os, tempfile
+import constructor as gp
+import cli
+
+lines = ["# comment", "a b c d / d c b a", "", "a b / b a c", "d b c a / a c d b",
+         "a a b / b c c", "a b c / b a c", "a b c d / d c b a"]
+
+##############################
+# RESULTS OF THE PERMUTATIONS
+for reduced in (True, False) :
+    l1 = list(cli.results(lines, reduced=reduced))
+    l2 = list(cli.results(lines, processes=2, chunksize=1, reduced=reduced))
+
+    if l1 != l2 :
+        print "CLI ERROR : POOL", reduced
+
+    if [r['line'] for r in l1] != [2, 4, 5, 6, 7, 8] or 'error' not in l1[1] :
+        print "CLI ERROR : LINES", reduced
+
+    for r in l1 :
+        if 'error' in r : continue
+        p = gp.GeneralizedPermutation(r['permutation'], reduced=reduced)
+        d = p.rauzy_diagram()
+        if r['reducible'] != p.is_reducible() or r['class_size'] != len(d) :
+            print "CLI ERROR : RESULT", reduced, r
+        if not r['reducible'] and r['stratum'] != p.stratum() :
+            print "CLI ERROR : STRATUM", reduced, r
+
+    # the same class has the same id
+    if l1[0]['class_id'] != l1[-1]['class_id'] or l1[0]['class_id'] == l1[3]['class_id'] :
+        print "CLI ERROR : CLASS ID", reduced
+
+#################
+# COMMAND LINE
+directory = tempfile.mkdtemp()
+input = os.path.join(directory, 'input')
+output = os.path.join(directory, 'output')
+f = open(input, 'w')
+f.write('\n'.join(lines) + '\n')
+f.close()
+
+if cli.main([input, '-o', output, '-r', '-p', '2']) != 1 :
+    print "CLI ERROR : EXIT STATUS"
+if [json.loads(line) for line in open(output)] != json.loads(json.dumps(list(cli.results(lines, reduced=True)))) :
+    print "CLI ERROR : OUTPUT FILE"
+
+os.remove(input)
+os.remove(output)
+os.rmdir(directory)
+
+########################################
+# NO STRATUM FOR FLIPPED PERMUTATIONS
+for r in cli.results(["a b c / c b a", "a a b / b c c"], flips=['a']) :
+    if 'error' in r or r['stratum'] is not None :
+        print "CLI ERROR : FLIPPED STRATUM", r
+
+########################################
+# CLASSES OF FLIPPED PERMUTATIONS
+# (the diagram is not strongly connected : the class does not depend on the
+# order of the input)
+lines = ["a a b / b c c", "a b b / c c a", "a b c / c b a", "a b c / c a b"]
+classes = []
+for l in (lines, lines[::-1], lines[1:] + lines[:1]) :
+    cli._classes.clear()
+    classes.append(dict([(tuple(r['permutation']), (r['class_size'], r['class_id'])) for r in cli.results(l, flips=['a'])]))
+if classes[0] != classes[1] or classes[0] != classes[2] :
+    print "CLI ERROR : FLIPPED CLASS ORDER"
+
+for top,bottom in classes[0] :
+    d = gp.GeneralizedPermutation(top, bottom, flips=['a']).rauzy_diagram()
+    components = list(d.strongly_connected_components())
+    if classes[0][top,bottom][0] != components.count(components[0]) :
+        print "CLI ERROR : FLIPPED CLASS SIZE", top, bottom
@@ -0,0 +1,80 @@
+import constructor as gp
+from external import ExternalRauzyDiagram
+
+######################################
+# EXTERNAL AGAINST IN MEMORY DIAGRAMS
+for a,r,flips in ((("a b c d","d c b a"), True, []),
+                  (("a b c d e","e d c b a"), False, []),
+                  (("a b b c c","d d a e e"), True, []),
+                  (("a b c d","d c b a"), True, ['a']),
+                  (("a b c a d","e d c e b"), False, ['c'])) :
+    p = gp.GeneralizedPermutation(*a, reduced=r, flips=flips)
+    d = p.rauzy_diagram()
+    # a small budget to get several sorted runs
+    e = ExternalRauzyDiagram(p, memory=2**10)
+
+    if len(e) != len(d) :
+        print "EXTERNAL DIAGRAM ERROR : LENGTH", a, r, flips
+
+    m = [e.index(d[i]) for i in range(len(d))]
+    if None in m or len(set(m)) != len(m) :
+        print "EXTERNAL DIAGRAM ERROR : INDEX", a, r, flips
+
+    else :
+        for i in range(len(d)) :
+            if e[m[i]] != d[i] :
+                print "EXTERNAL DIAGRAM ERROR : PERMUTATION", a, r, flips, i
+            for t in (0,1) :
+                n = d._neighbours[i][t]
+                if n >= 0 : n = m[n]
+                if e._neighbours[m[i]][t] != n :
+                    print "EXTERNAL DIAGRAM ERROR : NEIGHBOURS", a, r, flips, i, t
+
+    if len(list(e._neighbours)) != len(e) :
+        print "EXTERNAL DIAGRAM ERROR : NEIGHBOUR TABLE"
+
+    e.remove()
+
+#################################
+# SHARDED AGAINST EXTERNAL BUILD
+from external import ShardedRauzyDiagram
+
+for a,r,flips in ((("a b c d e","e d c b a"), False, []),
+                  (("a b b c c","d d a e e"), True, []),
+                  (("a b c a d","e d c e b"), False, ['c'])) :
+    p = gp.GeneralizedPermutation(*a, reduced=r, flips=flips)
+    e = ExternalRauzyDiagram(p, memory=2**10)
+    s = ShardedRauzyDiagram(p, shards=3, memory=2**10, poll=0.01)
+
+    if len(s) != len(e) or any(s[i] != e[i] for i in range(len(e))) :
+        print "SHARDED DIAGRAM ERROR : VERTICES", a, r, flips
+
+    if list(s._neighbours) != list(e._neighbours) :
+        print "SHARDED DIAGRAM ERROR : NEIGHBOURS", a, r, flips
+
+    d = s.to_rauzy_diagram()
+    if len(d) != len(s) or d._neighbours != list(s._neighbours) :
+        print "SHARDED DIAGRAM ERROR : IN MEMORY DIAGRAM", a, r, flips
+
+    e.remove()
+    s.remove()
+
+##########################################
+# SHARDED BUILD WITHOUT (OR WITH FAILED) WORKERS
+import os, shutil, tempfile
+from threading import Timer
+
+p = gp.GeneralizedPermutation("a b c d","d c b a", reduced=True)
+for failure in (False, True) :
+    directory = tempfile.mkdtemp()
+    if failure :
+        # a worker which failed before the timeout
+        marker = os.path.join(directory, 'shard1', 'failed')
+        Timer(0.1, lambda : open(marker, 'w').close()).start()
+    try :
+        ShardedRauzyDiagram(p, shards=2, directory=directory, workers=False, poll=0.01, timeout=(failure and 10) or 0.2)
+        print "SHARDED DIAGRAM ERROR : NO WORKER", failure
+    except RuntimeError, error :
+        if ('failed' in str(error)) != failure :
+            print "SHARDED DIAGRAM ERROR : WRONG ERROR", failure, error
+    shutil.rmtree(directory)
@@ -0,0 +1,36 @@
+import json
+import constructor as gp
+import instrumentation
+import template
+
+originals = [(cls, dict(cls.__dict__)) for cls in instrumentation._classes()]
+
+##############################
+# COUNTS OF A DIAGRAM BUILDING
+for a,r,flips in ((("a b c d","d c b a"), False, []),
+                  (("a b b c c","d d a e e"), True, []),
+                  (("a b c d","d c b a"), True, ['a'])) :
+    with instrumentation.instrumented() as stats :
+        d = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+
+    # one permutation is created by the factory, one copy for each vertex
+    if stats.counts['add_vertex'] != len(d) :
+        print "INSTRUMENTATION ERROR : ADD VERTEX"
+        print stats
+
+    if sum(stats.allocations.values()) != stats.counts['copy'] + stats.counts['__init__'] :
+        print "INSTRUMENTATION ERROR : ALLOCATIONS"
+        print stats
+
+    if json.loads(stats.to_json()) != stats.as_dict() :
+        print "INSTRUMENTATION ERROR : JSON"
+
+###########################
+# DISABLED INSTRUMENTATION
+if instrumentation.is_enabled() :
+    print "INSTRUMENTATION ERROR : NOT DISABLED"
+
+for cls, d in originals :
+    for name in instrumentation.instrumented_methods + ('__init__',) :
+        if cls.__dict__.get(name) is not d.get(name) :
+            print "INSTRUMENTATION ERROR : NOT RESTORED", cls.__name__, name
@@ -0,0 +1,61 @@
+import constructor as gp
+from involution import InvolutionWithoutFixedPoint, GeneralizedPermutation
+
+##############
+# INVOLUTIONS
+##############
+m = InvolutionWithoutFixedPoint([1,0,3,2])
+for (i,j),result in (((0,1),[1,0,3,2]), ((0,2),[2,3,0,1]), ((0,3),[3,2,1,0]), ((3,0),[3,2,1,0]), ((2,0),[3,2,1,0])) :
+    if m.move(i,j) != result :
+        print "INVOLUTION MOVE ERROR"
+        print m, i, j, m.move(i,j)
+
+for l in ([0,1], [1,2,0], [1,1]) :
+    try :
+        InvolutionWithoutFixedPoint(l)
+        print "INVOLUTION TYPE ERROR"
+        print l
+    except TypeError :
+        pass
+
+
+##########################################
+# UNIFIED PERMUTATIONS VERSUS THE CLASSES
+##########################################
+a_list = (("a b c d","d c b a"),
+          ("a b c d e","e c a d b"),
+          ("a b b c c","d d a e e"),
+          ("a b c a d","e d c e b"),
+          ("a b c d","b a d c"))
+
+walk = (0, 1, 1, 0, 0, 1, 0, 1, 1, 0, 0, 0)
+
+for reduced in (True, False) :
+    for flips in ([], ['a'], ['a','c']) :
+        for a in a_list :
+            p = gp.GeneralizedPermutation(a, reduced=reduced, flips=flips)
+            q = p.involution()
+
+            if q.to_permutation(reduced=reduced) != p :
+                print "INVOLUTION CONVERSION ERROR"
+                print p
+                print q
+
+            if bool(q.is_reducible()) != bool(p.is_reducible()) :
+                print "INVOLUTION REDUCIBILITY ERROR"
+                print p
+
+            for winner in walk :
+                if bool(q.is_rauzy_movable(winner)) != bool(p.is_rauzy_movable(winner)) :
+                    print "INVOLUTION RAUZY MOVABILITY ERROR"
+                    print p
+                    break
+                if not p.is_rauzy_movable(winner) : continue
+
+                p.rauzy_move(winner)
+                q.rauzy_move(winner)
+                if q.to_permutation(reduced=reduced) != p :
+                    print "INVOLUTION RAUZY MOVE ERROR"
+                    print p
+                    print q
+                    break
@@ -0,0 +1,86 @@
+import constructor as gp
+
+#################################
+# ARRAY OPERATIONS VS PERMUTATIONS
+
+a_list = (("a b c d","d c b a"),
+          ("a b c d","d a c b"),
+          ("a b c d e","e d c b a"),
+          ("a b c","c b a"),
+          ("a b b","c c a"),
+          ("a a b","b c c"),
+          ("a b b c","d d a c"),
+          ("a b c a d","e d c e b"))
+
+flips_list = ([], ['a'], ['a','c'])
+
+walk = (0, 1, 1, 0, 0, 0, 1, 0, 1, 1, 0)
+
+for reduced in (True, False) :
+    for flips in flips_list :
+        for a in a_list :
+            p = gp.GeneralizedPermutation(a, reduced=reduced, flips=flips)
+            c = gp.GeneralizedPermutations([a], reduced=reduced, flips=flips, compact=True)
+
+            if bool(c.is_reducible()[0]) != bool(p.is_reducible()) :
+                print "ARRAY REDUCIBILITY ERROR"
+                print p
+
+            for winner in walk :
+                movable = p.is_rauzy_movable(winner)
+                if bool(c.is_rauzy_movable(winner)[0]) != bool(movable) :
+                    print "ARRAY RAUZY MOVABILITY ERROR"
+                    print p
+                    break
+
+                if movable : p.rauzy_move(winner)
+                c.rauzy_move(winner)
+
+                if c[0] != p :
+                    print "ARRAY RAUZY MOVE ERROR"
+                    print p
+                    print c[0]
+                    break
+
+                if bool(c.is_reducible()[0]) != bool(p.is_reducible()) :
+                    print "ARRAY REDUCIBILITY ERROR"
+                    print p
+                    break
+
+
+# one winner per row
+a = ("a b c","c b a")
+c = gp.GeneralizedPermutations([a, a, a], compact=True)
+c.rauzy_move([0, 1, None])
+for i,winner in enumerate((0, 1, None)) :
+    p = gp.GeneralizedPermutation(a)
+    if winner is not None : p.rauzy_move(winner)
+    if c[i] != p :
+        print "ARRAY MULTIPLE WINNERS ERROR"
+        print p
+        print c[i]
+
+
+# items of an other type or length
+data = ["a b b / c c a", "a b c / c b a", "a b / b a", "a b c / c a b"]
+c = gp.GeneralizedPermutations(data, separator='/', invalid='skip', compact=True)
+if len(c) != 3 :
+    print "ARRAY INVALID LENGTH ERROR"
+    print c
+for i,a in enumerate(data[:2] + data[3:]) :
+    p = gp.GeneralizedPermutation(a.split('/'))
+    if type(c[i]) != type(p) or c[i] != p :
+        print "ARRAY ELEMENT TYPE ERROR"
+        print p
+        print c[i]
+
+try :
+    gp.GeneralizedPermutations(data, separator='/', compact=True)
+    print "ARRAY INVALID LENGTH ERROR (raise)"
+except ValueError :
+    pass
+
+c = gp.GeneralizedPermutations(["a b c / c b a", "a b b / c c a"], separator='/', invalid='skip', compact=True)
+if len(c) != 1 :
+    print "ARRAY INVALID TYPE ERROR"
+    print c
@@ -170,3 +170,321 @@ for (a,flips), ((a0,flips0),(a1,flips1)) in zip(a_list, a_r_list) :
             print p
             print "\n",p1
             
+
+
+########################################
+# KEYS OF NEIGHBOURS (WITHOUT THE MOVE)
+########################################
+a_list = (("a b c d","d c b a"),
+          ("a b c d e","e c a d b"),
+          ("a b b c c","d d a e e"),
+          ("a b c a d","e d c e b"))
+
+buffer = ([],[],[],[])
+for a in a_list :
+    for r,l in reduction :
+        for flips in ([], ['a'], ['a','c']) :
+            p = gp.GeneralizedPermutation(a, reduced=r, flips=flips)
+            for winner in (0, 1, 1, 0, 1, 0, 0, 1, 0) :
+                if not p.is_rauzy_movable(winner) : continue
+                key = p._rauzy_move_key(winner, buffer)
+                p.rauzy_move(winner)
+                if key != p._key(buffer) :
+                    print l + "RAUZY MOVE KEY ERROR"
+                    print p
+
+
+##########################################
+# FLIPPED RAUZY DIAGRAMS (EDGES AND MOVES)
+##########################################
+a_list = ((("a b c d","d c b a"), ['a','b']),
+          (("a b b c c","d d a e e"), ['a']),
+          (("a b c a d","e d c e b"), ['c']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d = gp.GeneralizedPermutation(a, reduced=r, flips=flips).rauzy_diagram()
+        for i in range(len(d)) :
+            p = d[i]
+            for winner in (0,1) :
+                j = d._neighbours[i][winner]
+                if j < 0 : continue
+                q = p.copy()
+                q.rauzy_move(winner)
+                if q != d[j] :
+                    print l + "FLIPPED RAUZY DIAGRAM ERROR"
+                    print p
+                    print "\n",q
+
+
+###################################################
+# FLIPPED RAUZY DIAGRAMS OF ALL FLIPS (ONE PASS)
+###################################################
+a_list = (("a b c d","d c b a"),
+          ("a b b","c c a"),
+          ("a b c a d","e d c e b"))
+
+for a in a_list :
+    letters = sorted(set(a[0].split() + a[1].split()))
+    for r,l in reduction :
+        d_all = gp.GeneralizedPermutation(a, reduced=r, flips=letters).flip_layers_rauzy_diagram()
+        for s in range(1, 2**len(letters)) :
+            flips = [letter for b,letter in enumerate(letters) if (s >> b) & 1]
+            d = gp.GeneralizedPermutation(a, reduced=r, flips=flips).rauzy_diagram()
+            for i in range(len(d)) :
+                j = d_all.index(d[i])
+                if (j is None) or (d_all[j] != d[i]) :
+                    print l + "FLIP LAYERS VERTEX ERROR"
+                    print d[i]
+                    continue
+                for t in (0,1) :
+                    n, n_all = d._neighbours[i][t], d_all._neighbours[j][t]
+                    if (n < 0 and n != n_all) or (n >= 0 and (n_all < 0 or d_all[n_all] != d[n])) :
+                        print l + "FLIP LAYERS EDGE ERROR"
+                        print d[i]
+
+
+##############################################
+# REDUCIBLE PERMUTATIONS OF FLIPPED DIAGRAMS
+##############################################
+a_list = ((("a b c d e","e c a d b"), ['a','c']),
+          (("a b b c c","d d a e e"), ['a']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d = gp.GeneralizedPermutation(a, reduced=r, flips=flips).rauzy_diagram()
+        hits = 0
+        for q,n in d.reducible_permutations() :
+            hits += n
+            if not q.is_reducible() :
+                print l + "REDUCIBLE PERMUTATIONS ERROR"
+                print q
+        if hits != sum([list(n).count(-2) for n in d._neighbours]) :
+            print l + "REDUCIBLE HITS ERROR"
+
+
+##############################################
+# ABSORPTION IN FLIPPED DIAGRAMS
+##############################################
+a_list = ((("a b c","c b a"), ['a']),
+          (("a b c d","d c b a"), ['a','b']),
+          (("a b b c c","d d a e e"), ['a']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d = gp.GeneralizedPermutation(a, reduced=r, flips=flips).rauzy_diagram()
+        h, e = d.absorption()
+        for i in range(len(d)) :
+            t = d._transitions(i)
+            x = sum([q * ((j == -2) or h[j]) for j,q in t])
+            y = 1 + sum([q * e[j] for j,q in t if j != -2])
+            if abs(x - h[i]) > 1e-6 or abs(y - e[i]) > 1e-6 * e[i] :
+                print l + "ABSORPTION ERROR"
+                print d[i]
+
+        if d.absorption_monte_carlo(samples=50, seed=0)[0] != 1. :
+            print l + "ABSORPTION MONTE CARLO ERROR"
+
+
+##############################################
+# STRONGLY CONNECTED COMPONENTS
+##############################################
+def reachable(d, i) :
+    seen = set([i])
+    stack = [i]
+    while stack :
+        for j in d._neighbours[stack.pop()] :
+            if j >= 0 and j not in seen :
+                seen.add(j)
+                stack.append(j)
+    return seen
+
+a_list = ("a b c d","d c b a"), ("a b b","c c a"), ("a b c a d","e d c e b")
+
+for a in a_list :
+    for r,l in reduction :
+        for d in (gp.GeneralizedPermutation(a, reduced=r).rauzy_diagram(),
+                  gp.GeneralizedPermutation(a, reduced=r, flips=['a']).flip_layers_rauzy_diagram()) :
+            c = d.strongly_connected_components()
+            reach = [reachable(d, i) for i in range(len(d))]
+            for i in range(len(d)) :
+                for j in range(len(d)) :
+                    if (c[i] == c[j]) != ((j in reach[i]) and (i in reach[j])) :
+                        print l + "STRONGLY CONNECTED COMPONENTS ERROR"
+                        print d[i], "\n", d[j]
+
+            for i,successors in enumerate(d.condensation(c)) :
+                if [j for j in successors if j >= i] != [] :
+                    print l + "CONDENSATION ERROR"
+
+
+##############################################
+# SHORTEST PATHS AND DISTANCES
+##############################################
+def path_end(d, path) :
+    i = path[0]
+    for t in path[1:] : i = d._neighbours[i][t]
+    return i
+
+for a in (("a b c d","d c b a"), ("a b c a d","e d c e b")) :
+    for r,l in reduction :
+        d = gp.GeneralizedPermutation(a, reduced=r).rauzy_diagram()
+        N = len(d)
+        table = d.distance_table()
+        for i in range(N) :
+            distance = d.distances(i)
+            for j in range(N) :
+                path = d.shortest_path(i, j)
+                if path is None :
+                    if table[i*N + j] != 65535 or distance[j] != -1 :
+                        print l + "SHORTEST PATH ERROR"
+                elif path_end(d, path) != j or len(path) - 1 != table[i*N + j] or distance[j] != table[i*N + j] :
+                    print l + "SHORTEST PATH ERROR"
+                    print path
+
+            loop = d.shortest_loop(i)
+            if loop is not None and path_end(d, loop) != i :
+                print l + "SHORTEST LOOP ERROR"
+
+
+##############################################
+# PARTIAL COMPLETION AND RESUME
+##############################################
+import threading
+
+a_list = ((("a b c d e","e d c b a"), []),
+          (("a b b c c","d d a e e"), ['a']),
+          (("a b c d","d c b a"), ['a']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d_full = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+
+        progress = []
+        d = gp.RauzyDiagram(*a, reduced=r, flips=flips, max_vertices=3, progress=progress.append, progress_interval=1)
+        if len(d_full) > 3 and (d.is_complete() or d.frontier() == []) :
+            print l + "PARTIAL COMPLETION ERROR"
+        if progress == [] or progress[-1]['vertices'] != len(d) :
+            print l + "PROGRESS ERROR"
+
+        while not d.complete(max_vertices=len(d) + 5) : pass
+        if d._permutations != d_full._permutations or d._neighbours != d_full._neighbours :
+            print l + "RESUMED COMPLETION ERROR"
+
+cancel = threading.Event()
+cancel.set()
+d = gp.RauzyDiagram("a b c d","d c b a", cancel=cancel)
+if len(d) != 1 or d.is_complete() :
+    print "CANCELLED COMPLETION ERROR"
+
+
+##############################################
+# CHECKPOINTS
+##############################################
+import os, tempfile
+
+directory = tempfile.mkdtemp()
+filename = os.path.join(directory, 'checkpoint')
+a_list = ((("a b c d e","e d c b a"), []),
+          (("a b c a d","e d c e b"), ['a']),
+          (("a b c d","d c b a"), ['a']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d_full = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+        d = gp.RauzyDiagram(*a, reduced=r, flips=flips, max_vertices=3, checkpoint=filename)
+        while True :
+            d = gp.load_checkpoint(filename)
+            if d.complete(max_vertices=2*len(d), checkpoint=filename, checkpoint_interval=0) : break
+
+        d = gp.load_checkpoint(filename)
+        if d._permutations != d_full._permutations or d._neighbours != d_full._neighbours or d._index != d_full._index :
+            print l + "CHECKPOINT ERROR"
+            print d
+
+os.remove(filename)
+os.rmdir(directory)
+
+
+##############################################
+# PICKLING
+##############################################
+import cPickle
+
+a_list = ((("a b c d","d c b a"), []),
+          (("a b b c c","d d a e e"), []),
+          (("a b c d","d c b a"), ['a']),
+          (("a b c a d","e d c e b"), ['a']))
+
+for a,flips in a_list :
+    for r,l in reduction :
+        d = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+        for i in range(len(d)) :
+            p = d[i]
+            q = cPickle.loads(cPickle.dumps(p, 2))
+            if type(q) != type(p) or q != p or str(q) != str(p) or q._key(([],[])) != p._key(([],[])) :
+                print l + "PERMUTATION PICKLING ERROR"
+                print p
+
+        e = cPickle.loads(cPickle.dumps(d, 2))
+        if type(e) != type(d) or e._permutations != d._permutations or e._neighbours != d._neighbours or e._index != d._index :
+            print l + "DIAGRAM PICKLING ERROR"
+            print d
+
+p = gp.GeneralizedPermutation("a b c d", "d c b a", flips=['a'])
+d = p.flip_layers_rauzy_diagram()
+e = cPickle.loads(cPickle.dumps(d, 2))
+if e._neighbours != d._neighbours or e._index != d._index or e._twin_index != d._twin_index :
+    print "FLIP LAYERS PICKLING ERROR"
+
+
+##############################################
+# FROZEN DIAGRAMS
+##############################################
+from multiprocessing import Pool
+
+def frozen_worker(d) :
+    return len(d), str(d[len(d)-1]), d.shortest_path(0, len(d)-1)
+
+pool = Pool(2)
+for a,flips in a_list :
+    for r,l in reduction :
+        d = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+        f = d.freeze()
+        if len(f) != len(d) or any(type(f[i]) != type(d[i]) or f[i] != d[i] for i in range(len(d))) :
+            print l + "FROZEN DIAGRAM ERROR : VERTICES"
+        if list(f._neighbours) != d._neighbours or f.strongly_connected_components() != d.strongly_connected_components() :
+            print l + "FROZEN DIAGRAM ERROR : NEIGHBOURS"
+
+        # the workers attach to the file
+        expected = (len(d), str(d[len(d)-1]), d.shortest_path(0, len(d)-1))
+        if pool.map(frozen_worker, [f, f]) != [expected, expected] :
+            print l + "FROZEN DIAGRAM ERROR : WORKERS"
+
+        # the path functions of the labeled diagrams
+        if not r :
+            path = d.shortest_path(0, len(d)-1)
+            if (f.path_to_matrix(*path) != d.path_to_matrix(*path) or
+                f.path_to_substitution(*path) != d.path_to_substitution(*path)) :
+                print l + "FROZEN DIAGRAM ERROR : PATHS"
+        f.remove()
+pool.close()
+pool.join()
+
+
+##############################################
+# STRATA
+##############################################
+a_list = ((("a b c","c b a"), "H(0, 0)"),
+          (("a b c d","d c b a"), "H(2)"),
+          (("a b c d e","e d c b a"), "H(1, 1)"),
+          (("a a b","b c c"), "Q(-1, -1, -1, -1)"),
+          (("a b b c c","d d a e e"), "Q(1, -1, -1, -1, -1, -1)"),
+          (("1 2 2","3 1 3 4 4"), "Q(2, -1, -1)"))
+
+for a,stratum in a_list :
+    for r,l in reduction :
+        d = gp.RauzyDiagram(*a, reduced=r)
+        # the stratum is an invariant of the Rauzy class
+        if set([d[i].stratum() for i in range(len(d))]) != set([stratum]) :
+            print l + "STRATUM ERROR", a
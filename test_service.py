@@ -0,0 +1,86 @@
+import os, tempfile, threading
+import constructor as gp
+from service import serve, ServiceClient, ServiceError, DiagramService
+
+address = os.path.join(tempfile.mkdtemp(), 'rauzy.socket')
+server = serve(address, processes=2, cache_size=2)
+thread = threading.Thread(target=server.serve_forever)
+thread.daemon = True
+thread.start()
+
+##########################
+# QUERIES ON THE DIAGRAMS
+c = ServiceClient(address)
+ids = []
+for a,r,flips in ((("a b c d","d c b a"), False, []),
+                  (("a b b c c","d d a e e"), True, []),
+                  (("a b c d","d c b a"), True, ['a'])) :
+    d = gp.RauzyDiagram(*a, reduced=r, flips=flips)
+    b = c.call('build', top=a[0], bottom=a[1], reduced=r, flips=flips)
+    ids.append(b['diagram'])
+    if b['vertices'] != len(d) :
+        print "SERVICE ERROR : BUILD", a, r, flips
+
+    for i in range(len(d)) :
+        if c.call('vertex', b['diagram'], i) != str(d[i]).split('\n') :
+            print "SERVICE ERROR : VERTEX", a, r, flips, i
+        if c.call('neighbours', b['diagram'], i) != d._neighbours[i] :
+            print "SERVICE ERROR : NEIGHBOURS", a, r, flips, i
+        top, bottom = str(d[i]).replace('-', ' ').split('\n')
+        if not flips and c.call('index', b['diagram'], top, bottom) != i :
+            print "SERVICE ERROR : INDEX", a, r, flips, i
+
+    path = c.call('shortest_path', diagram=b['diagram'], i=0, j=len(d)-1)
+    if (path and tuple(path)) != d.shortest_path(0, len(d)-1) :
+        print "SERVICE ERROR : SHORTEST PATH", a, r, flips
+
+    if c.call('statistics', b['diagram'])['vertices'] != len(d) :
+        print "SERVICE ERROR : STATISTICS", a, r, flips
+
+# the first diagram is dropped from the cache (cache_size=2)
+try :
+    c.call('vertex', ids[0], 0)
+    print "SERVICE ERROR : UNKNOWN DIAGRAM"
+except ServiceError, error :
+    if error.code != -32001 : print "SERVICE ERROR : UNKNOWN DIAGRAM CODE"
+
+for method, args, code in (('nothing', [], -32601), ('build', ['a b', 'a b c'], -32602), ('vertex', [], -32602)) :
+    try :
+        c.call(method, *args)
+        print "SERVICE ERROR : NO ERROR", method
+    except ServiceError, error :
+        if error.code != code : print "SERVICE ERROR : ERROR CODE", method, error.code
+
+###########################
+# COALESCING OF THE BUILDS
+counts = c.call('service_statistics')
+results = []
+def request() :
+    client = ServiceClient(address)
+    results.append(client.call('build', 'a b c d e f', 'f e d c b a', True))
+    client.close()
+threads = [threading.Thread(target=request) for _ in range(6)]
+for t in threads : t.start()
+for t in threads : t.join()
+
+new_counts = c.call('service_statistics')
+if len(results) != 6 or len(set(r['diagram'] for r in results)) != 1 :
+    print "SERVICE ERROR : CONCURRENT BUILDS"
+if new_counts['builds'] - counts['builds'] != 1 :
+    print "SERVICE ERROR : COALESCING", counts, new_counts
+
+##########################
+# BUILD LONGER THAN TIMEOUT
+s = DiagramService(processes=1, timeout=0)
+try :
+    s.build('a b c d e f g h i j', 'j i h g f e d c b a')
+    print "SERVICE ERROR : NO TIMEOUT"
+except ServiceError, error :
+    if error.code != -32000 : print "SERVICE ERROR : TIMEOUT CODE"
+s.close()
+
+c.close()
+server.shutdown()
+server.server_close()
+server.service.close()
+os.remove(address)
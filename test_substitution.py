@@ -0,0 +1,126 @@
+import constructor as gp
+from sage import WordMorphism
+from random import randint, seed
+
+seed(0)
+
+###########################
+# LAZY COMPOSITION TESTING
+
+s = WordMorphism({'a': ['a','b'], 'b': ['a']})
+t = WordMorphism({'a': 'ab', 'b': 'b'})
+
+if s('ab') != ['a','b','a'] :
+    print "WORD MORPHISM ERROR : IMAGE"
+    print s('ab')
+
+if (s * t)('a') != s(t('a')) :
+    print "WORD MORPHISM ERROR : COMPOSITION"
+    print s * t
+
+for n in range(12) :
+    u = s ** n
+    v = WordMorphism({'a': 'a', 'b': 'b'})
+    for k in range(n) : v = v * s
+    if u('a') != v('a') or u('b') != v('b') :
+        print "WORD MORPHISM ERROR : POWER", n
+
+    w = u('ab')
+    if u.image_length('ab') != len(w) :
+        print "WORD MORPHISM ERROR : LENGTH", n
+    for k in range(len(w)) :
+        if u.image_letter('ab', k) != w[k] :
+            print "WORD MORPHISM ERROR : LETTER", n, k
+
+# huge image (Fibonacci numbers)
+u = s ** 1000
+if u.image_length('a') < 10**200 :
+    print "WORD MORPHISM ERROR : HUGE LENGTH"
+u.image_letter('a', 10**200)
+
+# deep compositions nested on the left and on the right
+u, v = s, s
+for n in range(1500) :
+    u, v = u * s, s * v
+if u.image_letter('a', 10**200) != v.image_letter('a', 10**200) :
+    print "WORD MORPHISM ERROR : DEEP COMPOSITION"
+
+# words given as lists
+if u.image_length(['a','b']) != u.image_length('ab') :
+    print "WORD MORPHISM ERROR : LIST LENGTH"
+if s.image_letter(['b','a'], 1) != s('ba')[1] :
+    print "WORD MORPHISM ERROR : LIST LETTER"
+
+
+#####################################
+# SUBSTITUTIONS OF RAUZY DIAGRAM PATHS
+
+a_list = (("a b c","c b a"),
+          ("a b c d","d c b a"),
+          ("a b c d e","e d c b a"))
+
+for a in a_list :
+    d = gp.RauzyDiagram(*a)
+    alphabet = list(d._alphabet)
+    for k in range(5) :
+        path = [0]
+        i = 0
+        for j in range(200) :
+            t = randint(0,1)
+            path.append(t)
+            i = d._neighbours[i][t]
+
+        s = d.path_to_substitution(*path)
+        m = d.path_to_matrix(*path)
+
+        counts = s.abelianization()
+        for x,letter_x in enumerate(alphabet) :
+            for y,letter_y in enumerate(alphabet) :
+                if counts[letter_y].get(letter_x,0) != m[x,y] :
+                    print "PATH SUBSTITUTION ERROR : MATRIX"
+                    print a, path
+
+        # letters of the images on a shorter path
+        s = d.path_to_substitution(*path[:16])
+        for letter in alphabet :
+            w = s(letter)
+            for j in range(len(w)) :
+                if s.image_letter(letter, j) != w[j] :
+                    print "PATH SUBSTITUTION ERROR : LETTER"
+                    print a, path[:16]
+
+
+###########################
+# PRIMITIVE LOOPS TESTING
+from itertools import product
+from labeled import _is_irreducible, _perron_root
+
+d = gp.RauzyDiagram('a b c d', 'd c b a')
+n = 4
+loops = list(d.primitive_loops(0, 8))
+
+# brute force on all the paths of length at most 8
+expected = set()
+for length in range(1, 9) :
+    for steps in product((0,1), repeat=length) :
+        vertices = [0]
+        for t in steps : vertices.append(d._neighbours[vertices[-1]][t])
+        if vertices[-1] != 0 : continue
+        # the loop must be smaller than its rotations at the other passages
+        # through 0 (and different, which excludes the powers)
+        rotations = [steps[k:] + steps[:k] for k in range(1, length) if vertices[k] == 0]
+        if rotations and min(rotations) <= steps : continue
+        m = d.path_to_matrix(0, *steps)
+        if _is_irreducible([[m[i,j] for i in range(n)] for j in range(n)]) :
+            expected.add((0,) + steps)
+
+if set([path for path,_ in loops]) != expected :
+    print "PRIMITIVE LOOPS ERROR : ENUMERATION"
+
+for path, root in loops :
+    m = d.path_to_matrix(*path)
+    if abs(_perron_root([m[i] for i in range(n)]) - root) > 1e-9 :
+        print "PRIMITIVE LOOPS ERROR : PERRON ROOT", path
+
+if sorted(d.primitive_loops(0, 8, processes=2, chunksize=2)) != sorted(loops) :
+    print "PRIMITIVE LOOPS ERROR : POOL"
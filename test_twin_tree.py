@@ -0,0 +1,78 @@
+from random import randint, seed
+
+import constructor as gp
+from twin_tree import TwinTree
+
+#######################################
+# TWIN TREE VERSUS TWIN LISTS
+#######################################
+seed(0)
+
+a_list = (("a b c d","d c b a"),
+          ("a b c d e f g","g e c a f d b"),
+          ("a b b c c","d d a e e"),
+          ("a b c a d","e d c e b"),
+          ("a b c d e a f g","h g f h e d c b"))
+
+for a in a_list :
+    for flips in ([], ['a'], ['a','c']) :
+        p = gp.GeneralizedPermutation(a, flips=flips)
+        t = TwinTree(a, flips=flips)
+
+        for i in range(40) :
+            winner = randint(0,1)
+            if bool(t.is_rauzy_movable(winner)) != bool(p.is_rauzy_movable(winner)) :
+                print "TWIN TREE RAUZY MOVABILITY ERROR"
+                print p
+                break
+            if not p.is_rauzy_movable(winner) : continue
+
+            p.rauzy_move(winner)
+            t.rauzy_move(winner)
+
+            if flips == [] : intervals = list(p)
+            else : intervals = [[x for x,_ in l] for l in list(p)]
+
+            if t.intervals() != intervals :
+                print "TWIN TREE RAUZY MOVE ERROR"
+                print p
+                print t
+                break
+
+            if flips != [] and t.flips() != [[f for _,f in l] for l in list(p)] :
+                print "TWIN TREE FLIP ERROR"
+                print p
+                print t.flips()
+                break
+
+            l = t.intervals()
+            l = l[0] + l[1]
+            twin = t.twin_list()
+            for j in range(len(l)) :
+                if t.twin(j) != twin[j] or l[twin[j]] != l[j] or twin[j] == j :
+                    print "TWIN TREE TWIN ERROR"
+                    print t
+                    break
+
+
+#######################################
+# TWIN TREE BACKEND OF PERMUTATIONS
+#######################################
+for a in a_list :
+    for reduced in (False, True) :
+        for flips in ([], ['a'], ['a','c']) :
+            p = gp.GeneralizedPermutation(a, reduced=reduced, flips=flips)
+            q = gp.GeneralizedPermutation(a, reduced=reduced, flips=flips)
+
+            walk = []
+            for i in range(40) :
+                winner = randint(0,1)
+                if q.is_rauzy_movable(winner) :
+                    q.rauzy_move(winner)
+                    walk.append(winner)
+
+            p.rauzy_moves(walk, backend='tree')
+            if p != q or list(p) != list(q) :
+                print "TWIN TREE BACKEND ERROR"
+                print p
+                print q
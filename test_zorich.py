@@ -0,0 +1,67 @@
+import constructor as gp
+from random import randint, seed
+
+seed(0)
+
+##########################################
+# ZORICH MOVE AGAINST ITERATED RAUZY MOVES
+
+a_list = (("a b","b a"),
+          ("a b c","c b a"),
+          ("a b c d","d c b a"),
+          ("a b c d","d a b c"),
+          ("a b c d e","e d c b a"),
+          ("a b c d e f","f c e b d a"))
+
+def rauzy_step(p, lengths) :
+    top = lengths[p[0][-1]]
+    bottom = lengths[p[1][-1]]
+    if top > bottom :
+        winner = 0
+    else :
+        winner = 1
+    winner_letter = p[winner][-1]
+    loser_letter = p[1-winner][-1]
+    lengths[winner_letter] -= lengths[loser_letter]
+    p.rauzy_move(winner)
+    return winner
+
+for a in a_list :
+    for k in range(20) :
+        p = gp.GeneralizedPermutation(a)
+        lengths = dict([(letter, randint(1,10**6)) for letter in p[0]])
+        if lengths[p[0][-1]] == lengths[p[1][-1]] : continue
+
+        q = p.copy()
+        q_lengths = lengths.copy()
+        old_lengths = lengths.copy()
+
+        m = p.zorich_move_matrix(lengths)
+        winner, n = p.zorich_move(lengths)
+
+        for j in range(n) :
+            if rauzy_step(q, q_lengths) != winner :
+                print "ZORICH ERROR : WRONG WINNER"
+                print a
+
+        if p != q or lengths != q_lengths :
+            print "ZORICH ERROR : DIFFERENT RESULT"
+            print a
+            print p
+            print q
+
+        # the move is maximal
+        top = lengths[p[0][-1]]
+        bottom = lengths[p[1][-1]]
+        if (winner == 0 and top > bottom) or (winner == 1 and top < bottom) :
+            print "ZORICH ERROR : NOT MAXIMAL"
+            print a
+
+        # the matrix sends the new lengths to the old ones
+        alphabet = list(p._alphabet)
+        for i,letter in enumerate(alphabet) :
+            s = sum([m[i,j] * lengths[alphabet[j]] for j in range(len(alphabet))])
+            if s != old_lengths[letter] :
+                print "ZORICH ERROR : MATRIX"
+                print a
+                print m
@@ -0,0 +1,381 @@
+r"""
+Twins stored in a balanced tree
+
+    The twin lists of permutations in template.py are Python lists, so a
+    Rauzy move (an insertion in a list followed by the shift of the twins
+    after the insertion point) costs O(n). For permutations with thousands
+    of intervals, a TwinTree stores the 2n extremities of intervals in a
+    treap ordered by implicit positions (the size of the subtrees) : the top
+    interval is at the positions 0, ..., k-1 and the bottom interval at the
+    positions k, ..., 2n-1. Each node knows the node of its twin and its
+    parent, so that the twin lookup, the Rauzy movability and the Rauzy move
+    are all done in O(log n) (expected).
+
+    The permutations use a TwinTree for a sequence of Rauzy moves with
+    GeneralizedPermutation.rauzy_moves(winners, backend='tree').
+
+AUTHORS:
+    -- Vincent Delecroix (2008-12-20): initial version
+
+EXAMPLES:
+    sage : t = TwinTree(['a b c d'.split(), 'd c b a'.split()])
+    sage : t.twin(0)
+    7
+    sage : t.rauzy_move(0)
+    sage : t.intervals()
+    [['a', 'b', 'c', 'd'], ['d', 'a', 'c', 'b']]
+
+    sage : t = TwinTree(['a a b'.split(), 'b c c'.split()], flips=['a'])
+    sage : t.is_rauzy_movable(0)
+    True
+"""
+#*****************************************************************************
+#       Copyright (C) 2008 Vincent Delecroix <delecroix@iml.univ-mrs.fr>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+from random import random
+
+from sage import SageObject
+#from sage.structure.sage_object import SageObject
+
+
+class _Node(object) :
+    r"""
+    Node of a TwinTree (an extremity of an interval).
+    """
+    __slots__ = ('left', 'right', 'parent', 'size', 'priority', 'twin', 'label', 'flip')
+
+    def __init__(self, label, flip=1) :
+        self.left = None
+        self.right = None
+        self.parent = None
+        self.size = 1
+        self.priority = random()
+        self.twin = None
+        self.label = label
+        self.flip = flip
+
+
+def _size(t) :
+    if t is None : return 0
+    return t.size
+
+
+def _update(t) :
+    r"""
+    Update the size of t and the parent of its children.
+    """
+    t.size = 1
+    if t.left is not None :
+        t.size += t.left.size
+        t.left.parent = t
+    if t.right is not None :
+        t.size += t.right.size
+        t.right.parent = t
+
+
+def _split(t, p) :
+    r"""
+    Split the tree t in the p first nodes and the others.
+    """
+    if t is None : return None, None
+    if _size(t.left) >= p :
+        a, t.left = _split(t.left, p)
+        _update(t)
+        if a is not None : a.parent = None
+        t.parent = None
+        return a, t
+    else :
+        t.right, b = _split(t.right, p - _size(t.left) - 1)
+        _update(t)
+        if b is not None : b.parent = None
+        t.parent = None
+        return t, b
+
+
+def _merge(a, b) :
+    r"""
+    Concatenation of the trees a and b.
+    """
+    if a is None : return b
+    if b is None : return a
+    if a.priority > b.priority :
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    else :
+        b.left = _merge(a, b.left)
+        _update(b)
+        return b
+
+
+def _build(nodes) :
+    r"""
+    Build the treap of the list of nodes in O(n).
+    """
+    stack = []
+    for node in nodes :
+        last = None
+        while stack and stack[-1].priority < node.priority :
+            last = stack.pop()
+        node.left = last
+        if stack : stack[-1].right = node
+        stack.append(node)
+
+    if not stack : return None
+
+    # sizes and parents, the children before their parent (reversed
+    # breadth first order of the tree built by the stack)
+    order = [stack[0]]
+    for node in order :
+        if node.left is not None : order.append(node.left)
+        if node.right is not None : order.append(node.right)
+    for node in reversed(order) :
+        _update(node)
+    stack[0].parent = None
+    return stack[0]
+
+
+def _position(node) :
+    r"""
+    Position of the node in its tree.
+    """
+    p = _size(node.left)
+    while node.parent is not None :
+        if node is node.parent.right :
+            p += _size(node.parent.left) + 1
+        node = node.parent
+    return p
+
+
+class TwinTree(SageObject) :
+    r"""
+    Twins of a generalized permutation stored in a balanced tree.
+
+    INPUT:
+        a -- two lists (or two strings) of labels
+        flips -- (defaut: []) the list of flipped labels
+
+    EXAMPLES:
+        sage : t = TwinTree(['a b b'.split(), 'c c a'.split()])
+        sage : t.twin(1)
+        2
+        sage : t.is_rauzy_movable(1)
+        True
+    """
+    def __init__(self, a, flips=[]) :
+        a = [a[0], a[1]]
+        for i in (0,1) :
+            if isinstance(a[i], str) : a[i] = a[i].split()
+
+        flips = set(flips)
+        nodes = []
+        first = {}
+        for letter in a[0] + a[1] :
+            if letter in flips : node = _Node(letter, -1)
+            else : node = _Node(letter)
+            if letter in first :
+                node.twin = first[letter]
+                first[letter].twin = node
+            else :
+                first[letter] = node
+            nodes.append(node)
+
+        self._k = len(a[0])
+        self._root = _build(nodes)
+
+        # number of letters with the two extremities in the top (resp. bottom)
+        self._inner = [0, 0]
+        rank = dict([(id(node), p) for p,node in enumerate(nodes)])
+        for p,node in enumerate(nodes) :
+            if node.twin is None : raise ValueError("%s is not repeated" %(str(node.label)))
+            q = rank[id(node.twin)]
+            if p < q and ((p < self._k) == (q < self._k)) :
+                self._inner[int(p >= self._k)] += 1
+
+
+    def __len__(self) :
+        r"""
+        Number of intervals.
+        """
+        return _size(self._root) // 2
+
+
+    def __repr__(self) :
+        l = self.intervals()
+        return ' '.join(map(str,l[0])) + "\n" + ' '.join(map(str,l[1]))
+
+
+    def length_top(self) :
+        r"""
+        Returns the number of intervals in the top segment.
+        """
+        return self._k
+
+
+    def length_bottom(self) :
+        r"""
+        Returns the number of intervals in the bottom segment.
+        """
+        return _size(self._root) - self._k
+
+
+    def _node_at(self, p) :
+        r"""
+        The node at position p.
+        """
+        if p < 0 or p >= _size(self._root) : raise IndexError("position out of range")
+        t = self._root
+        while True :
+            s = _size(t.left)
+            if p < s : t = t.left
+            elif p == s : return t
+            else :
+                p -= s + 1
+                t = t.right
+
+
+    def twin(self, p) :
+        r"""
+        Position of the twin of the position p (the positions are 0, ...,
+        k-1 in the top and k, ..., 2n-1 in the bottom).
+        """
+        return _position(self._node_at(p).twin)
+
+
+    def label(self, p) :
+        r"""
+        Label at position p.
+        """
+        return self._node_at(p).label
+
+
+    def flip(self, p) :
+        r"""
+        Flip (1 or -1) at position p.
+        """
+        return self._node_at(p).flip
+
+
+    def _nodes(self) :
+        r"""
+        Iterator over the nodes in the order of positions.
+        """
+        stack = []
+        t = self._root
+        while stack or t is not None :
+            if t is not None :
+                stack.append(t)
+                t = t.left
+            else :
+                t = stack.pop()
+                yield t
+                t = t.right
+
+
+    def intervals(self) :
+        r"""
+        Returns the two lists of labels.
+        """
+        l = [node.label for node in self._nodes()]
+        return [l[:self._k], l[self._k:]]
+
+
+    def flips(self) :
+        r"""
+        Returns the two lists of flips.
+        """
+        l = [node.flip for node in self._nodes()]
+        return [l[:self._k], l[self._k:]]
+
+
+    def twin_list(self) :
+        r"""
+        Returns the list of the 2n twin positions (in O(n)).
+        """
+        nodes = list(self._nodes())
+        rank = dict([(id(node), p) for p,node in enumerate(nodes)])
+        return [rank[id(node.twin)] for node in nodes]
+
+
+    def is_rauzy_movable(self, winner=0) :
+        r"""
+        Test of Rauzy movability (see QuadraticPermutation.is_rauzy_movable).
+
+        INPUT:
+            winner -- 0 or 1 (defaut: 0)
+
+        OUTPUT:
+            a boolean
+        """
+        N = _size(self._root)
+        k = self._k
+
+        # the same letter at the right-end
+        if self.twin(k-1) == N-1 : return False
+
+        if winner == 0 :
+            winner_end, loser_end = k-1, N-1
+        else :
+            winner_end, loser_end = N-1, k-1
+
+        # the winner (or loser) letter is repeated on the other interval
+        if (self.twin(winner_end) < k) != (winner_end < k) : return True
+        if (self.twin(loser_end) < k) != (loser_end < k) : return True
+
+        # the loser letter is the only letter repeated in the loser interval
+        if self._inner[1-winner] == 1 : return False
+
+        return True
+
+
+    def rauzy_move(self, winner) :
+        r"""
+        Perform a Rauzy move.
+
+        INPUT:
+            winner -- 0 or 1
+        """
+        N = _size(self._root)
+        k = self._k
+
+        if winner == 0 : W, L = k-1, N-1
+        else : W, L = N-1, k-1
+
+        winner_node = self._node_at(W)
+        loser_node = self._node_at(L)
+        T = _position(winner_node.twin)
+        flipped = (winner_node.flip == -1)
+
+        if winner == 0 :
+            if T >= k :
+                # the twin of the winner is in the bottom
+                to_pos, new_k = T + (not flipped), k
+            else :
+                # the twin of the winner is in the top
+                to_pos, new_k = T + flipped, k+1
+        else :
+            if T < k :
+                # the twin of the winner is in the top
+                to_pos, new_k = T + (not flipped), k
+            else :
+                # the twin of the winner is in the bottom
+                to_pos, new_k = T - (not flipped), k-1
+
+        # only the loser can change of interval
+        twin_interval = int(_position(loser_node.twin) >= k)
+        if twin_interval == int(L >= k) : self._inner[twin_interval] -= 1
+        if twin_interval == int(to_pos >= new_k) : self._inner[twin_interval] += 1
+
+        flip = winner_node.flip * loser_node.flip
+        loser_node.flip = flip
+        loser_node.twin.flip = flip
+
+        a, b = _split(self._root, L)
+        node, c = _split(b, 1)
+        a, b = _split(_merge(a, c), to_pos)
+        self._root = _merge(_merge(a, node), b)
+        self._k = new_k